@@ -0,0 +1,125 @@
+import math
+
+import numpy as np
+
+from pose_backends import Landmark
+
+
+class FixedSampler:
+    """Run pose on every `stride`th frame (the original behaviour)."""
+
+    def __init__(self, stride=3):
+        self.stride = stride
+
+    def next_stride(self, angle):
+        return self.stride
+
+
+class AdaptiveSampler:
+    """Picks how many frames to skip after each pose inference from how fast the tracked angle moves.
+
+    - while the lifter holds still the stride doubles, up to max_stride
+    - while moving, the stride is chosen so the angle moves about target_step
+      degrees between samples (the state machine needs > 5 degree steps)
+    - when the movement slows down sharply or reverses (the turnaround at the
+      top/bottom of a rep) the next few samples are taken at min_stride
+    """
+
+    # defaults tuned with tools/bench_adaptive_sampling.py
+    def __init__(self, min_stride=1, max_stride=8, base_stride=3, target_step=10.0, still_speed=1.5,
+                 turnaround_samples=2):
+        self.min_stride = min_stride
+        self.max_stride = max_stride
+        self.base_stride = base_stride
+        self.target_step = target_step
+        self.still_speed = still_speed  # degrees per frame
+        self.turnaround_samples = turnaround_samples
+        self._last_angle = None
+        self._last_speed = 0.0
+        self._last_direction = 0
+        self._stride = base_stride
+        self._dense_left = 0
+
+    def next_stride(self, angle):
+        """Feed the tracked angle of the frame pose just ran on (None if not measurable)."""
+        if angle is None:
+            self._last_angle = None
+            self._stride = self.base_stride
+            return self._stride
+
+        if self._last_angle is None:
+            self._last_angle = angle
+            self._stride = self.base_stride
+            return self._stride
+
+        change = angle - self._last_angle
+        speed = abs(change) / self._stride
+        direction = (change > 0) - (change < 0) if speed >= self.still_speed else 0
+
+        reversed_ = direction and self._last_direction and direction != self._last_direction
+        slowing = self._last_speed >= 2 * self.still_speed and speed < 0.6 * self._last_speed
+        if reversed_ or slowing:
+            self._dense_left = self.turnaround_samples
+
+        if self._dense_left > 0:
+            self._dense_left -= 1
+            stride = self.min_stride
+        elif speed < self.still_speed:
+            stride = self._stride * 2
+        else:
+            stride = round(self.target_step / speed)
+
+        self._stride = max(self.min_stride, min(self.max_stride, stride))
+        self._last_angle = angle
+        self._last_speed = speed
+        if direction:
+            self._last_direction = direction
+        return self._stride
+
+
+class OneEuroFilter:
+    """One Euro filter (Casiez et al. 2012) over numpy arrays with uneven time steps.
+
+    Low jitter while the signal is slow (cut off close to min_cutoff), low lag
+    while it moves fast (cut off grows with beta * speed).
+    """
+
+    def __init__(self, min_cutoff=1.5, beta=8.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._x = None
+        self._dx = None
+        self._t = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, t):
+        if self._x is None or t <= self._t:
+            self._x, self._dx, self._t = x, np.zeros_like(x), t
+            return x
+        dt = t - self._t
+        dx = (x - self._x) / dt
+        a_d = self._alpha(self.d_cutoff, dt)
+        self._dx = a_d * dx + (1 - a_d) * self._dx
+        cutoff = self.min_cutoff + self.beta * np.abs(self._dx)
+        a = self._alpha(cutoff, dt)
+        self._x = a * x + (1 - a) * self._x
+        self._t = t
+        return self._x
+
+
+class LandmarkSmoother:
+    """Smooths x, y, z of every landmark between pose samples; visibility is passed through."""
+
+    def __init__(self, min_cutoff=1.5, beta=8.0):
+        self._filter = OneEuroFilter(min_cutoff, beta)
+
+    def __call__(self, landmarks, t):
+        raw = np.array([[lm.x, lm.y, lm.z] for lm in landmarks], dtype=np.float64)
+        smoothed = self._filter(raw, t)
+        return [Landmark(float(p[0]), float(p[1]), float(p[2]), lm.visibility)
+                for p, lm in zip(smoothed, landmarks)]
@@ -0,0 +1,202 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class OverCapacityError(Exception):
+    """The server or this user is at its limit; the client should retry after retry_after seconds."""
+
+    def __init__(self, message, retry_after, reason):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class RequestTooLargeError(ValueError):
+    """The request is over a per-user limit on its own, so retrying it can never succeed."""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Decides whether an analysis request may run now, wait, or be turned away.
+
+    Each admitted request holds one of max_concurrent slots while its sets are
+    analysed (process_videos works through a request's sets one after another,
+    so a request keeps about one core busy). Requests beyond that wait in a
+    queue of at most max_queue entries for up to queue_timeout seconds, and
+    get the slots first come, first served: a new request does not take a
+    free slot while an earlier one is still waiting for it.
+
+    Per user, at most max_user_sets sets may be in flight at once and at most
+    max_user_video_seconds of video may be admitted per window_seconds. A
+    request that is over either limit by itself is refused with
+    RequestTooLargeError rather than told to retry.
+
+    Limits are per process; with several workers each one enforces its own.
+    """
+
+    REASONS = ("queue_full", "queue_timeout", "user_sets", "user_video_seconds", "too_many_sets", "too_much_video")
+
+    def __init__(self, max_concurrent=None, max_queue=8, queue_timeout=120.0, max_user_sets=6,
+                 max_user_video_seconds=3600.0, window_seconds=3600.0):
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_user_sets = max_user_sets
+        self.max_user_video_seconds = max_user_video_seconds
+        self.window_seconds = window_seconds
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._queue = deque() # one ticket per waiting request, in arrival order
+        self._user_sets = defaultdict(int) # user -> sets in flight
+        self._user_charges = defaultdict(deque) # user -> (admitted at, video seconds) within the window
+        self._charge_order = deque() # (admitted at, user) of every charge, oldest first, to expire them
+        self._hold_seconds = 30.0 # running average of how long a request holds its slot, for Retry-After
+        self.admitted_total = 0
+        self.rejected_total = dict.fromkeys(self.REASONS, 0)
+
+    def _reject(self, reason, message, retry_after):
+        self.rejected_total[reason] += 1
+        logger.warning(f"Rejected analysis request ({reason}): {message}")
+        raise OverCapacityError(message, retry_after, reason)
+
+    def _expire_charges(self, now):
+        """Drop charges older than the window; a user with none left loses their entry."""
+        while self._charge_order and now - self._charge_order[0][0] >= self.window_seconds:
+            _, user_id = self._charge_order.popleft()
+            charges = self._user_charges[user_id]
+            charges.popleft() # charges are added in time order, so this user's oldest is the one expiring
+            if not charges:
+                del self._user_charges[user_id]
+
+    def _used_video_seconds(self, user_id):
+        return sum(seconds for _, seconds in self._user_charges.get(user_id, ()))
+
+    def _video_retry_after(self, user_id, needed, now):
+        """Seconds until enough of the user's window has expired to fit `needed` more video seconds."""
+        freed = self.max_user_video_seconds - self._used_video_seconds(user_id)
+        for admitted_at, seconds in self._user_charges.get(user_id, ()):
+            freed += seconds
+            if freed >= needed:
+                return admitted_at + self.window_seconds - now
+        return self.window_seconds
+
+    def _check_request(self, sets, video_seconds):
+        if sets > self.max_user_sets:
+            self._refuse("too_many_sets", f"{sets} sets in one request (limit {self.max_user_sets})")
+        if video_seconds > self.max_user_video_seconds:
+            self._refuse("too_much_video", f"{video_seconds:.0f}s of video in one request "
+                         f"(limit {self.max_user_video_seconds:.0f}s)")
+
+    def _refuse(self, reason, message):
+        self.rejected_total[reason] += 1
+        logger.warning(f"Refused analysis request ({reason}): {message}")
+        raise RequestTooLargeError(message, reason)
+
+    def _check_user(self, user_id, sets, video_seconds, now):
+        if self._user_sets[user_id] + sets > self.max_user_sets:
+            self._reject("user_sets", f"{self._user_sets[user_id]} sets already in progress "
+                         f"(limit {self.max_user_sets})", self._hold_seconds)
+        used = self._used_video_seconds(user_id)
+        if used + video_seconds > self.max_user_video_seconds:
+            self._reject("user_video_seconds", f"{used + video_seconds:.0f}s of video in the last "
+                         f"{self.window_seconds:.0f}s (limit {self.max_user_video_seconds:.0f}s)",
+                         self._video_retry_after(user_id, video_seconds, now))
+
+    def _wait_for_slot(self):
+        if self._running < self.max_concurrent and not self._queue:
+            return
+        waiting = len(self._queue)
+        if waiting >= self.max_queue:
+            self._reject("queue_full", f"{waiting} requests already waiting",
+                         self._hold_seconds * (waiting + 1) / self.max_concurrent)
+        ticket = object()
+        self._queue.append(ticket)
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            # only the request at the head of the queue may take a free slot
+            while self._queue[0] is not ticket or self._running >= self.max_concurrent:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject("queue_timeout", f"waited {self.queue_timeout:.0f}s for a free slot",
+                                 self._hold_seconds * len(self._queue) / self.max_concurrent)
+                self._cond.wait(remaining)
+        finally:
+            self._queue.remove(ticket)
+            self._cond.notify_all() # whoever is next in line now checks for a slot
+
+    @contextmanager
+    def admit(self, user_id, video_seconds):
+        """Run the body as one admitted request; video_seconds holds the length of each set.
+
+        Raises RequestTooLargeError when the request alone is over a user limit,
+        OverCapacityError straight away when a user limit or the queue is full,
+        or after queue_timeout seconds without a free slot.
+        """
+        sets = len(video_seconds)
+        total_seconds = sum(video_seconds)
+        with self._cond:
+            self._check_request(sets, total_seconds)
+            now = time.monotonic()
+            self._expire_charges(now)
+            self._check_user(user_id, sets, total_seconds, now)
+            # hold the user's sets while queued too, so one user cannot fill the queue
+            self._user_sets[user_id] += sets
+            try:
+                self._wait_for_slot()
+            except OverCapacityError:
+                self._release_user(user_id, sets)
+                raise
+            self._running += 1
+            # charged when admitted, so both deques stay in time order
+            admitted_at = time.monotonic()
+            self._user_charges[user_id].append((admitted_at, total_seconds))
+            self._charge_order.append((admitted_at, user_id))
+            self.admitted_total += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._release_user(user_id, sets)
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.monotonic() - started)
+                self._cond.notify_all() # the head of the queue takes the slot
+
+    def _release_user(self, user_id, sets):
+        self._user_sets[user_id] -= sets
+        if not self._user_sets[user_id]:
+            del self._user_sets[user_id]
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "analysis_running": self._running,
+                "analysis_queue_depth": len(self._queue),
+                "analysis_slots": self.max_concurrent,
+                "analysis_admitted_total": self.admitted_total,
+                "analysis_rejected_total": dict(self.rejected_total),
+            }
+
+    def metrics_text(self):
+        """metrics() in the Prometheus text format."""
+        lines = []
+        for name, value in self.metrics().items():
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            if isinstance(value, dict):
+                lines += [f'{name}{{reason="{reason}"}} {count}' for reason, count in value.items()]
+            else:
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
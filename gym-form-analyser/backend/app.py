@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 import os
 import boto3
 from pymongo import MongoClient
@@ -11,9 +11,21 @@ import jwt
 import uuid
 import tempfile
 from video_processor import GymFormAnalyzer 
+from feedback_dispatcher import FeedbackDispatcher, CircuitBreaker, as_completed
+from admission import AdmissionController, OverCapacityError, RequestTooLargeError
+from checkpoints import SetCheckpoints, IdempotencyError, ensure_checkpoint_indexes
+import progress
+from progress import ProgressJob, ProgressStore, sse_stream
+from video_decoders import video_seconds
+from video_storage import S3Storage, LocalStorage
+from segmented_output import HLSOutput
+from profiling import AnalysisProfiler
+from preflight import PreflightError, PreflightStats
+from collections import namedtuple
 import logging
 import subprocess
 import json
+import hashlib
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -42,95 +54,268 @@ AWS_BUCKET_NAME = app.config['AWS_BUCKET_NAME']
 AWS_REGION = app.config['AWS_REGION']
 ALLOWED_EXTENSIONS = {'mp4', 'mov', 'avi'}
 
-# Initialize GymFormAnalyzer once when the app starts
-analyzer = GymFormAnalyzer()
+# Processed videos go to S3, or to a local directory served under /media in development
+if getattr(Config, 'VIDEO_STORAGE', 's3') == 'local':
+    video_storage = LocalStorage(getattr(Config, 'LOCAL_STORAGE_DIR', os.path.join(BASE_DIR, 'media')),
+                                 getattr(Config, 'LOCAL_STORAGE_URL', '/media'))
+else:
+    video_storage = S3Storage(s3_client, AWS_BUCKET_NAME, AWS_REGION)
+
+# "mp4": one web MP4 per set after its analysis, "hls": segments published while the set is analysed
+OUTPUT_MODE = getattr(Config, 'OUTPUT_MODE', 'mp4')
+HLS_SEGMENT_SECONDS = getattr(Config, 'HLS_SEGMENT_SECONDS', 2)
+
+# Gemini calls run in the background while the remaining sets are processed
+feedback_dispatcher = FeedbackDispatcher(
+    max_workers=getattr(Config, 'GEMINI_MAX_CONCURRENCY', 4),
+    timeout=getattr(Config, 'GEMINI_TIMEOUT_SECONDS', 20),
+    breaker=CircuitBreaker(
+        failure_threshold=getattr(Config, 'GEMINI_BREAKER_FAILURES', 3),
+        reset_timeout=getattr(Config, 'GEMINI_BREAKER_RESET_SECONDS', 30)
+    )
+)
+
+# Analysis ties up a core per request, so requests are admitted, queued or turned away with a 429
+admission = AdmissionController(
+    max_concurrent=getattr(Config, 'ANALYSIS_MAX_CONCURRENCY', None),
+    max_queue=getattr(Config, 'ANALYSIS_MAX_QUEUE', 8),
+    queue_timeout=getattr(Config, 'ANALYSIS_QUEUE_TIMEOUT_SECONDS', 120),
+    max_user_sets=getattr(Config, 'USER_MAX_SETS_IN_FLIGHT', 6),
+    max_user_video_seconds=getattr(Config, 'USER_VIDEO_SECONDS_PER_WINDOW', 3600),
+    window_seconds=getattr(Config, 'USER_QUOTA_WINDOW_SECONDS', 3600)
+)
+
+# Initialize GymFormAnalyzer once when the app starts, with a pose backend for every analysis slot
+analyzer = GymFormAnalyzer(pose_pool_size=getattr(Config, 'POSE_POOL_SIZE', admission.max_concurrent))
+
+# An uploaded set saved to a temp file, with its length in seconds and the SHA-256 of its content
+Upload = namedtuple('Upload', ['filename', 'path', 'seconds', 'digest'])
+
+# Sets finished by requests sent with an Idempotency-Key, so retries skip them
+checkpoint_collection = db['analysis_checkpoints']
+try:
+    ensure_checkpoint_indexes(checkpoint_collection, getattr(Config, 'CHECKPOINT_TTL_SECONDS', 86400))
+except Exception as e:
+    logger.warning(f"Could not create the checkpoint TTL index: {e}")
+
+# Progress of running analyses for clients that send an X-Progress-Id, and time-to-first-result stats
+progress_store = ProgressStore(ttl=getattr(Config, 'PROGRESS_TTL_SECONDS', 600))
+
+# Opt-in sampling profiler for slow analyses: X-Profile header matching PROFILE_TOKEN,
+# a random PROFILE_SAMPLE_RATE of requests, or every request with ANALYSIS_PROFILE=1 in the environment
+profiler = AnalysisProfiler(
+    directory=getattr(Config, 'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'analysis_profiles')),
+    token=getattr(Config, 'PROFILE_TOKEN', None),
+    sample_rate=getattr(Config, 'PROFILE_SAMPLE_RATE', 0.0),
+    keep=getattr(Config, 'PROFILE_KEEP', 50),
+    interval=getattr(Config, 'PROFILE_INTERVAL_MS', 5) / 1000
+)
+
+# Videos turned away by the pre-flight probe, the frames that skipped and the analysis time it saved
+preflight_stats = PreflightStats()
+
+# Form fields that must match when an Idempotency-Key is reused
+IDEMPOTENT_FIELDS = ['exercise_type', 'analysisType', 'workout_date', 'original_date', 'id']
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def process_videos(videos, exercise_type, analysis_type):
-    logger.info(f"Received {len(videos)} video files")
-
-    if not videos or all(v.filename == '' for v in videos):
+def save_uploads(videos):
+    uploads = []
+    for file in videos:
+        if file.filename == '' or not allowed_file(file.filename):
+            logger.warning(f"Skipping invalid file: {file.filename}")
+            continue
+        file_ext = file.filename.rsplit('.', 1)[1].lower()
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(suffix=f".{file_ext}", delete=False) as tmp_file:
+            for chunk in iter(lambda: file.stream.read(1 << 20), b''):
+                digest.update(chunk)
+                tmp_file.write(chunk)
+        uploads.append(Upload(file.filename, tmp_file.name, video_seconds(tmp_file.name), digest.hexdigest()))
+    return uploads
+
+def remove_temp_files(*paths):
+    for path in paths:
+        if path and os.path.exists(path):
+            try:
+                os.unlink(path)
+                logger.info(f"Deleted temp file: {path}")
+            except Exception as cleanup_err:
+                logger.warning(f"Cleanup failed for {path}: {cleanup_err}")
+
+def encode_and_upload(raw_path):
+    """Re-encode the annotated video for the web and put it in video_storage; returns its URL."""
+    encoded_filename = f"processed_{uuid.uuid4()}.mp4"
+    encoded_path = os.path.join(tempfile.gettempdir(), encoded_filename)
+    try:
+        subprocess.run([
+            'ffmpeg', '-i', raw_path,
+            '-c:v', 'libx264', '-preset', 'medium', '-crf', '28',
+            '-c:a', 'aac', '-b:a', '128k',
+            '-movflags', '+faststart',
+            '-y', encoded_path
+        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        video_storage.put_file(encoded_path, encoded_filename, 'video/mp4')
+    finally:
+        remove_temp_files(encoded_path)
+
+    return video_storage.url(encoded_filename)
+
+NO_FEEDBACK = 'No AI feedback available' # placeholder while a set's feedback is still on its way
+
+def process_videos(uploads, exercise_type, analysis_type, checkpoint=None, on_event=None, profile_id=None):
+    """Analyse every set; a failing set is reported in failed_sets instead of dropping the others.
+
+    Work is done in three passes so the cheap results arrive first: the frame loop of
+    every set (rep counts and score), then the re-encode and upload of every set,
+    then the AI feedback as each call finishes. on_event(dict) is called with a
+    progress.py event as each piece is ready.
+
+    With OUTPUT_MODE "hls" there is no re-encode: each set's video is published as
+    HLS segments during its frame loop, and its video event (the playlist URL)
+    comes as soon as the first segment is up, usually before its summary.
+
+    With a checkpoint, sets it already holds are reused and new ones are saved to it as they finish,
+    that is once their AI feedback is final.
+    With a profile_id the analysis of each set is profiled (see profiling.py) under that id.
+    Raises RuntimeError only when no set could be processed.
+    """
+    logger.info(f"Received {len(uploads)} video files")
+
+    if not uploads:
         raise ValueError("No valid video files received")
 
     logger.info(f"Exercise type: {exercise_type}")
     logger.info(f"Analysis type: {analysis_type}")
 
-    processed_results = []
-    total_score = 0.0
-    processed_count = 0
+    emit = on_event or (lambda event: None)
+    entries = {} # upload index -> result entry, for every set that went through
+    analysed = [] # (index, upload, raw video path or None when already published) of sets analysed by this request
+    pending_feedback = {} # PendingFeedback -> (index, upload) for Gemini calls still running
+    failed_sets = [] # {'index', 'filename', 'error'[, 'reason']} for each set that could not be processed
+
+    def fail(idx, upload, error, reason=None):
+        failed = {'index': idx, 'filename': upload.filename, 'error': error}
+        if reason:
+            failed['reason'] = reason
+        failed_sets.append(failed)
+        entries.pop(idx, None)
+        emit({'type': progress.FAILED, 'set': idx, 'filename': upload.filename, 'error': error, 'reason': reason})
+
+    # 1. Frame loop of every set, rep counts and score are known as soon as it ends
+    for idx, upload in enumerate(uploads):
+        done = checkpoint.get(idx, upload.digest) if checkpoint else None
+        if done and done.get('gemini_feedback') == NO_FEEDBACK:
+            done = None # saved before its feedback came back by an older version; analyse it again
+        if done:
+            logger.info(f"Set {idx + 1} ({upload.filename}) already processed, reusing its result")
+            entries[idx] = done
+            emit({'type': progress.SUMMARY, 'set': idx, 'filename': upload.filename, 'id': done['id'],
+                  'analysis': done.get('analysis', {})})
+            emit({'type': progress.VIDEO, 'set': idx, 'processed_url': done.get('processed_url')})
+            emit({'type': progress.FEEDBACK, 'set': idx, 'gemini_feedback': done.get('gemini_feedback')})
+            continue
 
-    for idx, file in enumerate(videos):
-        if file.filename == '' or not allowed_file(file.filename):
-            logger.warning(f"Skipping invalid file: {file.filename}")
+        stream = raw_path = None
+        if OUTPUT_MODE == 'hls' and analysis_type != "QUICK":
+            stream = HLSOutput(video_storage, f"processed_{uuid.uuid4()}", HLS_SEGMENT_SECONDS,
+                               on_ready=lambda url, idx=idx: emit({'type': progress.VIDEO, 'set': idx,
+                                                                   'processed_url': url}))
+        else:
+            file_ext = upload.filename.rsplit('.', 1)[1].lower()
+            raw_path = os.path.join(tempfile.gettempdir(), f"raw_processed_{uuid.uuid4()}.{file_ext}")
+        try:
+            with profiler.session(profile_id, exercise_type, idx) as profile_tags:
+                result = analyzer.process_video(upload.path, raw_path, exercise_type, analysis_type,
+                                                feedback_dispatcher=feedback_dispatcher, output_stream=stream)
+                profile_tags.update(result.get('video', {}))
+        except PreflightError as e:
+            logger.info(f"Set {idx + 1} ({upload.filename}) rejected by pre-flight ({e.reason}), "
+                        f"{e.frames_skipped} frames and about {e.seconds_saved:.1f}s of analysis saved: {e}")
+            preflight_stats.record(e)
+            fail(idx, upload, str(e), e.reason)
+            remove_temp_files(raw_path)
+            continue
+        except Exception as e:
+            logger.error(f"Processing failed: {str(e)}")
+            fail(idx, upload, f"Processing error: {str(e)}")
+            if stream:
+                stream.abort()
+            remove_temp_files(raw_path)
             continue
+        finally:
+            remove_temp_files(upload.path)
 
+        entries[idx] = {
+            'id': str(uuid.uuid4()),
+            'processed_url': stream.url if stream else None,
+            'analysis': result.get('summary', {}),
+            'gemini_feedback': result.get('gemini_feedback', NO_FEEDBACK)
+        }
+        analysed.append((idx, upload, raw_path))
+        emit({'type': progress.SUMMARY, 'set': idx, 'filename': upload.filename, 'id': entries[idx]['id'],
+              'analysis': entries[idx]['analysis']})
+        if 'gemini_feedback_pending' in result:
+            pending_feedback[result['gemini_feedback_pending']] = (idx, upload)
+        else:
+            emit({'type': progress.FEEDBACK, 'set': idx, 'gemini_feedback': entries[idx]['gemini_feedback']})
+
+    # 2. Re-encode and upload the annotated videos (HLS sets are already published)
+    feedback_waiting = {idx for idx, _ in pending_feedback.values()}
+    for idx, upload, raw_path in analysed:
         try:
-            file_ext = file.filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4()}.{file_ext}"
-
-            with tempfile.NamedTemporaryFile(suffix=f".{file_ext}", delete=False) as tmp_file:
-                file.save(tmp_file.name)
-                local_input_path = tmp_file.name
-
-            raw_path = os.path.join(tempfile.gettempdir(), f"raw_processed_{unique_filename}")
-            result = analyzer.process_video(local_input_path, raw_path, exercise_type, analysis_type)
-
-            processed_url = None
-            encoded_path = None
-
-            if analysis_type != "QUICK":
-                encoded_filename = f"processed_{uuid.uuid4()}.mp4"
-                encoded_path = os.path.join(tempfile.gettempdir(), encoded_filename)
-
-                subprocess.run([
-                    'ffmpeg', '-i', raw_path,
-                    '-c:v', 'libx264', '-preset', 'medium', '-crf', '28',
-                    '-c:a', 'aac', '-b:a', '128k',
-                    '-movflags', '+faststart',
-                    '-y', encoded_path
-                ], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-                with open(encoded_path, 'rb') as processed_file:
-                    s3_client.upload_fileobj(
-                        processed_file,
-                        AWS_BUCKET_NAME,
-                        encoded_filename,
-                        ExtraArgs={'ContentType': 'video/mp4'}
-                    )
-
-                processed_url = f"https://{AWS_BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{encoded_filename}"
-
-            processed_results.append({
-                'id': str(uuid.uuid4()),
-                'processed_url': processed_url,
-                'analysis': result.get('summary', {}),
-                'gemini_feedback': result.get('gemini_feedback', 'No AI feedback available')
-            })
-
-            score = float(result.get('summary', {}).get('score', 0))
-            total_score += score
-            processed_count += 1
+            if raw_path:
+                if analysis_type != "QUICK":
+                    entries[idx]['processed_url'] = encode_and_upload(raw_path)
+                emit({'type': progress.VIDEO, 'set': idx, 'processed_url': entries[idx]['processed_url']})
+            # a set still waiting for its AI feedback is saved in pass 3, once the feedback is final;
+            # saved now, a retry after a crash would replay the placeholder as the set's feedback
+            if checkpoint and idx not in feedback_waiting:
+                checkpoint.save(idx, upload.digest, entries[idx])
 
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg error: {e.stderr.decode()}")
-            raise RuntimeError("Video encoding failed")
+            fail(idx, upload, "Video encoding failed")
 
         except Exception as e:
             logger.error(f"Processing failed: {str(e)}")
-            raise RuntimeError(f"Processing error: {str(e)}")
+            fail(idx, upload, f"Processing error: {str(e)}")
 
         finally:
-            for path in [local_input_path, raw_path, encoded_path]:
-                if path and os.path.exists(path):
-                    try:
-                        os.unlink(path)
-                        logger.info(f"Deleted temp file: {path}")
-                    except Exception as cleanup_err:
-                        logger.warning(f"Cleanup failed for {path}: {cleanup_err}")
-
-    return processed_results, total_score, processed_count
+            remove_temp_files(raw_path)
+
+    # 3. AI feedback in the order the calls finish; each has its own deadline,
+    # so this waits at most for the slowest one
+    for pending in as_completed(pending_feedback):
+        idx, upload = pending_feedback[pending]
+        feedback = pending.result()
+        if idx not in entries:
+            continue # the set failed after its call was started
+        entries[idx]['gemini_feedback'] = feedback
+        emit({'type': progress.FEEDBACK, 'set': idx, 'gemini_feedback': feedback})
+        if checkpoint:
+            checkpoint.save(idx, upload.digest, entries[idx])
+
+    if not entries and failed_sets:
+        if all('reason' in failed for failed in failed_sets):
+            raise ValueError(failed_sets[0]['error']) # every video was rejected as unusable
+        raise RuntimeError(failed_sets[0]['error'])
+
+    processed_results = [entries[idx] for idx in sorted(entries)]
+    total_score = sum(float(entry.get('analysis', {}).get('score', 0)) for entry in processed_results)
+    return processed_results, total_score, len(processed_results), failed_sets
+
+def partial_failure(results, failed_sets):
+    """Response for a request where some sets failed; nothing was saved to the workout log."""
+    return jsonify({
+        'success': False,
+        'error': f"{len(failed_sets)} of {len(results) + len(failed_sets)} sets failed. "
+                 "Retry with the same Idempotency-Key to process only those sets.",
+        'results': results,
+        'failed_sets': failed_sets
+    }), 207
 
 #ROUTES
 
@@ -157,6 +342,147 @@ def token_required(f):
 
     return decorated
 
+def progress_reported(f):
+    """Publishes the route's progress as request.progress (watchable under X-Progress-Id) and times its results."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        progress_id = request.headers.get('X-Progress-Id')
+        if progress_id and len(progress_id) > 200:
+            return jsonify({'error': 'X-Progress-Id is too long'}), 400
+        try:
+            # without an id nobody can watch, but the timings still count
+            job = progress_store.job(progress_id, request.user_id) if progress_id else ProgressJob(None, request.user_id)
+        except PermissionError as e:
+            return jsonify({'error': str(e)}), 403
+        job.start()
+        request.progress = job
+        try:
+            response = app.make_response(f(*args, **kwargs))
+        except Exception:
+            progress_store.finish(job, 500, {'error': 'Internal server error'})
+            raise
+        progress_store.finish(job, response.status_code, response.get_json(silent=True))
+        return response
+
+    return decorated
+
+def idempotent(f):
+    """Honours an Idempotency-Key header: request.checkpoint keeps finished sets, a finished request is replayed."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        request.checkpoint = None
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 200:
+            return jsonify({'error': 'Idempotency-Key is too long'}), 400
+
+        fingerprint = {'path': request.path, **{field: request.form.get(field) for field in IDEMPOTENT_FIELDS},
+                       'videos': [upload.digest for upload in request.uploads]}
+        checkpoint = SetCheckpoints(checkpoint_collection, request.user_id, key, fingerprint)
+        try:
+            checkpoint.claim()
+        except IdempotencyError as e:
+            return jsonify({'error': str(e)}), e.status
+        try:
+            if checkpoint.response is not None:
+                logger.info(f"Idempotency-Key {key}: replaying the stored response")
+                return jsonify(checkpoint.response)
+            request.checkpoint = checkpoint
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                checkpoint.complete(response.get_json())
+            return response
+        finally:
+            checkpoint.release()
+
+    return decorated
+
+def profiled(f):
+    """Sets request.profile_id when this request is to be profiled (see AnalysisProfiler.wanted), else None."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        request.profile_id = None
+        if profiler.wanted(request.headers.get('X-Profile')):
+            request.profile_id = request.progress.job_id or uuid.uuid4().hex[:12]
+            logger.info(f"Profiling analysis request {request.profile_id}")
+        return f(*args, **kwargs)
+
+    return decorated
+
+def uploads_saved(f):
+    """Saves the uploaded videos to request.uploads (with their SHA-256) and deletes them when the route returns."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        request.uploads = save_uploads(request.files.getlist("video"))
+        try:
+            return f(*args, **kwargs)
+        finally:
+            for upload in request.uploads:
+                if os.path.exists(upload.path):
+                    os.unlink(upload.path)
+
+    return decorated
+
+def admission_required(f):
+    """Runs the route as one admitted analysis request for the sets in request.uploads."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        checkpoint = getattr(request, 'checkpoint', None)
+        # sets finished by an earlier attempt cost nothing and are not charged
+        todo = [u for idx, u in enumerate(request.uploads) if not (checkpoint and checkpoint.get(idx, u.digest))]
+        try:
+            if not todo:
+                return f(*args, **kwargs)
+            with admission.admit(request.user_id, [u.seconds for u in todo]):
+                return f(*args, **kwargs)
+        except RequestTooLargeError as e:
+            # no Retry-After: the same request would be refused again
+            return jsonify({'error': f"Request too large: {e}", 'reason': e.reason}), 413
+        except OverCapacityError as e:
+            return jsonify({'error': f"Too many analysis requests: {e}"}), 429, {'Retry-After': str(e.retry_after)}
+
+    return decorated
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    pool = f"# TYPE pose_pool_idle gauge\npose_pool_idle {analyzer.pose_pool.idle}\n"
+    profiles = f"# TYPE analysis_profiles_written_total counter\nanalysis_profiles_written_total {profiler.written_total}\n"
+    text = admission.metrics_text() + pool + progress_store.metrics_text() + profiles + preflight_stats.metrics_text()
+    return text, 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+@app.route('/analysis_jobs/<progress_id>', methods=['GET'])
+@token_required
+def analysis_job(progress_id):
+    """Progress events from ?after=N on, waiting up to ?wait= seconds (at most 25) for the next one."""
+    try:
+        job = progress_store.job(progress_id, request.user_id)
+    except PermissionError:
+        return jsonify({'error': 'Not found'}), 404
+    after = request.args.get('after', 0, type=int)
+    events = job.events_after(after, timeout=min(request.args.get('wait', 0, type=float), 25))
+    return jsonify({'events': events, 'next': after + len(events), 'done': job.done})
+
+@app.route('/analysis_jobs/<progress_id>/events', methods=['GET'])
+@token_required
+def analysis_job_events(progress_id):
+    """The same events as Server-Sent Events, resuming after Last-Event-ID."""
+    try:
+        job = progress_store.job(progress_id, request.user_id)
+    except PermissionError:
+        return jsonify({'error': 'Not found'}), 404
+    after = request.headers.get('Last-Event-ID', type=int)
+    seq = after + 1 if after is not None else request.args.get('after', 0, type=int)
+    return Response(sse_stream(job, seq, idle_timeout=progress_store.ttl), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/media/<path:key>', methods=['GET'])
+def media(key):
+    """Processed videos when VIDEO_STORAGE is "local" (the S3 stand-in)."""
+    if not isinstance(video_storage, LocalStorage):
+        return jsonify({'error': 'Not found'}), 404
+    return send_from_directory(video_storage.root, key)
+
 @app.route('/verify-token', methods=['GET'])
 @token_required
 def verify_token():
@@ -263,6 +589,11 @@ def delete_workout():
 
 @app.route('/update_workout', methods=['POST'])
 @token_required
+@progress_reported
+@uploads_saved
+@idempotent
+@admission_required
+@profiled
 def update_workout():
     form = request.form
 
@@ -278,6 +609,29 @@ def update_workout():
     if not original_date or not workout_id:
         return jsonify({"error": "Missing required fields: original_date or workout_id"}), 400
 
+    existing = db.users.find_one(
+        { "user_id": request.user_id, f"workouts.{original_date}.id": workout_id },
+        { "_id": 1 }
+    )
+    if not existing:
+        return jsonify({"error": "Workout not found"}), 404
+
+    # Process new videos first, so a failed set leaves the workout untouched and the edit can be retried
+    new_results = []
+    if videos and any(v.filename for v in videos):
+        try:
+            new_results, _, _, failed_sets = process_videos(request.uploads, exercise_type, analysis_type,
+                                                            checkpoint=request.checkpoint,
+                                                            on_event=request.progress.publish,
+                                                            profile_id=request.profile_id)
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        except RuntimeError as re:
+            return jsonify({"error": str(re)}), 500
+
+        if failed_sets:
+            return partial_failure(new_results, failed_sets)
+
     # 1. Delete selected sets
     if deleted_set_ids:
         db.users.update_one(
@@ -326,17 +680,8 @@ def update_workout():
                 { "$unset": { f"workouts.{original_date}": "" } }
             )
 
-    # 4. Process new videos if any
-    new_results = []
-    if videos and any(v.filename for v in videos):
-        try:
-            new_results, _, _ = process_videos(videos, exercise_type, analysis_type)
-        except ValueError as ve:
-            return jsonify({"error": str(ve)}), 400
-        except RuntimeError as re:
-            return jsonify({"error": str(re)}), 500
-
-        # Add results to updated workout (now at workout_date)
+    # 4. Add the new sets' results to the updated workout (now at workout_date)
+    if new_results:
         db.users.update_one(
             {
                 "user_id": request.user_id,
@@ -381,6 +726,11 @@ def update_workout():
 
 @app.route('/upload_and_analyze', methods=['POST'])
 @token_required
+@progress_reported
+@uploads_saved
+@idempotent
+@admission_required
+@profiled
 def upload_and_analyze():
     videos = request.files.getlist("video")
     logger.info(f"Received {len(videos)} video files")
@@ -401,12 +751,18 @@ def upload_and_analyze():
     logger.info(f"Analysis type received: {analysis_type}")
 
     try:
-        processed_results, total_score, total_sets = process_videos(videos, exercise_type, analysis_type)
+        processed_results, total_score, total_sets, failed_sets = process_videos(
+            request.uploads, exercise_type, analysis_type, checkpoint=request.checkpoint,
+            on_event=request.progress.publish, profile_id=request.profile_id)
     except ValueError as ve:
         return jsonify({'error': str(ve)}), 400
     except RuntimeError as re:
         return jsonify({'error': str(re)}), 500
 
+    # The workout is only saved once every set went through, finished sets wait in the checkpoint
+    if failed_sets:
+        return partial_failure(processed_results, failed_sets)
+
     # Final score calculation
     score = (total_score / total_sets) * 100 if total_sets else 0
 
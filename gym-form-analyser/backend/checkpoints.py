@@ -0,0 +1,99 @@
+import logging
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyError(Exception):
+    """The Idempotency-Key cannot be used for this request right now."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class SetCheckpoints:
+    """Finished sets of one request made with an Idempotency-Key, kept in Mongo.
+
+    Each set is stored under its position in the request and the SHA-256 of
+    its video as soon as it is done, so a retry with the same key only analyses
+    the sets that are missing, and two identical videos in one request are
+    still two sets. The request fingerprint holds the ordered video digests, so
+    the key cannot be reused for other videos. Once the request has succeeded
+    its response is stored as well and returned again for further retries, so
+    a lost response never adds the same workout twice.
+
+    One document per (user, key):
+        {_id, user_id, key, request, created_at, claimed_at, in_progress,
+         sets: {"<index>-<digest>": result entry}, response}
+    """
+
+    def __init__(self, collection, user_id, key, request_fingerprint, stale_after=3600):
+        self.collection = collection
+        self.id = f"{user_id}:{key}"
+        self.user_id = user_id
+        self.key = key
+        self.request_fingerprint = request_fingerprint
+        self.stale_after = stale_after # a claim older than this belongs to a request that died
+        self.sets = {}
+        self.response = None
+
+    def claim(self):
+        """Mark the key as in use by this request and load what earlier attempts finished.
+
+        Raises IdempotencyError (409) while another request holds the key, or
+        (422) when the key was used for a different request.
+        """
+        now = datetime.utcnow()
+        try:
+            # the upsert only matches an unclaimed (or stale) document; a live claim makes
+            # it try to insert a second document with the same _id, which Mongo refuses
+            self.collection.update_one(
+                {'_id': self.id, '$or': [{'in_progress': {'$ne': True}},
+                                         {'claimed_at': {'$lt': now - timedelta(seconds=self.stale_after)}}]},
+                {'$set': {'in_progress': True, 'claimed_at': now},
+                 '$setOnInsert': {'user_id': self.user_id, 'key': self.key, 'request': self.request_fingerprint,
+                                  'created_at': now, 'sets': {}, 'response': None}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            raise IdempotencyError("A request with this Idempotency-Key is still being processed", 409)
+
+        doc = self.collection.find_one({'_id': self.id})
+        if doc['request'] != self.request_fingerprint:
+            self.release()
+            stored = doc['request'] or {}
+            changed = sorted(field for field in {*stored, *self.request_fingerprint}
+                             if stored.get(field) != self.request_fingerprint.get(field))
+            raise IdempotencyError(f"This Idempotency-Key was used for a different request "
+                                   f"({', '.join(changed)} differ)", 422)
+        self.sets = doc.get('sets') or {}
+        self.response = doc.get('response')
+        if self.sets:
+            logger.info(f"Idempotency-Key {self.key}: {len(self.sets)} sets already processed")
+
+    @staticmethod
+    def _set_key(index, digest):
+        return f"{index}-{digest}"
+
+    def get(self, index, digest):
+        return self.sets.get(self._set_key(index, digest))
+
+    def save(self, index, digest, entry):
+        key = self._set_key(index, digest)
+        self.sets[key] = entry
+        self.collection.update_one({'_id': self.id}, {'$set': {f'sets.{key}': entry}})
+
+    def complete(self, response):
+        self.response = response
+        self.collection.update_one({'_id': self.id}, {'$set': {'response': response}})
+
+    def release(self):
+        self.collection.update_one({'_id': self.id}, {'$set': {'in_progress': False}})
+
+
+def ensure_checkpoint_indexes(collection, ttl_seconds):
+    """Checkpoints expire ttl_seconds after the first attempt."""
+    collection.create_index('created_at', expireAfterSeconds=ttl_seconds)
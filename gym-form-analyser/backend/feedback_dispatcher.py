@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Stops calling the AI API for a while after several failures in a row.
+
+    closed -> normal, every call goes through
+    open -> calls are rejected straight away until reset_timeout has passed
+    half open -> one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"AI feedback circuit opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+
+
+class PendingFeedback:
+    """Handle for a feedback call running in the background.
+
+    With a fallback, result() returns it instead of the error dict whenever the
+    call failed, timed out or was never made because the breaker was open.
+    """
+
+    def __init__(self, dispatcher, future=None, deadline=None, value=None, fallback=None):
+        self._dispatcher = dispatcher
+        self._future = future
+        self._deadline = deadline
+        self._value = value
+        self.fallback = fallback
+        self.settled = False  # set once the breaker has been told how this call went
+
+    def done(self):
+        return self._future is None or self._future.done()
+
+    def result(self):
+        """Wait for the feedback until the call's deadline, then give up with the usual error dict (or the fallback)."""
+        if self._future is None:
+            value = self._value
+        else:
+            try:
+                remaining = max(0.0, self._deadline - time.monotonic())
+                value = self._future.result(timeout=remaining)
+            except FutureTimeoutError:
+                self._dispatcher._settle(self, success=False)
+                value = {"error": "AI feedback timed out. Please try again later."}
+        if self.fallback is not None and isinstance(value, dict) and "error" in value:
+            logger.info(f"Using fallback feedback: {value['error']}")
+            return self.fallback
+        return value
+
+
+class FeedbackDispatcher:
+    """Runs AI feedback calls on a small thread pool so they overlap with video processing.
+
+    Each call gets a deadline measured from when it was submitted (so time spent
+    waiting for a free worker counts too), at most max_workers calls run at once,
+    and a circuit breaker short-circuits calls while the API keeps failing.
+    Results keep the {"error": ...} shape send_to_gemini already returns.
+    """
+
+    def __init__(self, max_workers=4, timeout=20.0, breaker=None):
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-feedback")
+        self._lock = threading.Lock()
+
+    def submit(self, call, *args, fallback=None, **kwargs):
+        """Start call(*args, **kwargs) in the background; fallback is what result() gives if it fails."""
+        if not self.breaker.allow():
+            return PendingFeedback(self, value={"error": "AI feedback is temporarily unavailable. Please try again later."},
+                                   fallback=fallback)
+
+        pending = PendingFeedback(self, deadline=time.monotonic() + self.timeout, fallback=fallback)
+        pending._future = self._executor.submit(self._run, pending, call, *args, **kwargs)
+        return pending
+
+    def _run(self, pending, call, *args, **kwargs):
+        try:
+            result = call(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"AI feedback call failed: {e}")
+            result = {"error": f"Error getting feedback from AI: {str(e)}"}
+        self._settle(pending, success=not (isinstance(result, dict) and "error" in result))
+        return result
+
+    def _settle(self, pending, success):
+        # a call that timed out and later answers must only be counted once
+        with self._lock:
+            if pending.settled:
+                return
+            pending.settled = True
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def as_completed(pendings):
+    """Yield PendingFeedback handles as their calls finish or reach their deadline.
+
+    .result() on a yielded handle returns straight away.
+    """
+    remaining = list(pendings)
+    while remaining:
+        running = [p for p in remaining if not p.done()]
+        if running:
+            next_deadline = min(p._deadline for p in running)
+            wait([p._future for p in running], timeout=max(0.0, next_deadline - time.monotonic()),
+                 return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        for p in list(remaining):
+            if p.done() or now >= p._deadline:
+                remaining.remove(p)
+                yield p
@@ -0,0 +1,124 @@
+import numpy as np
+
+# Per-frame form scoring used by GymFormAnalyzer.evaluate_form.
+# Kept free of cv2/mediapipe so offline tools (and the streaming accumulators)
+# can score recorded landmark sequences the same way the server does.
+
+# Define landmark indices for each key joint (both left and right)
+INDICES = {
+    "nose": 0,
+    "left_shoulder": 11,
+    "right_shoulder": 12,
+    "left_hip": 23,
+    "right_hip": 24,
+    "left_knee": 25,
+    "right_knee": 26,
+    "left_ankle": 27,
+    "right_ankle": 28,
+    "left_elbow": 13,
+    "right_elbow": 14,
+    "left_wrist": 15,
+    "right_wrist": 16
+}
+
+
+def calculate_angle(point1, point2, point3):
+    """Calculate angle between three points"""
+    a = np.array(point1)
+    b = np.array(point2)
+    c = np.array(point3)
+
+    radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
+    angle = np.abs(radians * 180.0 / np.pi)
+
+    if angle > 180.0:
+        angle = 360 - angle
+
+    return angle
+
+
+def score_frame(lm, state, exercise):
+    """Score one important frame (33 [x, y, z, visibility] landmarks). None if key joints are not visible."""
+    indices = INDICES
+
+    # Function to select best side based on visibility
+    def select_best_side(left_idx, right_idx):
+        left_vis = lm[left_idx][3] if len(lm[left_idx]) > 3 else lm[left_idx].visibility
+        right_vis = lm[right_idx][3] if len(lm[right_idx]) > 3 else lm[right_idx].visibility
+        return left_idx if left_vis >= right_vis else right_idx
+
+    # Select most visible side for each joint
+    shoulder_idx = select_best_side(indices["left_shoulder"], indices["right_shoulder"])
+    hip_idx = select_best_side(indices["left_hip"], indices["right_hip"])
+    knee_idx = select_best_side(indices["left_knee"], indices["right_knee"])
+    ankle_idx = select_best_side(indices["left_ankle"], indices["right_ankle"])
+    elbow_idx = select_best_side(indices["left_elbow"], indices["right_elbow"])
+    wrist_idx = select_best_side(indices["left_wrist"], indices["right_wrist"])
+
+    # Required landmark indices based on exercise and state
+    required = [indices["nose"], shoulder_idx, hip_idx, knee_idx]
+
+    if exercise != "squats":
+        required += [elbow_idx, wrist_idx]
+
+    if exercise == "pushups":
+        required += [ankle_idx]
+    if any(lm[idx][3] < 0.7 for idx in required):
+        return None
+
+    # Angles using selected sides
+    spinal_angle = calculate_angle(lm[indices["nose"]], lm[shoulder_idx], lm[hip_idx])
+    hip_angle = calculate_angle(lm[shoulder_idx], lm[hip_idx], lm[knee_idx])
+
+    spinal_score = 1.0 if 140 <= spinal_angle <= 170 else max(0.0, 1-abs(spinal_angle-155)/155)
+
+    if exercise == "squats":
+        hip_score = 1.0 if 70 <= hip_angle <= 100 else max(0.0, 1-abs(hip_angle-85)/85)
+    else:
+        hip_score = 1.0 if 160 <= hip_angle <= 180 else max(0.0, 1-abs(hip_angle -170)/170)
+
+    # Joint scoring using selected sides
+    joint_score = 1.0
+    if state in ["TOP", "BOT"]:
+        if exercise == "squats":
+            joint_angle = calculate_angle(lm[hip_idx], lm[knee_idx], lm[ankle_idx])
+        else:
+            joint_angle = calculate_angle(lm[shoulder_idx], lm[elbow_idx], lm[wrist_idx])
+
+        if state == "BOT":
+            joint_score = 1.0 if joint_angle <= 90 else -1.0
+        elif state == "TOP":  # top
+            joint_score = 1.0 if joint_angle >= 160 else -1.0
+        else:
+            joint_score = 1.0
+
+    # Extra for pushups using selected side
+    extra_score = 1.0
+    if exercise == "pushups":
+        leg_line_angle = calculate_angle(lm[hip_idx], lm[knee_idx], lm[ankle_idx])
+        extra_score = 1.0 if 140 <= leg_line_angle <= 180 else max(0.0, 1 - (140 - leg_line_angle)/140)
+
+    # Final score
+    if state not in ["TOP","BOT"]:
+        score = (spinal_score +hip_score +extra_score) if exercise == "pushups" else (spinal_score +hip_score)
+        return score/3 if exercise == "pushups" else score/2
+    return joint_score
+
+
+def final_score(scores):
+    """Combine per-frame scores the way evaluate_form always has."""
+    return max(0.100,round(np.mean(scores),3)) if scores else 0.0
+
+
+def evaluate_form(landmarks, states, exercise):
+    if len(states) < 3:
+        return 0.0
+    if len(landmarks) != len(states):
+        return 0.0
+
+    scores = []
+    for lm, state in zip(landmarks, states):
+        score = score_frame(lm, state, exercise)
+        if score is not None:
+            scores.append(score)
+    return final_score(scores)
@@ -0,0 +1,184 @@
+import math
+
+# Compact pose encoding for the Gemini prompt.
+# Instead of dumping every landmark of every sampled frame as pretty printed
+# JSON, we only send the joints that matter for the exercise, pick the frames
+# at the top/bottom of each rep and write them as a small delta coded table.
+
+LANDMARK_INDICES = {
+    "nose": (0, 0),
+    "shoulder": (11, 12),
+    "elbow": (13, 14),
+    "wrist": (15, 16),
+    "hip": (23, 24),
+    "knee": (25, 26),
+    "ankle": (27, 28),
+}
+
+EXERCISE_JOINTS = {
+    "squats": ["shoulder", "hip", "knee", "ankle"],
+    "pushups": ["shoulder", "elbow", "wrist", "hip", "knee", "ankle"],
+    "pullups": ["shoulder", "elbow", "wrist", "hip"],
+}
+
+# angle name -> the three joints that make it up (middle one is the vertex)
+EXERCISE_ANGLES = {
+    "squats": {"knee": ("hip", "knee", "ankle"), "hip": ("shoulder", "hip", "knee")},
+    "pushups": {"elbow": ("shoulder", "elbow", "wrist"), "hip": ("shoulder", "hip", "knee"),
+                "leg": ("hip", "knee", "ankle")},
+    "pullups": {"elbow": ("shoulder", "elbow", "wrist"), "hip": ("shoulder", "hip", "knee")},
+}
+
+COORD_SCALE = 1000  # x/y are sent as integers in 1/1000 of the frame
+MAX_SAMPLE_FRAMES = 25
+
+
+def joint_angle(a, b, c):
+    """Angle at b (degrees) between the points a, b, c. Same maths as GymFormAnalyzer.calculate_angle."""
+    radians = math.atan2(c[1] - b[1], c[0] - b[0]) - math.atan2(a[1] - b[1], a[0] - b[0])
+    angle = abs(radians * 180.0 / math.pi)
+    if angle > 180.0:
+        angle = 360 - angle
+    return angle
+
+
+def _visibility(point):
+    return point[3] if len(point) > 3 else 1.0
+
+
+def pick_side(frames):
+    """Pick the body side (0 = left, 1 = right) that is more visible over the whole set."""
+    left = right = 0.0
+    for lm in frames:
+        for joint in ("shoulder", "hip", "knee", "elbow"):
+            left_idx, right_idx = LANDMARK_INDICES[joint]
+            left += _visibility(lm[left_idx])
+            right += _visibility(lm[right_idx])
+    return 0 if left >= right else 1
+
+
+def select_rep_frames(states, max_frames=MAX_SAMPLE_FRAMES):
+    """Indices of the frames worth sending: every TOP/BOT extreme plus the first and last frame.
+
+    Falls back to a uniform stride when the state machine found no extremes,
+    and thins the extremes evenly when there are more than max_frames.
+    """
+    total = len(states)
+    if total == 0:
+        return []
+    if total <= max_frames:
+        return list(range(total))
+
+    picked = [i for i, state in enumerate(states) if state in ("TOP", "BOT")]
+    if len(picked) < 2:
+        step = total / max_frames
+        return sorted({int(i * step) for i in range(max_frames)})
+
+    picked = sorted({0, total - 1, *picked})
+    if len(picked) > max_frames:
+        step = (len(picked) - 1) / (max_frames - 1)
+        picked = sorted({picked[round(i * step)] for i in range(max_frames)})
+    return picked
+
+
+def encode_pose_table(landmarks_series, exercise_type, states=None, angles=None, max_frames=MAX_SAMPLE_FRAMES,
+                      frame_numbers=None):
+    """Encode a set as a compact text table for the prompt.
+
+    landmarks_series: per frame list of 33 [x, y, z, visibility] (or [x, y]) landmarks
+    states: optional TOP/MID/BOT per frame, used to pick rep extremes
+    angles: optional tracked joint angle per frame (the one the rep counter used)
+    frame_numbers: optional number of each frame in the whole set, when landmarks_series
+        only holds some of its frames (see set_series.StreamingSetSeries)
+
+    Returns (table_text, frame_indices).
+    """
+    if not landmarks_series:
+        return "", []
+
+    joints = EXERCISE_JOINTS.get(exercise_type, EXERCISE_JOINTS["squats"])
+    angle_defs = EXERCISE_ANGLES.get(exercise_type, EXERCISE_ANGLES["squats"])
+
+    if angles is not None and len(angles) != len(landmarks_series):
+        angles = None
+    if frame_numbers is not None and len(frame_numbers) != len(landmarks_series):
+        frame_numbers = None
+    if states and len(states) == len(landmarks_series):
+        indices = select_rep_frames(states, max_frames)
+    else:
+        states = None
+        indices = select_rep_frames(["MID"] * len(landmarks_series), max_frames)
+
+    side = pick_side(landmarks_series[i] for i in indices)
+    columns = ["f"]
+    if states:
+        columns.append("state")
+    if angles:
+        columns.append("tracked")
+    columns += [f"{name}_angle" for name in angle_defs]
+    for joint in joints:
+        columns += [f"{joint}_x", f"{joint}_y"]
+
+    rows = []
+    previous = None
+    for i in indices:
+        lm = landmarks_series[i]
+        points = {joint: lm[idx[side]] for joint, idx in LANDMARK_INDICES.items()}
+
+        coords = []
+        for joint in joints:
+            coords += [round(points[joint][0] * COORD_SCALE), round(points[joint][1] * COORD_SCALE)]
+        # first row is absolute, the rest are deltas from the previous row
+        encoded = coords if previous is None else [c - p for c, p in zip(coords, previous)]
+        previous = coords
+
+        row = [str(frame_numbers[i] if frame_numbers else i)]
+        if states:
+            row.append(states[i][0])  # T / M / B
+        if angles:
+            row.append(str(round(angles[i])))
+        for a, b, c in angle_defs.values():
+            row.append(str(round(joint_angle(points[a], points[b], points[c]))))
+        row += [str(v) for v in encoded]
+        rows.append(",".join(row))
+
+    header = [
+        f"side={'left' if side == 0 else 'right'}; x,y in 1/{COORD_SCALE} of frame, y grows downward",
+        "row 1 coordinates are absolute, later rows are the change from the previous row; angles are absolute degrees",
+    ]
+    if states:
+        header.append("state: T=top of rep, B=bottom of rep, M=transition")
+    if angles:
+        header.append("tracked: the joint angle the rep counter follows")
+    header.append(",".join(columns))
+
+    if frame_numbers:
+        indices = [frame_numbers[i] for i in indices]
+    return "\n".join(header + rows), indices
+
+
+def build_feedback_prompt(exercise_type, pose_table):
+    """Prompt asking Gemini for the JSON feedback schema the frontend renders."""
+    return f"""
+You are a virtual fitness coach specialized in analyzing exercise form.
+The user has performed a {exercise_type}. Below is a table of pose data for the key frames of the set (top and bottom of each rep).
+Each row is one frame: frame number, rep state, joint angles in degrees and (x, y) positions of the joints relevant to this exercise.
+
+Please provide a **concise and summarized analysis** of the {exercise_type} form, focusing on the most critical points.
+Your response MUST be in JSON format, strictly following the schema provided below.
+Do NOT include any other text or markdown outside the JSON object.
+Embed relevant emojis directly into the string values where appropriate to add visual appeal.
+
+JSON Schema:
+{{"title": "Gym Form Analysis - {exercise_type.capitalize()}", "strengths": ["string"], "areas_for_improvement": ["string"], "actionable_tips": ["string"], "overall_assessment": "string"}}
+- title: A short, descriptive title for the analysis.
+- strengths: 1-2 concise, self-contained bullet points highlighting key good aspects.
+- areas_for_improvement: 1-2 concise, self-contained bullet points for critical areas needing work.
+- actionable_tips: 1-3 concise, concrete, actionable advice points.
+- overall_assessment: A very brief, encouraging summary sentence.
+
+Analyze the movement over time. Pay attention to joint angles, range of motion, and consistency across reps.
+
+Pose data:
+{pose_table}
+"""
@@ -0,0 +1,176 @@
+import statistics
+
+from gemini_payload import LANDMARK_INDICES, joint_angle, pick_side
+
+# Rule based feedback in the same JSON shape as the Gemini feedback
+# (title, strengths, areas_for_improvement, actionable_tips, overall_assessment),
+# built in well under a millisecond from what the analysis already has: rep counts,
+# the tracked angle at the top and bottom of each rep, the form score and the
+# landmarks at those rep extremes.
+# "source": "local" and a 0-1 "confidence" are added; confidence drops when there
+# are few reps or a measurement sits close to the line between good and bad.
+
+# degrees within which a measurement is "close to the line" and the rules are unsure
+MARGIN = 7.0
+
+DEPTH_LIMIT = 90.0 # bottom of a good rep, as count_reps_and_track_extremes counts it
+LOCKOUT_LIMIT = 160.0 # top of a good rep
+SQUAT_LEAN_LIMIT = 50.0 # hip angle at the bottom of a squat below which the chest has dropped
+BODY_LINE_LIMIT = 170.0 # shoulder-hip-ankle angle below which a push-up sags or pikes
+DEPTH_SPREAD_LIMIT = 12.0 # spread (std dev) of the bottom angles of good reps
+
+
+def _angle(lm, side, a, b, c):
+    points = {joint: lm[idx[side]] for joint, idx in LANDMARK_INDICES.items()}
+    return joint_angle(points[a], points[b], points[c])
+
+
+def _hip_below_line(lm, side):
+    """True when the hip sits below the shoulder-ankle line (sag), False when above it (pike)."""
+    shoulder, hip, ankle = (lm[LANDMARK_INDICES[joint][side]] for joint in ("shoulder", "hip", "ankle"))
+    cross = (ankle[0] - shoulder[0]) * (hip[1] - shoulder[1]) - (ankle[1] - shoulder[1]) * (hip[0] - shoulder[0])
+    return cross * (1 if ankle[0] >= shoulder[0] else -1) > 0
+
+
+class _Findings:
+    def __init__(self):
+        self.strengths = []
+        self.areas = []
+        self.tips = []
+        self.unsure = 0 # measurements close to their limit
+
+    def check(self, value, limit):
+        if abs(value - limit) < MARGIN:
+            self.unsure += 1
+
+
+def local_feedback(exercise_type, reps, score, landmarks=None, states=None, angles=None):
+    """Feedback dict for one set.
+
+    reps: the dict count_reps_and_track_extremes / SetSeries.rep_stats returns
+    score: the form score (0-1)
+    landmarks, states, angles: the frames picked for Gemini (SetSeries.gemini_input);
+        the tracked angle at each TOP/BOT gives the depth and lockout of every rep
+        and the landmarks there the body-position checks. Without them the
+        average peak/descent angles of reps are used.
+    """
+    total = int(reps.get('total_reps', 0))
+    good = int(reps.get('good_reps', 0))
+    name = {"squats": "squat", "pushups": "push-up", "pullups": "pull-up"}.get(exercise_type, exercise_type)
+    if total == 0:
+        # nothing to measure; low confidence so the router lets Gemini have a look
+        return _result(exercise_type, ["📹 Thanks for recording; a clearer view will let us break down your form."],
+                       [f"🔍 No complete {name} reps were detected."],
+                       ["📹 Film from the side with your whole body in frame and do at least two full reps."],
+                       "🎥 We could not follow your reps this time; try another recording.", 0.2)
+    found = _Findings()
+
+    frames = list(zip(landmarks or [], states or [], angles or [None] * len(states or [])))
+    extremes = [(lm, state, angle) for lm, state, angle in frames if state in ("TOP", "BOT")]
+    side = pick_side(lm for lm, _, _ in extremes) if extremes else 0
+    bottoms = [lm for lm, state, _ in extremes if state == "BOT"]
+    # bottom / top angle of every rep, the same numbers the rep counter judges
+    lows = [angle for _, state, angle in extremes if state == "BOT" and angle] \
+        or [a for a in (reps.get('avg_descent_angle', -1),) if a != -1]
+    highs = [angle for _, state, angle in extremes if state == "TOP" and angle] \
+        or [a for a in (reps.get('avg_peak_angle', -1),) if a != -1]
+
+    if good == total:
+        found.strengths.append(f"✅ All {total} reps reached full range of motion.")
+    elif good:
+        found.strengths.append(f"👍 {good} of {total} reps reached full range of motion.")
+
+    shallow = [angle for angle in lows if angle > DEPTH_LIMIT]
+    bent = [angle for angle in highs if angle < LOCKOUT_LIMIT]
+    if lows:
+        found.check(statistics.median(lows), DEPTH_LIMIT)
+    if highs:
+        found.check(statistics.median(highs), LOCKOUT_LIMIT)
+    if exercise_type == "pullups":
+        # the tracked elbow angle is smallest at the top of a pull-up and largest in the hang
+        if highs and not bent:
+            found.strengths.append("💪 You lower to a full dead hang between reps.")
+        elif bent:
+            found.areas.append(f"📏 {len(bent)} of {len(highs)} reps start with bent arms "
+                               f"(about {statistics.median(bent):.0f}° at the bottom).")
+            found.tips.append("⬇️ Lower until your elbows are straight before starting the next pull.")
+        if lows and not shallow:
+            found.strengths.append("🔝 You pull high enough to bend your elbows past 90°.")
+        elif shallow:
+            found.areas.append(f"🔼 {len(shallow)} of {len(lows)} pulls stop short at the top "
+                               f"(elbows about {statistics.median(shallow):.0f}°).")
+            found.tips.append("🎯 Aim to bring your chin over the bar on every rep.")
+    else:
+        if lows and not shallow:
+            found.strengths.append(f"⬇️ Good depth: about {statistics.median(lows):.0f}° at the bottom of each {name}.")
+        elif shallow:
+            joint = "knees" if exercise_type == "squats" else "elbows"
+            found.areas.append(f"📏 {len(shallow)} of {len(lows)} {name}s were shallow: "
+                               f"{joint} only bent to about {statistics.median(shallow):.0f}°.")
+            found.tips.append("🪑 Sit back and down until your thighs are at least parallel to the floor."
+                              if exercise_type == "squats" else "⬇️ Lower until your chest is a fist's width from the floor.")
+        if bent:
+            joint = "knees and hips" if exercise_type == "squats" else "elbows"
+            found.areas.append(f"🔒 {len(bent)} of {len(highs)} reps do not finish fully extended "
+                               f"(about {statistics.median(bent):.0f}° at the top).")
+            found.tips.append(f"⬆️ Straighten your {joint} completely at the top of each rep.")
+
+    if exercise_type == "squats" and bottoms:
+        lean = statistics.median(_angle(lm, side, "shoulder", "hip", "knee") for lm in bottoms)
+        found.check(lean, SQUAT_LEAN_LIMIT)
+        if lean < SQUAT_LEAN_LIMIT:
+            found.areas.append("↘️ Your chest drops forward a lot at the bottom.")
+            found.tips.append("🧍 Keep your chest up and brace your core as you descend.")
+        else:
+            found.strengths.append("🧍 You keep your chest up through the bottom of the squat.")
+
+    if exercise_type == "pushups" and extremes:
+        lines = [(_angle(lm, side, "shoulder", "hip", "ankle"), _hip_below_line(lm, side)) for lm, _, _ in extremes]
+        line = statistics.median(angle for angle, _ in lines)
+        found.check(line, BODY_LINE_LIMIT)
+        if line < BODY_LINE_LIMIT:
+            sagging = sum(below for _, below in lines) * 2 >= len(lines)
+            found.areas.append("📉 Your hips sag below the line of your body." if sagging
+                               else "📈 Your hips pike up above the line of your body.")
+            found.tips.append("🧱 Squeeze your glutes and brace your core to keep a straight line from head to heels.")
+        else:
+            found.strengths.append("📐 You hold a straight body line.")
+
+    if len(lows) >= 3 and not shallow and statistics.pstdev(lows) > DEPTH_SPREAD_LIMIT:
+        found.areas.append("🔁 Depth varies a lot from rep to rep.")
+        found.tips.append("⏱️ Slow the lowering phase so every rep reaches the same depth.")
+
+    confidence = 1.0 - 0.15 * found.unsure
+    if total < 2:
+        confidence -= 0.4
+    if not extremes:
+        confidence -= 0.2
+    if 0.45 <= score <= 0.65:
+        confidence -= 0.1 # middling score: something is off that the rules may not name
+
+    if not found.areas:
+        overall = f"🔥 Solid set of {total} {name}s, keep it up!"
+    elif good == total:
+        overall = f"👍 All {total} {name}s were full reps; work on the points above to make them even better."
+    else:
+        overall = f"💡 {good} of {total} {name}s were full reps; fix the points above and the rest will follow."
+
+    if not found.areas:
+        found.areas.append("🌟 No major issues found in this set.")
+        found.tips.append("📈 Keep the same form as you add weight or reps.")
+    if not found.strengths:
+        found.strengths.append("🏋️ You completed the set; every set is data to build on.")
+
+    return _result(exercise_type, found.strengths, found.areas, found.tips, overall, confidence)
+
+
+def _result(exercise_type, strengths, areas, tips, overall, confidence):
+    return {
+        "title": f"Gym Form Analysis - {exercise_type.capitalize()}",
+        "strengths": strengths[:2],
+        "areas_for_improvement": areas[:2],
+        "actionable_tips": tips[:3],
+        "overall_assessment": overall,
+        "source": "local",
+        "confidence": round(max(0.0, min(1.0, confidence)), 2),
+    }
@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+
+# Same edges as mp.solutions.pose.POSE_CONNECTIONS, kept here so drawing does
+# not depend on mediapipe's generic drawing utilities.
+POSE_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 7), (0, 4), (4, 5), (5, 6), (6, 8), (9, 10),
+    (11, 12), (11, 13), (13, 15), (15, 17), (15, 19), (15, 21), (17, 19),
+    (12, 14), (14, 16), (16, 18), (16, 20), (16, 22), (18, 20),
+    (11, 23), (12, 24), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28),
+    (27, 29), (28, 30), (29, 31), (30, 32), (27, 31), (28, 32),
+)
+
+STATE_LABELS = ['TOP', 'MID', 'BOT']
+STATE_COLOURS = {
+    'TOP': (255, 0, 0),  # Blue for TOP
+    'MID': (0, 255, 0),  # Green for MID
+    'BOT': (0, 0, 255),  # Red for BOT
+}
+LANDMARK_COLOUR = (0, 255, 0)
+CONNECTION_COLOUR = (0, 0, 255)
+MIN_VISIBILITY = 0.5  # same cut off mediapipe's draw_landmarks uses
+
+
+def landmarks_to_array(landmarks):
+    """MediaPipe landmark list -> (33, 3) float array of x, y, visibility."""
+    return np.array([[lm.x, lm.y, lm.visibility] for lm in landmarks], dtype=np.float32)
+
+
+class OverlayRenderer:
+    """Draws the skeleton, angle and rep state onto frames.
+
+    Styles and connection index arrays are built once; each frame is one
+    vectorised projection, a single cv2.polylines call for every bone and a
+    cv2.circle per visible joint.
+    """
+
+    def __init__(self, width, height, connections=POSE_CONNECTIONS, thickness=2, radius=2):
+        self.scale = np.array([width, height], dtype=np.float32)
+        self.starts = np.array([a for a, _ in connections], dtype=np.intp)
+        self.ends = np.array([b for _, b in connections], dtype=np.intp)
+        self.thickness = thickness
+        self.radius = radius
+        self.font = cv2.FONT_HERSHEY_SIMPLEX
+
+    def draw(self, image, points, angle, state):
+        """points: (33, 3) array of normalised x, y and visibility."""
+        pixels = np.rint(points[:, :2] * self.scale).astype(np.int32)
+        visible = points[:, 2] >= MIN_VISIBILITY
+
+        bones = visible[self.starts] & visible[self.ends]
+        if bones.any():
+            segments = np.stack([pixels[self.starts[bones]], pixels[self.ends[bones]]], axis=1)
+            cv2.polylines(image, list(segments), False, CONNECTION_COLOUR, self.thickness)
+        for x, y in pixels[visible]:
+            cv2.circle(image, (int(x), int(y)), self.radius, LANDMARK_COLOUR, self.thickness)
+
+        colour = STATE_COLOURS.get(state, STATE_COLOURS['MID'])
+        cv2.putText(image, f"Angle: {round(angle, 1)} deg", (10, 50), self.font, 1.2, colour, 2)
+        cv2.putText(image, state, (10, 100), self.font, 1.2, colour, 2)
+
+
+class InterpolatingOverlayWriter:
+    """Annotates every output frame, not just the ones pose inference ran on.
+
+    Frames between two inferred ("key") frames are held back until the next key
+    frame arrives, then drawn with landmarks and angle linearly interpolated
+    between the two. Only the frames since the last key frame are buffered.
+    """
+
+    def __init__(self, writer, renderer):
+        self.writer = writer
+        self.renderer = renderer
+        self.pending = []  # frames waiting for the next key frame
+        self.last_key = None  # (points, angle, state) of the previous key frame, None if it had no pose
+
+    def add_frame(self, image):
+        """A frame pose inference did not run on."""
+        self.pending.append(image)
+
+    def add_keyframe(self, image, points=None, angle=0.0, state='MID'):
+        """A frame pose inference ran on; points is None when nothing should be drawn."""
+        key = (points, angle, state) if points is not None else None
+        self._flush(key)
+        if key:
+            self.renderer.draw(image, points, angle, state)
+        self.writer.write(image)
+        self.last_key = key
+
+    def close(self):
+        # trailing frames after the last key frame keep its overlay
+        self._flush(self.last_key)
+
+    def _flush(self, next_key):
+        prev = self.last_key
+        steps = len(self.pending) + 1
+        for i, image in enumerate(self.pending, start=1):
+            if prev and next_key:
+                t = i / steps
+                points = prev[0] * (1 - t) + next_key[0] * t
+                points[:, 2] = np.minimum(prev[0][:, 2], next_key[0][:, 2])
+                self.renderer.draw(image, points, prev[1] * (1 - t) + next_key[1] * t, prev[2])
+            elif prev:
+                self.renderer.draw(image, *prev)
+            self.writer.write(image)
+        self.pending = []
@@ -0,0 +1,248 @@
+import logging
+import os
+from collections import namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Every backend returns 33 of these per frame (MediaPipe BlazePose order), so
+# analyze_squat, analyze_bench_or_pull and evaluate_form work unchanged.
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+NUM_LANDMARKS = 33
+
+
+class PoseBackend:
+    """Pose inference in front of GymFormAnalyzer.
+
+    process_batch takes RGB frames (uint8, HxWx3) of one video in order, with
+    their timestamps in milliseconds, and returns for each frame a list of 33
+    Landmarks (normalised x, y) or None when no person was found.
+    """
+
+    name = "base"
+    batch_size = 1  # how many frames process_video should hand over at once
+
+    def process_batch(self, images, timestamps_ms):
+        raise NotImplementedError
+
+    def process(self, image, timestamp_ms=0):
+        return self.process_batch([image], [timestamp_ms])[0]
+
+    def reset(self):
+        """Forget tracking state before the next video."""
+
+    def close(self):
+        pass
+
+
+class LegacyPoseBackend(PoseBackend):
+    """mp.solutions.pose.Pose, one frame per call on a single graph (the original setup)."""
+
+    name = "legacy"
+
+    def __init__(self, model_complexity=1, min_detection_confidence=0.7, min_tracking_confidence=0.7):
+        import mediapipe as mp
+
+        self._options = dict(
+            static_image_mode=False,
+            model_complexity=model_complexity,
+            smooth_landmarks=True,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self._mp_pose = mp.solutions.pose
+        self.pose = self._mp_pose.Pose(**self._options)
+
+    def process_batch(self, images, timestamps_ms):
+        out = []
+        for image in images:
+            image.flags.writeable = False
+            results = self.pose.process(image)
+            image.flags.writeable = True
+            if results.pose_landmarks:
+                out.append([Landmark(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark])
+            else:
+                out.append(None)
+        return out
+
+    def reset(self):
+        # SolutionBase.reset() clears the tracker; older releases need a fresh graph
+        if hasattr(self.pose, 'reset'):
+            self.pose.reset()
+        else:
+            self.pose.close()
+            self.pose = self._mp_pose.Pose(**self._options)
+
+    def close(self):
+        self.pose.close()
+
+
+class TasksPoseBackend(PoseBackend):
+    """MediaPipe Tasks PoseLandmarker in VIDEO mode.
+
+    Needs a .task model bundle (pose_landmarker_lite/full/heavy). Frames of a
+    batch are fed one at a time in timestamp order, so batching gains nothing
+    and batch_size defaults to 1; inference runs on the XNNPACK CPU delegate,
+    which spreads each frame over several threads.
+    """
+
+    name = "tasks"
+
+    def __init__(self, model_path, min_detection_confidence=0.7, min_tracking_confidence=0.7, batch_size=1):
+        from mediapipe.tasks.python import BaseOptions
+        from mediapipe.tasks.python import vision
+
+        self._vision = vision
+        self._options = vision.PoseLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=model_path, delegate=BaseOptions.Delegate.CPU),
+            running_mode=vision.RunningMode.VIDEO,
+            num_poses=1,
+            min_pose_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+        self.batch_size = batch_size
+        self.landmarker = vision.PoseLandmarker.create_from_options(self._options)
+        self._last_ts = -1
+
+    def process_batch(self, images, timestamps_ms):
+        import mediapipe as mp
+
+        out = []
+        for image, ts in zip(images, timestamps_ms):
+            ts = max(int(ts), self._last_ts + 1)  # VIDEO mode needs strictly increasing timestamps
+            self._last_ts = ts
+            result = self.landmarker.detect_for_video(mp.Image(image_format=mp.ImageFormat.SRGB, data=image), ts)
+            if result.pose_landmarks:
+                out.append([Landmark(lm.x, lm.y, lm.z, lm.visibility) for lm in result.pose_landmarks[0]])
+            else:
+                out.append(None)
+        return out
+
+    def reset(self):
+        self.landmarker.close()
+        self.landmarker = self._vision.PoseLandmarker.create_from_options(self._options)
+        self._last_ts = -1
+
+    def close(self):
+        self.landmarker.close()
+
+
+def _fixed_dim(dim):
+    """The size of a model input dimension, or None when it is dynamic (None, symbolic name or -1)."""
+    return dim if isinstance(dim, int) and dim > 0 else None
+
+
+class OnnxPoseBackend(PoseBackend):
+    """ONNX Runtime pose model run on whole batches with several intra-op threads.
+
+    Expects a single person BlazePose style landmark model: one image input
+    (NCHW or NHWC, RGB scaled to 0..1) and a first output that reshapes to
+    (batch, >=33, >=4) with x, y, z in input pixels and a visibility logit,
+    optionally followed by a (batch, 1) person-present logit.
+
+    Frames are letterboxed into the input: scaled to fit without changing
+    their aspect ratio and padded with black, and the landmarks are mapped
+    back from the padded input to the frame. Models exported with a dynamic
+    height/width need input_size=(width, height).
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path, intra_op_threads=None, batch_size=8, min_detection_confidence=0.7, input_size=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads or os.cpu_count() or 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.channels_first, self.input_size = self._input_layout(model_input.shape, input_size)
+        # models exported with a fixed batch of 1 are still run one frame at a time
+        self.fixed_batch = _fixed_dim(model_input.shape[0]) == 1
+        self.batch_size = 1 if self.fixed_batch else batch_size
+        self.min_detection_confidence = min_detection_confidence
+
+    @staticmethod
+    def _input_layout(shape, input_size):
+        """(channels_first, (width, height)) for a model input shape; ValueError when it cannot be used."""
+        if len(shape) != 4:
+            raise ValueError(f"ONNX pose model input must be an image batch (NCHW or NHWC), got shape {shape}")
+        if _fixed_dim(shape[1]) == 3:
+            channels_first, height, width = True, shape[2], shape[3]
+        elif _fixed_dim(shape[3]) == 3:
+            channels_first, height, width = False, shape[1], shape[2]
+        else:
+            raise ValueError(f"ONNX pose model input {shape} has no 3 channel axis at position 1 (NCHW) or 3 (NHWC)")
+
+        height, width = _fixed_dim(height), _fixed_dim(width)
+        if height and width:
+            if input_size and tuple(input_size) != (width, height):
+                raise ValueError(f"POSE_INPUT_SIZE {tuple(input_size)} does not match the model input {width}x{height}")
+            return channels_first, (width, height)
+        if not input_size:
+            raise ValueError(f"ONNX pose model input {shape} has a dynamic height/width; "
+                             "set POSE_INPUT_SIZE to the (width, height) it was trained on")
+        return channels_first, (int(input_size[0]), int(input_size[1]))
+
+    def _letterbox(self, image):
+        """Image scaled into the input size with black borders, and (scale, pad_x, pad_y) to undo it."""
+        import cv2
+
+        width, height = self.input_size
+        image_height, image_width = image.shape[:2]
+        scale = min(width / image_width, height / image_height)
+        resized_width = max(1, round(image_width * scale))
+        resized_height = max(1, round(image_height * scale))
+        pad_x, pad_y = (width - resized_width) // 2, (height - resized_height) // 2
+        boxed = np.zeros((height, width, 3), dtype=np.uint8)
+        boxed[pad_y:pad_y + resized_height, pad_x:pad_x + resized_width] = cv2.resize(
+            image, (resized_width, resized_height), interpolation=cv2.INTER_AREA)
+        return boxed, (resized_width, resized_height, pad_x, pad_y)
+
+    def _prepare(self, images):
+        boxed = [self._letterbox(image) for image in images]
+        batch = np.stack([image for image, _ in boxed]).astype(np.float32) / 255.0
+        return (batch.transpose(0, 3, 1, 2) if self.channels_first else batch), [box for _, box in boxed]
+
+    def process_batch(self, images, timestamps_ms):
+        if self.fixed_batch and len(images) > 1:
+            return [self.process_batch([image], [ts])[0] for image, ts in zip(images, timestamps_ms)]
+
+        batch, boxes = self._prepare(images)
+        outputs = self.session.run(None, {self.input_name: batch})
+        raw = outputs[0].reshape(len(images), -1, outputs[0].shape[-1] if outputs[0].ndim == 3 else 5)
+        if raw.shape[1] < NUM_LANDMARKS or raw.shape[2] < 4:
+            raise RuntimeError(f"ONNX pose model output {outputs[0].shape} does not hold "
+                               f"{NUM_LANDMARKS} landmarks of x, y, z, visibility per frame")
+        present = outputs[1].reshape(len(images)) if len(outputs) > 1 else None
+
+        out = []
+        for i, (resized_width, resized_height, pad_x, pad_y) in enumerate(boxes):
+            if present is not None and 1 / (1 + np.exp(-present[i])) < self.min_detection_confidence:
+                out.append(None)
+                continue
+            points = raw[i, :NUM_LANDMARKS]
+            visibility = 1 / (1 + np.exp(-points[:, 3]))
+            # input pixels -> normalised frame coordinates; z is on the same scale as x
+            out.append([Landmark(float((p[0] - pad_x) / resized_width), float((p[1] - pad_y) / resized_height),
+                                 float(p[2] / resized_width), float(v))
+                        for p, v in zip(points, visibility)])
+        return out
+
+
+POSE_BACKENDS = {
+    "legacy": LegacyPoseBackend,
+    "tasks": TasksPoseBackend,
+    "onnx": OnnxPoseBackend,
+}
+
+
+def create_pose_backend(name="legacy", **options):
+    """Build the backend picked for this deployment; options are passed to its constructor."""
+    if name not in POSE_BACKENDS:
+        raise ValueError(f"Unknown pose backend '{name}', expected one of {', '.join(POSE_BACKENDS)}")
+    logger.info(f"Using pose backend: {name}")
+    return POSE_BACKENDS[name](**options)
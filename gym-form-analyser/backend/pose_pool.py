@@ -0,0 +1,59 @@
+import logging
+import queue
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class PosePool:
+    """A fixed set of PoseBackends so concurrent analyses never share a graph.
+
+    Every backend is built and run once on a blank frame up front, so the first
+    request does not pay for graph start-up. checkout() hands a backend to one
+    video at a time and resets its tracking state before the video starts, so
+    nothing from the previous video leaks into the first frames of the next.
+    """
+
+    def __init__(self, factory, size=1, warmup_size=(256, 256)):
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue() # the most recently used backend is the warmest
+        self._backends = []
+        for _ in range(self.size):
+            backend = factory()
+            if warmup_size:
+                backend.process(np.zeros((warmup_size[1], warmup_size[0], 3), dtype=np.uint8))
+            self._backends.append(backend)
+            self._idle.put(backend)
+        logger.info(f"Pose pool ready with {self.size} {self._backends[0].name} backends")
+
+    @property
+    def batch_size(self):
+        return self._backends[0].batch_size
+
+    @property
+    def idle(self):
+        return self._idle.qsize()
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow a freshly reset backend for one video; waits up to timeout seconds (None: forever)."""
+        started = time.monotonic()
+        try:
+            backend = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No pose backend free after {timeout}s")
+        waited = time.monotonic() - started
+        if waited > 1:
+            logger.info(f"Waited {waited:.1f}s for a pose backend")
+        try:
+            backend.reset() # no tracking state carried over from the previous video
+            yield backend
+        finally:
+            self._idle.put(backend)
+
+    def close(self):
+        for backend in self._backends:
+            backend.close()
@@ -0,0 +1,187 @@
+import logging
+import math
+import threading
+import time
+
+import cv2
+
+from video_decoders import open_video
+
+logger = logging.getLogger(__name__)
+
+# Left/right landmark indices of the joints analyze_squat / analyze_bench_or_pull track
+REQUIRED_JOINTS = {
+    "squats": {"hip": (23, 24), "knee": (25, 26), "ankle": (27, 28)},
+    "pushups": {"shoulder": (11, 12), "elbow": (13, 14), "wrist": (15, 16)},
+    "pullups": {"shoulder": (11, 12), "elbow": (13, 14), "wrist": (15, 16)},
+}
+SHOULDERS = (11, 12)
+LOWER_BODY = ((27, 28), (25, 26), (23, 24)) # ankles, knees, hips: the lowest visible one is used
+# exercises filmed with the body upright; a body lying sideways or upside down means the video is rotated
+UPRIGHT_EXERCISES = ("squats", "pullups")
+VISIBILITY = 0.7 # same cut-off as analyze_squat / analyze_bench_or_pull
+
+REASONS = ("unreadable", "no_person", "joints_not_visible", "wrong_orientation")
+
+
+class PreflightError(ValueError):
+    """The video cannot give a useful analysis; reason is one of REASONS.
+
+    frames_skipped is the number of video frames the full analysis will not decode,
+    seconds_saved estimates the wall time it would have taken.
+    """
+
+    def __init__(self, message, reason, seconds_saved=0.0, frames_skipped=0):
+        super().__init__(message)
+        self.reason = reason
+        self.seconds_saved = seconds_saved
+        self.frames_skipped = frames_skipped
+
+
+def _visible(lm, pair):
+    return max(lm[pair[0]].visibility, lm[pair[1]].visibility) >= VISIBILITY
+
+
+def _body_direction(lm, width, height):
+    """'upright', 'sideways' or 'upside_down' from the shoulders -> lower body vector in pixels (y grows downward)."""
+    lower = next((pair for pair in LOWER_BODY if _visible(lm, pair)), LOWER_BODY[-1])
+    dx = (lm[lower[0]].x + lm[lower[1]].x - lm[SHOULDERS[0]].x - lm[SHOULDERS[1]].x) / 2 * width
+    dy = (lm[lower[0]].y + lm[lower[1]].y - lm[SHOULDERS[0]].y - lm[SHOULDERS[1]].y) / 2 * height
+    if abs(dx) > abs(dy):
+        return 'sideways'
+    return 'upright' if dy > 0 else 'upside_down'
+
+
+def _rotation_flag(source):
+    cap = cv2.VideoCapture(source)
+    try:
+        return int(cap.get(cv2.CAP_PROP_ORIENTATION_META) or 0)
+    finally:
+        cap.release()
+
+
+def preflight_check(source, pose_backend, exercise_type, samples=8, analysis_width=None, seconds_per_frame=None,
+                    min_usable_share=0.3, decoder="opencv"):
+    """Run pose on `samples` evenly spaced frames and raise PreflightError if the video is unusable.
+
+    A video passes when at least min_usable_share of the sampled frames show a
+    person with the exercise's tracked joints visible (and, for upright
+    exercises, the body the right way up). The pose backend is reset
+    afterwards, so no tracking state is carried into the full run (between
+    samples the tracker simply re-detects; a reset per sample would cost more
+    than the inference). seconds_per_frame, the wall time a full analysis takes per video
+    frame, is used to estimate what a rejection saved. Wall time rather than CPU time:
+    time.process_time() counts every thread of the process, so with analyses running
+    side by side it would charge each one for the others and for the pose backend's
+    threads; wall time per frame is honest about what it measures.
+
+    Frames are read with the configured decoder (video_decoders.py). "pyav" and
+    "ffmpeg" take the keyframe at or before each position, so the probe decodes
+    `samples` frames whatever the keyframe interval; on a video with keyframes
+    far apart several positions can land on the same keyframe, which is then
+    sampled once. "opencv" seeks exactly, which decodes from the previous
+    keyframe every time: on a 2400 frame clip with a keyframe every 600 frames
+    the 8 seeks cost as much CPU as decoding the whole clip.
+
+    Returns a dict with the frames sampled, frames usable and the wall seconds spent.
+    """
+    started = time.monotonic()
+    try:
+        video = open_video(source, decoder, analysis_width, keep_full=False)
+    except Exception as e:
+        raise PreflightError(f"The video could not be read: {e}", "unreadable")
+    try:
+        total = video.frame_count
+        if total <= 0:
+            raise PreflightError("The video could not be read.", "unreadable")
+
+        # skip the first and last 5%, where people are often still walking in or out of frame
+        first, last = int(total * 0.05), max(int(total * 0.95) - 1, 0)
+        count = min(samples, last - first + 1)
+        positions = sorted({first + round(i * (last - first) / max(count - 1, 1)) for i in range(count)})
+
+        sampled = people = usable = 0
+        joints = REQUIRED_JOINTS.get(exercise_type, REQUIRED_JOINTS["squats"])
+        missing = dict.fromkeys(joints, 0) # joint -> sampled frames with a person where it was not visible
+        directions = {'upright': 0, 'sideways': 0, 'upside_down': 0}
+        seen = set() # frame indices already sampled, keyframe seeks can land on the same one
+        for index, image in video.seek_rgb(positions):
+            if index in seen:
+                continue
+            seen.add(index)
+            sampled += 1
+            landmarks = pose_backend.process(image)
+            if not landmarks:
+                continue
+            people += 1
+            absent = [joint for joint, pair in joints.items() if not _visible(landmarks, pair)]
+            for joint in absent:
+                missing[joint] += 1
+            if absent:
+                continue
+            direction = _body_direction(landmarks, *video.size)
+            directions[direction] += 1
+            if exercise_type in UPRIGHT_EXERCISES and direction != 'upright':
+                continue
+            usable += 1
+    finally:
+        video.close()
+        pose_backend.reset()
+
+    spent = time.monotonic() - started
+    needed = max(1, math.ceil(sampled * min_usable_share))
+    report = {'sampled': sampled, 'usable': usable, 'seconds': round(spent, 3)}
+    if usable >= needed:
+        return report
+
+    # without a measured cost per frame, assume the full run infers every 3rd frame at the cost of a sample
+    per_frame = seconds_per_frame if seconds_per_frame else spent / max(sampled, 1) / 3
+    saved = max(0.0, per_frame * total - spent)
+    skipped = max(0, total - sampled)
+    if sampled == 0:
+        reason, message = "unreadable", "No frames could be decoded from the video."
+    elif people < needed:
+        reason, message = "no_person", (f"No person was found in {sampled - people} of {sampled} sampled frames; "
+                                       "keep the whole body in frame and the area well lit.")
+    elif exercise_type in UPRIGHT_EXERCISES and directions['sideways'] + directions['upside_down'] >= needed:
+        turned = 'sideways' if directions['sideways'] >= directions['upside_down'] else 'upside down'
+        reason = "wrong_orientation"
+        message = f"The person appears {turned}; record the {exercise_type} with the phone upright."
+        rotation = _rotation_flag(source)
+        if rotation:
+            message += f" The video carries a {rotation} degree rotation flag; export it already rotated."
+    else:
+        worst = sorted(missing, key=missing.get, reverse=True)
+        named = [joint for joint in worst if missing[joint]][:2] or worst[:1]
+        reason = "joints_not_visible"
+        message = (f"The {' and '.join(named)} {'is' if len(named) == 1 else 'are'} not clearly visible "
+                   f"in most sampled frames; film from the side with the whole body in frame.")
+    raise PreflightError(message, reason, round(saved, 1), skipped)
+
+
+class PreflightStats:
+    """Rejections by reason, the video frames they skipped and the analysis wall time they saved, for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rejected_total = dict.fromkeys(REASONS, 0)
+        self.frames_skipped_total = 0
+        self.seconds_saved_total = 0.0
+
+    def record(self, error):
+        with self._lock:
+            self.rejected_total[error.reason] += 1
+            self.frames_skipped_total += error.frames_skipped
+            self.seconds_saved_total += error.seconds_saved
+
+    def metrics_text(self):
+        with self._lock:
+            lines = ["# TYPE analysis_preflight_rejected_total counter"]
+            lines += [f'analysis_preflight_rejected_total{{reason="{reason}"}} {count}'
+                      for reason, count in self.rejected_total.items()]
+            lines += ["# TYPE analysis_preflight_frames_skipped_total counter",
+                      f"analysis_preflight_frames_skipped_total {self.frames_skipped_total}",
+                      "# HELP analysis_preflight_wall_seconds_saved_total estimated analysis wall time, not CPU time",
+                      "# TYPE analysis_preflight_wall_seconds_saved_total counter",
+                      f"analysis_preflight_wall_seconds_saved_total {self.seconds_saved_total:.1f}"]
+            return "\n".join(lines) + "\n"
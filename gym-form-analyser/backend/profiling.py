@@ -0,0 +1,131 @@
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Statistical profiler for one thread.
+
+    A background thread looks at the target thread's Python stack every
+    `interval` seconds (sys._current_frames) and counts how often each stack
+    was seen. The profiled code is not instrumented at all, so it runs at full
+    speed apart from the sampler briefly taking the GIL.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter() # "outer;...;inner" -> samples
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        """The stacks in the collapsed format flamegraph.pl, speedscope and inferno read."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class AnalysisProfiler:
+    """Decides which analysis requests are profiled and keeps their profiles.
+
+    A request is profiled when its X-Profile header matches `token`, when the
+    ANALYSIS_PROFILE environment variable is set, or at random for
+    `sample_rate` of the requests. Each profiled set is written to `directory`
+    as <time>_<request>_set<n>_<exercise>.collapsed with its tags (request id,
+    exercise, frame count, resolution, wall time) in a .json next to it. Only
+    the newest `keep` profiles are kept.
+    """
+
+    def __init__(self, directory, token=None, sample_rate=0.0, keep=50, interval=0.005, always=None):
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.interval = interval
+        self.always = bool(os.environ.get('ANALYSIS_PROFILE')) if always is None else always
+        self.written_total = 0
+        self._lock = threading.Lock()
+
+    def wanted(self, header_value=None):
+        if header_value and self.token and hmac.compare_digest(header_value, self.token):
+            return True
+        return self.always or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def session(self, request_id, exercise_type, set_index):
+        """Profile the body on the calling thread; yields a dict for more tags (frames, width, height).
+
+        With request_id None nothing is sampled and the dict is thrown away.
+        """
+        tags = {}
+        if request_id is None:
+            yield tags
+            return
+        sampler = StackSampler(interval=self.interval).start()
+        started = time.monotonic()
+        try:
+            yield tags
+        finally:
+            sampler.stop()
+            tags.update(request_id=request_id, exercise_type=exercise_type, set=set_index,
+                        seconds=round(time.monotonic() - started, 3), samples=sampler.samples,
+                        interval_ms=self.interval * 1000)
+            try:
+                self._write(sampler, tags)
+            except OSError as e:
+                logger.warning(f"Could not write profile: {e}")
+
+    def _write(self, sampler, tags):
+        safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(tags['request_id']))[:64]
+        safe_exercise = re.sub(r'[^A-Za-z0-9_.-]', '_', str(tags['exercise_type']))[:32]
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{safe_id}_set{tags['set']}_{safe_exercise}"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, name)
+            with open(path + '.collapsed', 'w') as f:
+                f.write(sampler.collapsed())
+            with open(path + '.json', 'w') as f:
+                json.dump(tags, f, indent=2)
+            self.written_total += 1
+            self._rotate()
+        logger.info(f"Wrote profile {path}.collapsed ({sampler.samples} samples)")
+
+    def _rotate(self):
+        profiles = sorted((entry for entry in os.scandir(self.directory) if entry.name.endswith('.collapsed')),
+                          key=lambda entry: entry.stat().st_mtime)
+        for entry in profiles[:max(0, len(profiles) - self.keep)]:
+            for path in (entry.path, entry.path[:-len('.collapsed')] + '.json'):
+                if os.path.exists(path):
+                    os.unlink(path)
@@ -0,0 +1,132 @@
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Event types, in the order a set normally produces them
+SUMMARY = "summary" # rep counts and score, as soon as the frame loop ends
+VIDEO = "video" # processed video URL, after the re-encode and S3 upload
+FEEDBACK = "feedback" # AI feedback
+FAILED = "failed" # the set could not be processed
+DONE = "done" # the request finished; carries its HTTP status and response body
+
+
+class ProgressJob:
+    """Events of one analysis request, readable while it is still running.
+
+    Every event gets a sequence number (its position) and the seconds since
+    the request started, so clients can resume from the last event they saw.
+    """
+
+    def __init__(self, job_id, user_id):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.started = time.monotonic()
+        self.updated = self.started
+        self.events = []
+        self.first_result_seconds = None
+        self.done = False
+        self._cond = threading.Condition()
+
+    def start(self):
+        with self._cond:
+            self.started = time.monotonic()
+
+    def publish(self, event):
+        with self._cond:
+            now = time.monotonic()
+            event = {**event, 'seq': len(self.events), 'seconds': round(now - self.started, 3)}
+            if event['type'] == SUMMARY and self.first_result_seconds is None:
+                self.first_result_seconds = now - self.started
+            self.events.append(event)
+            self.updated = now
+            self.done = self.done or event['type'] == DONE
+            self._cond.notify_all()
+        return event
+
+    def events_after(self, seq, timeout=0.0):
+        """Events with a sequence number >= seq, waiting up to timeout seconds for the next one."""
+        with self._cond:
+            if len(self.events) <= seq and not self.done and timeout:
+                self._cond.wait(timeout)
+            return self.events[seq:]
+
+
+class ProgressStore:
+    """In-memory ProgressJobs by client supplied id, plus time-to-first-result stats.
+
+    The request and the client watching it must reach the same server process.
+    Finished jobs are dropped ttl seconds after their last event.
+    """
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.finished_total = 0
+        self.first_result_seconds_sum = 0.0
+        self.first_result_total = 0
+        self.full_result_seconds_sum = 0.0
+
+    def _prune(self):
+        now = time.monotonic()
+        for job_id in [j for j, job in self._jobs.items() if now - job.updated > self.ttl]:
+            del self._jobs[job_id]
+
+    def job(self, job_id, user_id):
+        """The job with this id, created if the watcher or the request arrives first.
+
+        Raises PermissionError when the id belongs to another user.
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._jobs[job_id] = ProgressJob(job_id, user_id)
+            if job.user_id != user_id:
+                raise PermissionError("Progress id belongs to another user")
+            return job
+
+    def finish(self, job, status, body):
+        """Publish the final response and record how long the first and the full result took."""
+        event = job.publish({'type': DONE, 'status': status, 'body': body})
+        with self._lock:
+            self.finished_total += 1
+            self.full_result_seconds_sum += event['seconds']
+            if job.first_result_seconds is not None:
+                self.first_result_total += 1
+                self.first_result_seconds_sum += job.first_result_seconds
+        if job.first_result_seconds is not None:
+            logger.info(f"Time to first result {job.first_result_seconds:.2f}s, full response {event['seconds']:.2f}s")
+
+    def metrics_text(self):
+        with self._lock:
+            return (
+                "# TYPE analysis_first_result_seconds summary\n"
+                f"analysis_first_result_seconds_sum {self.first_result_seconds_sum:.3f}\n"
+                f"analysis_first_result_seconds_count {self.first_result_total}\n"
+                "# TYPE analysis_full_result_seconds summary\n"
+                f"analysis_full_result_seconds_sum {self.full_result_seconds_sum:.3f}\n"
+                f"analysis_full_result_seconds_count {self.finished_total}\n"
+            )
+
+
+def sse_stream(job, seq=0, keepalive=15.0, idle_timeout=600):
+    """Server-Sent Events for job from sequence number seq until its DONE event.
+
+    Gives up when nothing has happened for idle_timeout seconds (the request never came).
+    """
+    while True:
+        events = job.events_after(seq, timeout=keepalive)
+        if not events:
+            if time.monotonic() - job.updated > idle_timeout:
+                return
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+            seq = event['seq'] + 1
+            if event['type'] == DONE:
+                return
@@ -0,0 +1,110 @@
+# Rep state machine used by GymFormAnalyzer.process_video.
+# Kept free of cv2/mediapipe imports so offline tools can replay recorded angle
+# sequences through exactly the same logic the server uses.
+
+STATE_CHANGE_THRESHOLD = 5  # degrees the tracked angle must move before a new state is recorded
+
+
+def track_rep_state(list_of_frames, list_of_states, angle, lastPeakOrDescent, threshold=STATE_CHANGE_THRESHOLD):
+    """Feed one tracked joint angle into the TOP/MID/BOT state machine.
+
+    list_of_frames and list_of_states are updated in place. Only angles that moved
+    more than `threshold` degrees from the last recorded one are kept.
+
+    Returns (recorded, lastPeakOrDescent) where recorded tells the caller whether
+    this frame was added (i.e. it is an "important frame").
+    """
+    if len(list_of_frames) == 0:
+        list_of_frames.append(angle)
+        list_of_states.append('MID')
+        return True, lastPeakOrDescent
+
+    if abs(list_of_frames[len(list_of_frames)-1] - angle) <= threshold:
+        return False, lastPeakOrDescent
+
+    lastStateIndex = len(list_of_states)-1
+    lastState = list_of_states[lastStateIndex]
+    lastAngleIndex = len(list_of_frames)-1
+    lastAngle = list_of_frames[lastAngleIndex]
+    list_of_frames.append(angle)
+    if lastState == 'TOP':
+        if angle < lastAngle:
+            #top means apex of ROM or eccentric stage so next is mid
+            list_of_states.append('MID')
+        else:
+            #convert it to a transition
+            list_of_states[lastAngleIndex] = 'MID'
+            list_of_states.append('TOP')
+            #mid simply signifies a transition not necessarily the angle
+    elif lastState == 'BOT':
+        if angle > lastAngle:
+            list_of_states.append('MID')
+        else:
+            list_of_states[lastAngleIndex] = 'MID'
+            #BOT means concentric stage or the bottom
+            list_of_states.append('BOT')
+    else:
+        if angle < lastAngle and lastPeakOrDescent == 'TOP':
+            #top means apex of ROM or eccentric stage
+            list_of_states.append('MID')
+        elif angle > lastAngle and lastPeakOrDescent == 'BOT':
+            list_of_states.append('MID')
+        elif angle < lastAngle:
+            lastPeakOrDescent = 'TOP'
+            #the current value implies descending
+            list_of_states[lastAngleIndex] = 'MID'
+            list_of_states.append('BOT')
+        else:
+            lastPeakOrDescent = 'BOT'
+            #the current value implies ascending
+            list_of_states[lastAngleIndex] = 'MID'
+            list_of_states.append('TOP')
+
+    return True, lastPeakOrDescent
+
+
+def count_reps_and_track_extremes(angles, states):
+    good_reps = 0
+    total_reps = 0
+
+    peak_angles = []
+    descent_angles = []
+
+    last_bot_idx = None
+
+    for i in range(len(states)):
+        state = states[i]
+
+        # Track the index of the most recent BOT
+        if state == "BOT":
+            last_bot_idx = i
+
+        # If we reach a TOP after a BOT, count as rep
+        elif state == "TOP" and last_bot_idx is not None:
+            bot_angle = angles[last_bot_idx]
+            top_angle = angles[i]
+
+            total_reps += 1
+            if bot_angle <= 90 and top_angle >= 160:
+                good_reps += 1
+
+            last_bot_idx = None  # reset for next rep
+
+        # Track local max/min for angle trends
+        if 0 < i < len(angles) - 1:
+            prev_a, curr_a, next_a = angles[i - 1], angles[i], angles[i + 1]
+            if curr_a > prev_a and curr_a > next_a:
+                peak_angles.append(curr_a)
+            elif curr_a < prev_a and curr_a < next_a:
+                descent_angles.append(curr_a)
+
+    avg_peak = sum(peak_angles) / len(peak_angles) if peak_angles else None
+    avg_descent = sum(descent_angles) / len(descent_angles) if descent_angles else None
+
+    return {
+        'good_reps': str(good_reps),
+        'bad_reps': str(total_reps - good_reps),
+        'total_reps': str(total_reps),
+        'avg_peak_angle': round(avg_peak, 2) if avg_peak is not None else -1,
+        'avg_descent_angle': round(avg_descent, 2) if avg_descent is not None else -1
+    }
@@ -0,0 +1,158 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_NAME = "index.m3u8"
+INIT_NAME = "init.mp4"
+
+
+class HLSOutput:
+    """Annotated video published as HLS (fragmented MP4 segments) while it is being written.
+
+    Stands in for the cv2.VideoWriter in GymFormAnalyzer.process_video: frames
+    are piped to ffmpeg, which encodes H.264 and cuts a segment every
+    segment_seconds. A background thread uploads each segment as soon as the
+    playlist lists it, followed by the playlist itself, so a player can start
+    on the first segments while the rest of the set is still being analysed.
+    on_ready(url) is called once the playlist and its first segment are up.
+
+    Objects go to storage (video_storage.py) under prefix/: init.mp4,
+    seg_00000.m4s, ... and index.m3u8, which gets #EXT-X-ENDLIST once the video
+    is complete.
+    """
+
+    def __init__(self, storage, prefix, segment_seconds=2, on_ready=None, poll_interval=0.5, ffmpeg='ffmpeg'):
+        self.storage = storage
+        self.prefix = prefix
+        self.segment_seconds = segment_seconds
+        self.on_ready = on_ready
+        self.poll_interval = poll_interval
+        self.ffmpeg = ffmpeg
+        self.process = None
+        self.segments = 0 # segments published so far
+        self._workdir = None
+        self._init_published = False
+        self._published_playlist = None
+        self._ready = False
+        self._error = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return self.storage.url(f"{self.prefix}/{PLAYLIST_NAME}")
+
+    def open(self, fps, size):
+        """Start the encoder for frames of size (width, height) at fps."""
+        self._workdir = tempfile.mkdtemp(prefix='hls_')
+        width, height = size
+        self._stderr = open(os.path.join(self._workdir, 'ffmpeg.log'), 'wb')
+        self.process = subprocess.Popen(
+            [self.ffmpeg, '-v', 'error', '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}',
+             '-r', str(fps or 30), '-i', 'pipe:0',
+             '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28', '-pix_fmt', 'yuv420p',
+             # a key frame at every segment boundary so segments are cut exactly segment_seconds apart
+             '-force_key_frames', f'expr:gte(t,n_forced*{self.segment_seconds})',
+             '-f', 'hls', '-hls_time', str(self.segment_seconds), '-hls_playlist_type', 'event',
+             '-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', INIT_NAME,
+             '-hls_segment_filename', os.path.join(self._workdir, 'seg_%05d.m4s'),
+             os.path.join(self._workdir, PLAYLIST_NAME)],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+        self._thread = threading.Thread(target=self._run, name=f"hls-{self.prefix}", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, frame):
+        self.process.stdin.write(np.ascontiguousarray(frame).data)
+
+    def release(self):
+        """Finish the encode and publish the remaining segments and the final playlist.
+
+        Raises subprocess.CalledProcessError when ffmpeg failed.
+        """
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        returncode = self.process.wait()
+        self._stop_publisher()
+        try:
+            if returncode != 0:
+                self._stderr.flush()
+                with open(self._stderr.name, 'rb') as f:
+                    raise subprocess.CalledProcessError(returncode, self.ffmpeg, stderr=f.read())
+            if self._error:
+                raise self._error
+            self._publish()
+        finally:
+            self._cleanup()
+        logger.info(f"Published {self.segments} HLS segments to {self.url}")
+
+    def abort(self):
+        """Stop without publishing anything more (the analysis failed)."""
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdin.close()
+        self.process.wait()
+        self._stop_publisher()
+        self._cleanup()
+
+    def _stop_publisher(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _cleanup(self):
+        self._stderr.close()
+        shutil.rmtree(self._workdir, ignore_errors=True)
+        self.process = None
+
+    def _run(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self._publish()
+            except Exception as e:
+                logger.error(f"Publishing HLS segments failed: {e}")
+                self._error = e
+                return
+
+    def _publish(self):
+        """Upload the segments the playlist lists that are not up yet, then the playlist."""
+        try:
+            with open(os.path.join(self._workdir, PLAYLIST_NAME)) as f:
+                playlist = f.read() # ffmpeg renames a finished playlist into place, so this is never half written
+        except FileNotFoundError:
+            return
+        listed = [line for line in playlist.splitlines() if line and not line.startswith('#')]
+        if playlist == self._published_playlist or not listed:
+            return
+
+        if not self._init_published and listed:
+            self._put(INIT_NAME, 'video/mp4')
+            self._init_published = True
+        for name in listed[self.segments:]:
+            self._put(name, 'video/iso.segment')
+            os.unlink(os.path.join(self._workdir, name))
+            self.segments += 1
+
+        # upload the copy that was read, the file itself may already list newer segments
+        snapshot = os.path.join(self._workdir, 'published.m3u8')
+        with open(snapshot, 'w') as f:
+            f.write(playlist)
+        self.storage.put_file(snapshot, f"{self.prefix}/{PLAYLIST_NAME}", 'application/vnd.apple.mpegurl',
+                              cache_control='no-cache')
+        self._published_playlist = playlist
+        if not self._ready:
+            self._ready = True
+            if self.on_ready:
+                self.on_ready(self.url)
+
+    def _put(self, name, content_type):
+        self.storage.put_file(os.path.join(self._workdir, name), f"{self.prefix}/{name}", content_type)
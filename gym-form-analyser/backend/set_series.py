@@ -0,0 +1,194 @@
+from form_scoring import evaluate_form, final_score, score_frame
+from gemini_payload import MAX_SAMPLE_FRAMES
+from rep_tracking import track_rep_state, count_reps_and_track_extremes, STATE_CHANGE_THRESHOLD
+
+# What GymFormAnalyzer keeps of a set while its frame loop runs: the tracked
+# angle, rep state and landmarks of every important frame, and from that the
+# rep counts, the form score and the frames sent to Gemini.
+# SetSeries keeps full lists, StreamingSetSeries keeps a fixed amount no matter
+# how long the video is. Both share the cv2 free rep and scoring code.
+
+
+class SetSeries:
+    """Every important frame of the set, in lists (the default)."""
+
+    def __init__(self, exercise_type, threshold=STATE_CHANGE_THRESHOLD):
+        self.exercise_type = exercise_type
+        self.threshold = threshold
+        self.angles = []
+        self.states = []
+        self.landmarks = []
+        self._last_peak_or_descent = 'MID'
+
+    def add(self, angle, landmarks):
+        """Feed the tracked angle of one inferred frame; returns whether it was recorded as important."""
+        recorded, self._last_peak_or_descent = track_rep_state(
+            self.angles, self.states, angle, self._last_peak_or_descent, self.threshold)
+        if recorded:
+            self.landmarks.append(landmarks)
+        return recorded
+
+    @property
+    def state(self):
+        """State of the latest important frame (what the overlay shows)."""
+        return self.states[-1] if self.states else 'MID'
+
+    @property
+    def recorded(self):
+        return len(self.angles)
+
+    def rep_stats(self):
+        return count_reps_and_track_extremes(self.angles, self.states)
+
+    def score(self):
+        return evaluate_form(self.landmarks, self.states, self.exercise_type)
+
+    def gemini_input(self):
+        """(landmarks, states, angles, frame_numbers) for send_to_gemini."""
+        return self.landmarks, self.states, self.angles, None
+
+
+class StreamingSetSeries:
+    """Same results as SetSeries in memory that does not grow with the video.
+
+    track_rep_state may still turn the latest state into MID when the next
+    angle arrives, so only the last two important frames are kept and each
+    frame is folded into the rep, extreme and score totals once the next one
+    has been recorded.
+
+    For Gemini it keeps the first and last frame, the TOP/BOT extremes and an
+    evenly spaced sample of all frames, each list at most `capacity` long:
+    when a list fills up every other entry is dropped and only every 2nd (4th,
+    ...) frame is taken from then on. Up to `capacity` extremes the frames sent
+    are exactly the ones SetSeries would send; beyond that they stay evenly
+    spread over the set.
+    """
+
+    def __init__(self, exercise_type, threshold=STATE_CHANGE_THRESHOLD, max_frames=MAX_SAMPLE_FRAMES, capacity=None):
+        self.exercise_type = exercise_type
+        self.threshold = threshold
+        self.max_frames = max_frames
+        self.capacity = max(capacity or 4 * max_frames, max_frames)
+        self.recorded = 0
+        # the latest two important frames; the older one is final
+        self._angles = []
+        self._states = []
+        self._landmarks = []
+        self._last_peak_or_descent = 'MID'
+        self._finalised = 0
+        # count_reps_and_track_extremes, one frame at a time
+        self._last_bot_angle = None
+        self._total_reps = 0
+        self._good_reps = 0
+        self._previous_angle = None
+        self._peak_sum = self._peak_count = 0
+        self._descent_sum = self._descent_count = 0
+        # evaluate_form
+        self._score_sum = 0.0
+        self._score_count = 0
+        # frames Gemini may need: (frame number, landmarks, state, angle)
+        self._first = None
+        self._last = None
+        self._extremes = []
+        self._extremes_seen = 0
+        self._extreme_stride = 1
+        self._sample = []
+        self._sample_stride = 1
+
+    def add(self, angle, landmarks):
+        recorded, self._last_peak_or_descent = track_rep_state(
+            self._angles, self._states, angle, self._last_peak_or_descent, self.threshold)
+        if not recorded:
+            return False
+        self.recorded += 1
+        self._landmarks.append(landmarks)
+        if len(self._angles) == 2:
+            self._finalise(self._angles.pop(0), self._states.pop(0), self._landmarks.pop(0), self._angles[0])
+        return True
+
+    @property
+    def state(self):
+        return self._states[-1] if self._states else 'MID'
+
+    def _finalise(self, angle, state, landmarks, next_angle):
+        number = self._finalised
+        self._finalised += 1
+
+        if state == "BOT":
+            self._last_bot_angle = angle
+        elif state == "TOP" and self._last_bot_angle is not None:
+            self._total_reps += 1
+            if self._last_bot_angle <= 90 and angle >= 160:
+                self._good_reps += 1
+            self._last_bot_angle = None
+
+        if self._previous_angle is not None and next_angle is not None:
+            if angle > self._previous_angle and angle > next_angle:
+                self._peak_sum += angle
+                self._peak_count += 1
+            elif angle < self._previous_angle and angle < next_angle:
+                self._descent_sum += angle
+                self._descent_count += 1
+        self._previous_angle = angle
+
+        score = score_frame(landmarks, state, self.exercise_type)
+        if score is not None:
+            self._score_sum += score
+            self._score_count += 1
+
+        entry = (number, landmarks, state, angle)
+        if number == 0:
+            self._first = entry
+        self._last = entry
+        if number % self._sample_stride == 0:
+            self._sample.append(entry)
+            if len(self._sample) > self.capacity:
+                self._sample = self._sample[::2]
+                self._sample_stride *= 2
+        if state in ("TOP", "BOT"):
+            if self._extremes_seen % self._extreme_stride == 0:
+                self._extremes.append(entry)
+                if len(self._extremes) > self.capacity:
+                    self._extremes = self._extremes[::2]
+                    self._extreme_stride *= 2
+            self._extremes_seen += 1
+
+    def _finish(self):
+        """Fold in the latest important frame; its state is final once the video has ended."""
+        if self._angles:
+            self._finalise(self._angles.pop(), self._states.pop(), self._landmarks.pop(), None)
+
+    def rep_stats(self):
+        self._finish()
+        avg_peak = self._peak_sum / self._peak_count if self._peak_count else None
+        avg_descent = self._descent_sum / self._descent_count if self._descent_count else None
+        return {
+            'good_reps': str(self._good_reps),
+            'bad_reps': str(self._total_reps - self._good_reps),
+            'total_reps': str(self._total_reps),
+            'avg_peak_angle': round(avg_peak, 2) if avg_peak is not None else -1,
+            'avg_descent_angle': round(avg_descent, 2) if avg_descent is not None else -1
+        }
+
+    def score(self):
+        self._finish()
+        if self._finalised < 3 or not self._score_count:
+            return 0.0
+        # the mean of all frame scores, through the same floor and rounding as evaluate_form
+        return final_score([self._score_sum / self._score_count])
+
+    def gemini_input(self):
+        """(landmarks, states, angles, frame_numbers) of the candidate frames, for send_to_gemini.
+
+        encode_pose_table runs the usual select_rep_frames over these, so with
+        no frames dropped it picks the same frames as it would from SetSeries.
+        """
+        self._finish()
+        if self._finalised <= self.max_frames or self._extremes_seen < 2:
+            # short set (everything is still in the sample) or no reps found: uniform stride
+            entries = self._sample
+        else:
+            by_number = {entry[0]: entry for entry in (self._first, *self._extremes, self._last)}
+            entries = [by_number[number] for number in sorted(by_number)]
+        return ([entry[1] for entry in entries], [entry[2] for entry in entries],
+                [entry[3] for entry in entries], [entry[0] for entry in entries])
@@ -0,0 +1,56 @@
+import importlib
+import os
+import sys
+import time
+
+import pytest
+
+# the backend modules are imported the way app.py imports them, from gym-form-analyser/backend
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """app.py imported with mongomock in place of MongoDB; skips without flask, mongomock or a config.py."""
+    pytest.importorskip("flask")
+    pytest.importorskip("config") # config.py is not in the repository
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    real_client = pymongo.MongoClient
+    pymongo.MongoClient = mongomock.MongoClient # app connects at import time
+    try:
+        return importlib.import_module("app")
+    finally:
+        pymongo.MongoClient = real_client
+
+
+@pytest.fixture
+def fake_analysis(app_module, monkeypatch, tmp_path):
+    """Analysis without video work: each set's Gemini call answers after `delay` seconds."""
+    delay = 0.0
+
+    def answer(path):
+        time.sleep(delay)
+        return {"overall_assessment": path}
+
+    def process_video(path, output_path, exercise_type, analysis_type, feedback_dispatcher=None, output_stream=None):
+        open(output_path, "wb").close()
+        pending = feedback_dispatcher.submit(lambda: answer(path))
+        return {'summary': {'total_reps': '3', 'score': '0.8'}, 'video': {'frames': 90},
+                'gemini_feedback_pending': pending}
+
+    monkeypatch.setattr(app_module, "OUTPUT_MODE", "mp4")
+    monkeypatch.setattr(app_module.analyzer, "process_video", process_video)
+    monkeypatch.setattr(app_module, "encode_and_upload", lambda raw_path: f"https://videos/{raw_path}")
+
+    def uploads(count, feedback_delay=0.0):
+        nonlocal delay
+        delay = feedback_delay
+        result = []
+        for index in range(count):
+            path = tmp_path / f"set{index}.mp4"
+            path.write_bytes(b"video")
+            result.append(app_module.Upload(f"set{index}.mp4", str(path), 3.0, f"digest{index}"))
+        return result
+    return uploads
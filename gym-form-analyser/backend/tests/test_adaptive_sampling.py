@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from adaptive_sampling import AdaptiveSampler, FixedSampler, LandmarkSmoother, OneEuroFilter
+from rep_tracking import count_reps_and_track_extremes
+from tools.bench_adaptive_sampling import fixture_set
+from tools.replay import replay
+
+FIXTURES = fixture_set()
+
+
+def run(fixture, sampler, smoother=None):
+    replayed = replay(fixture["frames"], fixture["exercise"], sampler=sampler, smoother=smoother,
+                      fps=fixture.get("fps", 30))
+    counted = count_reps_and_track_extremes(replayed["angles"], replayed["states"])
+    return replayed["processed_frames"], int(counted["total_reps"]), int(counted["good_reps"])
+
+
+def test_adaptive_makes_fewer_pose_calls_than_fixed_stride():
+    fixed = sum(run(fixture, FixedSampler(3))[0] for fixture in FIXTURES)
+    adaptive = sum(run(fixture, AdaptiveSampler(), LandmarkSmoother())[0] for fixture in FIXTURES)
+    assert adaptive < 0.85 * fixed
+
+
+@pytest.mark.parametrize("fixture", FIXTURES, ids=lambda fixture: f"{fixture['name']}-{fixture['fps']}fps")
+def test_adaptive_counts_reps_exactly(fixture):
+    _, total, good = run(fixture, AdaptiveSampler(), LandmarkSmoother())
+    assert (total, good) == (fixture["labels"]["total_reps"], fixture["labels"]["good_reps"])
+
+
+def uneven_times(count, seed=0):
+    # frame gaps from 1 ms to 0.4 s, as with dropped frames and variable frame rate phone videos
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.choice([0.001, 0.01, 1 / 30, 0.1, 0.4], size=count))
+
+
+def smooth(values, times):
+    smoothing = OneEuroFilter()
+    return np.array([smoothing(np.array([x]), t)[0] for x, t in zip(values, times)])
+
+
+def test_one_euro_stable_with_uneven_timestamps():
+    times = uneven_times(2000)
+    noisy = np.sin(times * 2) + np.random.default_rng(1).normal(0, 0.02, size=len(times))
+    smoothed = smooth(noisy, times)
+
+    assert np.all(np.isfinite(smoothed))
+    # every output is a blend of inputs, never beyond them
+    assert smoothed.min() >= noisy.min() and smoothed.max() <= noisy.max()
+
+
+def test_one_euro_step_settles_without_overshoot():
+    times = uneven_times(300, seed=2)
+    smoothed = smooth(np.where(np.arange(300) < 100, 0.0, 1.0), times)
+    assert np.all(np.diff(smoothed) >= 0) # no ringing, however the frames are spaced
+    assert smoothed[-1] == pytest.approx(1.0, abs=1e-3)
+
+
+def test_one_euro_reduces_jitter_while_still():
+    times = uneven_times(1000, seed=3)
+    noisy = 0.5 + np.random.default_rng(4).normal(0, 0.01, size=len(times))
+    assert np.std(smooth(noisy, times)[50:]) < 0.7 * np.std(noisy[50:])
+
+
+def test_one_euro_holds_a_constant_and_restarts_on_repeated_time():
+    smoothing = OneEuroFilter()
+    for t in uneven_times(200):
+        assert smoothing(np.full(3, 0.5), t) == pytest.approx(np.full(3, 0.5))
+    # a timestamp that does not move forward starts the filter again instead of dividing by zero
+    assert smoothing(np.full(3, 0.9), t) == pytest.approx(np.full(3, 0.9))
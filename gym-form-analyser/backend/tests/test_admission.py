@@ -0,0 +1,130 @@
+import io
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, OverCapacityError, RequestTooLargeError
+
+USER = "user-1"
+
+
+def test_slots_are_first_come_first_served():
+    admission = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+    order = []
+    first = admission.admit("a", [10])
+    first.__enter__()
+
+    def request(user):
+        with admission.admit(user, [10]):
+            order.append(user)
+            time.sleep(0.05)
+
+    waiter = threading.Thread(target=request, args=("waiting",))
+    waiter.start()
+    while not admission.metrics()["analysis_queue_depth"]:
+        time.sleep(0.01)
+    first.__exit__(None, None, None)
+    # the slot was freed before the newcomer arrived, but the waiting request gets it
+    request("newcomer")
+    waiter.join()
+    assert order == ["waiting", "newcomer"]
+
+
+def test_queue_timeout_frees_the_queue():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.1)
+    with admission.admit("a", [10]):
+        with pytest.raises(OverCapacityError) as refused:
+            with admission.admit("b", [10]):
+                pass
+        assert refused.value.reason == "queue_timeout"
+        assert admission.metrics()["analysis_queue_depth"] == 0
+    with admission.admit("b", [10]):
+        pass
+
+
+def test_user_entries_are_dropped_once_empty(monkeypatch):
+    admission = AdmissionController(max_concurrent=2, window_seconds=60)
+    for user in ("a", "b"):
+        with admission.admit(user, [30]):
+            pass
+    assert set(admission._user_charges) == {"a", "b"} and not admission._user_sets
+
+    later = time.monotonic() + 61
+    monkeypatch.setattr("admission.time.monotonic", lambda: later)
+    with admission.admit("c", [30]):
+        pass
+    # a and b have nothing left in the window, so they are forgotten
+    assert set(admission._user_charges) == {"c"}
+
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    """Test client with a small AdmissionController and a stubbed analysis; set lengths come from the file content."""
+    import jwt
+
+    admission = AdmissionController(max_concurrent=1, max_queue=0, max_user_sets=3, max_user_video_seconds=100,
+                                    window_seconds=3600)
+    monkeypatch.setattr(app_module, "admission", admission)
+    monkeypatch.setattr(app_module, "video_seconds", lambda path: float(open(path).read()))
+    calls = []
+
+    def process_videos(uploads, *args, **kwargs):
+        calls.append(len(uploads))
+        if client.fail:
+            raise RuntimeError("analysis crashed")
+        return [], 0, len(uploads), []
+
+    monkeypatch.setattr(app_module, "process_videos", process_videos)
+    token = jwt.encode({"user_id": USER}, app_module.app.config["JWT_SECRET_KEY"], algorithm="HS256")
+    client = app_module.app.test_client()
+    client.admission, client.calls, client.fail = admission, calls, False
+
+    def analyse(*seconds):
+        data = {"exercise_type": "squats", "video": [(io.BytesIO(str(s).encode()), f"set{i}.mp4")
+                                                     for i, s in enumerate(seconds)]}
+        return client.post("/upload_and_analyze", data=data, content_type="multipart/form-data",
+                           headers={"Authorization": f"Bearer {token}"})
+    client.analyse = analyse
+    return client
+
+
+def test_admitted_request_runs(client):
+    response = client.analyse(10, 20)
+    assert response.status_code == 200
+    assert client.calls == [2]
+
+
+def test_busy_server_gives_429_with_retry_after(client):
+    with client.admission.admit("someone else", [10]):
+        response = client.analyse(10)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert client.admission.rejected_total["queue_full"] == 1
+    assert client.calls == []
+
+
+def test_user_over_quota_gives_429_with_retry_after(client):
+    assert client.analyse(60).status_code == 200
+    response = client.analyse(60) # 120s in the window, limit 100
+    assert response.status_code == 429
+    assert 3500 < int(response.headers["Retry-After"]) <= 3600 # until the first request leaves the window
+
+
+@pytest.mark.parametrize("seconds, reason", [((10, 10, 10, 10), "too_many_sets"), ((150,), "too_much_video")])
+def test_request_over_a_limit_on_its_own_gives_413(client, seconds, reason):
+    response = client.analyse(*seconds)
+    assert response.status_code == 413
+    assert response.get_json()["reason"] == reason
+    assert "Retry-After" not in response.headers
+    assert client.calls == []
+
+
+def test_failed_analysis_releases_the_users_sets(client):
+    client.fail = True
+    assert client.analyse(10, 10, 10).status_code == 500
+    assert USER not in client.admission._user_sets
+    assert client.admission.metrics()["analysis_running"] == 0
+
+    client.fail = False
+    assert client.analyse(10, 10, 10).status_code == 200
@@ -0,0 +1,70 @@
+import io
+import uuid
+
+import pytest
+
+from checkpoints import IdempotencyError, SetCheckpoints
+
+USER = "checkpoint-user"
+
+
+@pytest.fixture
+def collection():
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient().db.analysis_checkpoints
+
+
+def test_same_key_with_other_videos_is_refused(collection):
+    first = SetCheckpoints(collection, USER, "key", {'path': '/upload_and_analyze', 'videos': ["a", "b"]})
+    first.claim()
+    first.release()
+
+    retry = SetCheckpoints(collection, USER, "key", {'path': '/upload_and_analyze', 'videos': ["a", "c"]})
+    with pytest.raises(IdempotencyError, match=r"\(videos differ\)") as error:
+        retry.claim()
+    assert error.value.status == 422
+
+
+def test_identical_videos_in_one_request_are_two_sets(app_module, fake_analysis, collection):
+    fingerprint = {'path': '/upload_and_analyze', 'videos': ["same", "same"]}
+    checkpoint = SetCheckpoints(collection, USER, "twins", fingerprint)
+    checkpoint.claim()
+    uploads = [upload._replace(digest="same") for upload in fake_analysis(2)]
+    results, _, _, _ = app_module.process_videos(uploads, "squats", "FULL", checkpoint=checkpoint)
+    checkpoint.release()
+
+    ids = [result['id'] for result in results]
+    assert len(set(ids)) == 2
+
+    # a retry reuses each set's own entry
+    retry = SetCheckpoints(collection, USER, "twins", fingerprint)
+    retry.claim()
+    assert [retry.get(index, "same")['id'] for index in range(2)] == ids
+
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    import jwt
+
+    monkeypatch.setattr(app_module, "video_seconds", lambda path: 10.0)
+    monkeypatch.setattr(app_module, "process_videos", lambda uploads, *args, **kwargs: ([], 0, len(uploads), []))
+    token = jwt.encode({"user_id": USER}, app_module.app.config["JWT_SECRET_KEY"], algorithm="HS256")
+    client = app_module.app.test_client()
+
+    def analyse(key, *videos):
+        data = {"exercise_type": "squats", "video": [(io.BytesIO(video), f"set{i}.mp4")
+                                                     for i, video in enumerate(videos)]}
+        return client.post("/upload_and_analyze", data=data, content_type="multipart/form-data",
+                           headers={"Authorization": f"Bearer {token}", "Idempotency-Key": key})
+    client.analyse = analyse
+    return client
+
+
+def test_reused_key_with_other_videos_gives_422(client):
+    key = uuid.uuid4().hex
+    assert client.analyse(key, b"first", b"second").status_code == 200
+    assert client.analyse(key, b"first", b"second").status_code == 200 # replayed
+
+    response = client.analyse(key, b"first", b"other")
+    assert response.status_code == 422
+    assert "videos differ" in response.get_json()['error']
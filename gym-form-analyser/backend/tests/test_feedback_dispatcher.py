@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+import feedback_dispatcher
+from feedback_dispatcher import CircuitBreaker, FeedbackDispatcher, as_completed
+from tools.bench_feedback_dispatcher import StubGemini
+
+FALLBACK = {"overall_assessment": "local", "source": "local"}
+
+
+class Clock:
+    """Stands in for time.monotonic during a test, so the breaker's reset_timeout passes at once."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(feedback_dispatcher.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = FeedbackDispatcher(max_workers=4, timeout=0.5,
+                                    breaker=CircuitBreaker(failure_threshold=2, reset_timeout=0.3))
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+def test_stub_takes_send_to_gemini_arguments():
+    stub = StubGemini(latency=0, jitter=0)
+    assert stub([], "squats", "FULL", states=[], angles=[], frame_numbers=[])["overall_assessment"] == "ok"
+
+
+def test_breaker_opens_half_opens_and_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow() # one trial call
+    assert not breaker.allow()
+    breaker.record_failure() # the trial failed: open again for another reset_timeout
+    assert breaker.state == "open"
+
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failing_api_opens_breaker_and_later_calls_skip_it(dispatcher):
+    stub = StubGemini(latency=0, jitter=0, failure_rate=1.0)
+    for _ in range(2):
+        assert "error" in dispatcher.submit(stub, [], "squats").result()
+    assert dispatcher.breaker.state == "open"
+
+    started = time.monotonic()
+    assert "temporarily unavailable" in dispatcher.submit(stub, [], "squats").result()["error"]
+    assert time.monotonic() - started < 0.05
+    assert stub.calls == 2
+
+    time.sleep(0.3)
+    healthy = StubGemini(latency=0, jitter=0)
+    assert dispatcher.submit(healthy, [], "squats").result()["overall_assessment"] == "ok"
+    assert dispatcher.breaker.state == "closed"
+
+
+def test_deadline_gives_timeout_error_and_counts_once(dispatcher):
+    stub = StubGemini(latency=1.0, jitter=0)
+    started = time.monotonic()
+    result = dispatcher.submit(stub, [], "squats").result()
+    assert "timed out" in result["error"]
+    assert 0.4 < time.monotonic() - started < 0.8
+    assert dispatcher.breaker._failures == 1
+    time.sleep(0.6) # the late answer must not be counted again
+    assert dispatcher.breaker._failures == 1
+
+
+@pytest.mark.parametrize("stub", [StubGemini(latency=0, jitter=0, failure_rate=1.0), StubGemini(latency=1.0, jitter=0)],
+                         ids=["failure", "timeout"])
+def test_fallback_replaces_errors(dispatcher, stub):
+    assert dispatcher.submit(stub, [], "squats", fallback=FALLBACK).result() is FALLBACK
+
+
+def test_fallback_while_breaker_open(dispatcher):
+    dispatcher.breaker.record_failure()
+    dispatcher.breaker.record_failure()
+    stub = StubGemini(latency=0, jitter=0)
+    assert dispatcher.submit(stub, [], "squats", fallback=FALLBACK).result() is FALLBACK
+    assert stub.calls == 0
+
+
+def test_fallback_not_used_on_success(dispatcher):
+    result = dispatcher.submit(StubGemini(latency=0, jitter=0), [], "squats", fallback=FALLBACK).result()
+    assert result["overall_assessment"] == "ok"
+
+
+def test_as_completed_yields_in_finishing_order(dispatcher):
+    latencies = [0.3, 0.05, 1.0, 0.15] # the third runs past the 0.5 s deadline
+    pendings = [dispatcher.submit(StubGemini(latency=latency, jitter=0), [], "squats") for latency in latencies]
+
+    order = []
+    started = time.monotonic()
+    for pending in as_completed(pendings):
+        order.append(pendings.index(pending))
+        assert pending.done() or pending is pendings[2] # yielded at its deadline, still running
+    assert order == [1, 3, 0, 2]
+    assert "timed out" in pendings[2].result()["error"]
+    assert time.monotonic() - started < 0.8
@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("config") # config.py is not in the repository
+pytest.importorskip("mediapipe")
+
+from feedback_dispatcher import CircuitBreaker, FeedbackDispatcher
+from tools.bench_feedback_dispatcher import StubGemini
+from tools.local_feedback_report import fill_series
+from tools.synthetic_pose import make_sequence
+from video_processor import GymFormAnalyzer
+
+
+class NoPose:
+    name = "none"
+    batch_size = 1
+
+    def reset(self):
+        pass
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = GymFormAnalyzer(pose_backend=NoPose())
+    analyzer.gemini_model = object() # configured, but every call goes to the stub
+    analyzer.feedback_min_confidence = 0.7
+    analyzer.feedback_fallback = True
+    return analyzer
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = FeedbackDispatcher(timeout=0.5, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+def finished_set(reps):
+    series = fill_series(make_sequence("squats", reps=reps, seed=1)["frames"], "squats")
+    return series, series.score()
+
+
+def use_gemini(analyzer, stub, mode):
+    analyzer.feedback_mode = mode
+    analyzer.send_to_gemini = stub
+    return stub
+
+
+def test_router_keeps_confident_sets_local(analyzer):
+    stub = use_gemini(analyzer, StubGemini(latency=0, jitter=0), "router")
+    feedback = analyzer.route_feedback(*finished_set(5), "squats")["gemini_feedback"]
+    assert feedback["source"] == "local" and feedback["confidence"] >= 0.7
+    assert stub.calls == 0
+
+
+def test_router_asks_gemini_when_unsure(analyzer):
+    stub = use_gemini(analyzer, StubGemini(latency=0, jitter=0), "router")
+    feedback = analyzer.route_feedback(*finished_set(1), "squats")["gemini_feedback"]
+    assert feedback["overall_assessment"] == "ok"
+    assert stub.calls == 1
+
+
+@pytest.mark.parametrize("mode", ["gemini", "router"])
+def test_falls_back_to_local_when_gemini_fails(analyzer, mode):
+    use_gemini(analyzer, lambda *args, **kwargs: {"error": "Error getting feedback from AI: 503"}, mode)
+    feedback = analyzer.route_feedback(*finished_set(1), "squats")["gemini_feedback"]
+    assert feedback["source"] == "local"
+
+
+def test_falls_back_to_local_when_dispatched_call_fails_or_breaker_open(analyzer, dispatcher):
+    stub = use_gemini(analyzer, StubGemini(latency=0, jitter=0, failure_rate=1.0), "gemini")
+    pending = analyzer.route_feedback(*finished_set(5), "squats", feedback_dispatcher=dispatcher)
+    assert pending["gemini_feedback_pending"].result()["source"] == "local"
+    assert dispatcher.breaker.state == "open"
+
+    pending = analyzer.route_feedback(*finished_set(5), "squats", feedback_dispatcher=dispatcher)
+    assert pending["gemini_feedback_pending"].result()["source"] == "local"
+    assert stub.calls == 1 # the open breaker kept the second call from reaching Gemini
+
+
+def test_error_passed_through_without_fallback(analyzer):
+    use_gemini(analyzer, lambda *args, **kwargs: {"error": "Gemini API not configured."}, "gemini")
+    analyzer.feedback_fallback = False
+    assert "error" in analyzer.route_feedback(*finished_set(5), "squats")["gemini_feedback"]
+
+
+@pytest.mark.parametrize("mode, analysis_type", [("local", "FULL"), ("gemini", "QUICK")])
+def test_local_mode_and_quick_never_call_gemini(analyzer, mode, analysis_type):
+    stub = use_gemini(analyzer, StubGemini(latency=0, jitter=0), mode)
+    feedback = analyzer.route_feedback(*finished_set(1), "squats", analysis_type)["gemini_feedback"]
+    assert feedback["source"] == "local"
+    assert stub.calls == 0
@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from segmented_output import HLSOutput, INIT_NAME, PLAYLIST_NAME
+from video_storage import LocalStorage
+
+pytestmark = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="needs ffmpeg on PATH")
+
+
+def write_video(output, seconds, fps=10, size=(64, 48)):
+    rng = np.random.default_rng(0)
+    output.open(fps, size)
+    for _ in range(int(seconds * fps)):
+        output.write(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(tmp_path / "media")
+
+
+def test_playlist_segments_and_init_published(storage):
+    ready = []
+    output = HLSOutput(storage, "processed_test", segment_seconds=1, on_ready=ready.append, poll_interval=0.05)
+    write_video(output, 3.5)
+    output.release()
+
+    with open(storage.path(f"processed_test/{PLAYLIST_NAME}")) as f:
+        playlist = f.read()
+    segments = [line for line in playlist.splitlines() if line and not line.startswith("#")]
+    assert segments == [f"seg_{i:05d}.m4s" for i in range(4)]
+    assert f'#EXT-X-MAP:URI="{INIT_NAME}"' in playlist
+    assert playlist.rstrip().endswith("#EXT-X-ENDLIST")
+    for name in [INIT_NAME, *segments]:
+        assert os.path.getsize(storage.path(f"processed_test/{name}")) > 0
+    assert output.segments == 4
+    assert ready == ["/media/processed_test/index.m3u8"] == [output.url]
+
+
+def test_abort_publishes_nothing_more(storage):
+    output = HLSOutput(storage, "processed_aborted", segment_seconds=1, poll_interval=60)
+    write_video(output, 2.5)
+    workdir = output._workdir
+    output.abort()
+
+    assert not os.path.exists(storage.path(f"processed_aborted/{PLAYLIST_NAME}"))
+    assert not os.path.exists(workdir)
+
+
+def test_published_files_served_under_media(app_module, monkeypatch, storage):
+    monkeypatch.setattr(app_module, "video_storage", storage)
+    output = HLSOutput(storage, "processed_served", segment_seconds=1, poll_interval=0.05)
+    write_video(output, 1.5)
+    output.release()
+    client = app_module.app.test_client()
+
+    for name in (PLAYLIST_NAME, INIT_NAME, "seg_00000.m4s"):
+        response = client.get(f"/media/processed_served/{name}")
+        assert response.status_code == 200
+        with open(storage.path(f"processed_served/{name}"), "rb") as f:
+            assert response.data == f.read()
+        response.close()
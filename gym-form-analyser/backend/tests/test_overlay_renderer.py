@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from overlay_renderer import InterpolatingOverlayWriter
+
+
+class FakeWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, image):
+        self.frames.append(int(image[0, 0, 0]))
+
+
+class RecordingRenderer:
+    def __init__(self):
+        self.drawn = {} # frame number -> (points, angle, state)
+
+    def draw(self, image, points, angle, state):
+        self.drawn[int(image[0, 0, 0])] = (points.copy(), angle, state)
+
+
+def frame(number):
+    return np.full((2, 2, 3), number, dtype=np.uint8)
+
+
+def pose(x, visibility=1.0):
+    points = np.zeros((33, 3), dtype=np.float32)
+    points[:, 0] = x
+    points[:, 1] = 1 - x
+    points[:, 2] = visibility
+    return points
+
+
+def test_every_frame_is_written_in_order():
+    writer = FakeWriter()
+    overlay = InterpolatingOverlayWriter(writer, RecordingRenderer())
+    overlay.add_frame(frame(0)) # before the first key frame
+    for number in range(1, 10):
+        if number % 3 == 1:
+            overlay.add_keyframe(frame(number), pose(0.1 * number), 90.0, 'MID')
+        else:
+            overlay.add_frame(frame(number))
+    overlay.close()
+
+    assert writer.frames == list(range(10))
+
+
+def test_skeleton_between_key_frames_is_interpolated():
+    renderer = RecordingRenderer()
+    overlay = InterpolatingOverlayWriter(FakeWriter(), renderer)
+    overlay.add_keyframe(frame(0), pose(0.2, visibility=0.9), 100.0, 'TOP')
+    overlay.add_frame(frame(1))
+    overlay.add_frame(frame(2))
+    overlay.add_keyframe(frame(3), pose(0.8, visibility=0.6), 160.0, 'MID')
+    overlay.close()
+
+    for number in (1, 2):
+        t = number / 3
+        points, angle, state = renderer.drawn[number]
+        assert points[:, 0] == pytest.approx(0.2 * (1 - t) + 0.8 * t)
+        assert points[:, 1] == pytest.approx(0.8 * (1 - t) + 0.2 * t)
+        assert points[:, 2] == pytest.approx(0.6) # only as visible as the less visible neighbour
+        assert angle == pytest.approx(100.0 * (1 - t) + 160.0 * t)
+        assert state == 'TOP'
+
+
+def test_frames_without_a_pose_on_both_sides_keep_the_known_skeleton():
+    renderer = RecordingRenderer()
+    writer = FakeWriter()
+    overlay = InterpolatingOverlayWriter(writer, renderer)
+    overlay.add_frame(frame(0))
+    overlay.add_keyframe(frame(1)) # no pose found
+    overlay.add_frame(frame(2))
+    overlay.add_keyframe(frame(3), pose(0.5), 120.0, 'BOT')
+    overlay.add_frame(frame(4))
+    overlay.add_frame(frame(5))
+    overlay.close()
+
+    assert writer.frames == list(range(6))
+    # nothing to draw before a pose was seen, trailing frames keep the last one
+    assert sorted(renderer.drawn) == [3, 4, 5]
+    for number in (4, 5):
+        points, angle, state = renderer.drawn[number]
+        assert points[:, 0] == pytest.approx(0.5) and angle == pytest.approx(120.0) and state == 'BOT'
+
+
+def test_annotated_video_has_every_input_frame(tmp_path):
+    pytest.importorskip("config") # config.py is not in the repository
+    pytest.importorskip("mediapipe")
+    from pose_backends import Landmark
+    from set_series import SetSeries
+    from tools.synthetic_pose import iter_frames
+    from video_processor import GymFormAnalyzer
+
+    class SyntheticPose:
+        name = "synthetic"
+        batch_size = 4
+
+        def __init__(self):
+            self.frames = iter_frames("squats", seconds=2, fps=30)
+            self.calls = 0
+
+        def process_batch(self, images, timestamps_ms):
+            self.calls += len(images)
+            return [[Landmark(*point) for point in next(self.frames)] for _ in images]
+
+        def reset(self):
+            pass
+
+    source = str(tmp_path / "input.mp4")
+    writer = cv2.VideoWriter(source, cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 48))
+    for _ in range(47):
+        writer.write(np.zeros((48, 64, 3), dtype=np.uint8))
+    writer.release()
+
+    backend = SyntheticPose()
+    analyzer = GymFormAnalyzer(adaptive_sampling=False, frame_skip=2, pose_backend=backend)
+    output = str(tmp_path / "output.mp4")
+    video = analyzer._track_video(backend, SetSeries("squats"), source, output, "squats", "FULL")
+
+    assert video['frames'] == 47
+    assert backend.calls == video['inferred_frames'] == 16 # every 3rd frame
+    capture = cv2.VideoCapture(output)
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 47
+    capture.release()
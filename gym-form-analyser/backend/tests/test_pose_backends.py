@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("cv2")
+from onnx import TensorProto, helper
+
+from pose_backends import NUM_LANDMARKS, OnnxPoseBackend
+
+# landmark 0 at the input centre, 1 and 2 at the top left / bottom right corners of a 256x256 input
+POINTS = [(128, 128), (0, 0), (256, 256)] + [(128, 128)] * (NUM_LANDMARKS - 3)
+
+
+def constant_pose_model(path, input_shape, landmarks=NUM_LANDMARKS):
+    """A model that ignores the picture and always returns POINTS (in input pixels)."""
+    values = np.zeros((1, landmarks * 5), dtype=np.float32)
+    for i, (x, y) in enumerate(POINTS[:landmarks]):
+        values[0, i * 5:i * 5 + 5] = (x, y, 0, 10, 10)
+    nodes = [
+        helper.make_node("ReduceSum", ["image", "axes"], ["sum"], keepdims=0),
+        helper.make_node("Unsqueeze", ["sum", "one"], ["column"]),
+        helper.make_node("Mul", ["column", "zero"], ["nothing"]),
+        helper.make_node("Add", ["nothing", "points"], ["landmarks"]),
+    ]
+    initializers = [
+        helper.make_tensor("axes", TensorProto.INT64, [len(input_shape) - 1], range(1, len(input_shape))),
+        helper.make_tensor("one", TensorProto.INT64, [1], [1]),
+        helper.make_tensor("zero", TensorProto.FLOAT, [], [0.0]),
+        helper.make_tensor("points", TensorProto.FLOAT, values.shape, values.flatten()),
+    ]
+    graph = helper.make_graph(nodes, "pose", [helper.make_tensor_value_info("image", TensorProto.FLOAT, input_shape)],
+                              [helper.make_tensor_value_info("landmarks", TensorProto.FLOAT, None)], initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.mark.parametrize("input_shape", [[1, 256, 256, 3], ["batch", 3, 256, 256]])
+def test_portrait_frame_is_letterboxed(tmp_path, input_shape):
+    backend = OnnxPoseBackend(constant_pose_model(tmp_path / "pose.onnx", input_shape), intra_op_threads=1)
+    landmarks = backend.process_batch([np.zeros((1280, 720, 3), dtype=np.uint8)] * 2, [0, 33])
+
+    for frame in landmarks:
+        assert (frame[0].x, frame[0].y) == pytest.approx((0.5, 0.5))
+        # the input corners lie in the black bars left and right of a portrait frame
+        assert frame[1].x == pytest.approx(-(256 - 144) / 2 / 144)
+        assert frame[1].y == pytest.approx(0.0)
+        assert frame[2].x == pytest.approx(1 + (256 - 144) / 2 / 144)
+        assert frame[2].y == pytest.approx(1.0)
+
+
+def test_dynamic_size_needs_input_size(tmp_path):
+    path = constant_pose_model(tmp_path / "pose.onnx", ["batch", "height", "width", 3])
+    with pytest.raises(ValueError, match="POSE_INPUT_SIZE"):
+        OnnxPoseBackend(path)
+
+    backend = OnnxPoseBackend(path, input_size=(256, 256))
+    assert not backend.channels_first and backend.batch_size == 8
+    frame = backend.process(np.zeros((720, 1280, 3), dtype=np.uint8))
+    assert (frame[1].x, frame[1].y) == pytest.approx((0.0, -(256 - 144) / 2 / 144))
+
+
+@pytest.mark.parametrize("input_shape", [["batch", "channels", 256, 256], [1, 256, 256], [1, 4, 256, 256]])
+def test_unusable_input_shape_is_refused(tmp_path, input_shape):
+    with pytest.raises(ValueError):
+        OnnxPoseBackend(constant_pose_model(tmp_path / "pose.onnx", input_shape))
+
+
+def test_too_few_landmarks_is_refused(tmp_path):
+    backend = OnnxPoseBackend(constant_pose_model(tmp_path / "pose.onnx", [1, 256, 256, 3], landmarks=17))
+    with pytest.raises(RuntimeError, match="33 landmarks"):
+        backend.process(np.zeros((256, 256, 3), dtype=np.uint8))
@@ -0,0 +1,57 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from pose_pool import PosePool
+
+
+class FakeBackend:
+    """Stateful like MediaPipe tracking: each result depends on the frames seen since the last reset."""
+    name = "fake"
+    batch_size = 1
+
+    def __init__(self):
+        self.seen = 0
+        self.in_use = threading.Lock()
+
+    def process(self, frame):
+        assert self.in_use.acquire(blocking=False), "backend used by two videos at once"
+        try:
+            self.seen += 1
+            time.sleep(0.001)
+            return int(frame[0, 0, 0]) * 1000 + self.seen
+        finally:
+            self.in_use.release()
+
+    def reset(self):
+        self.seen = 0
+
+    def close(self):
+        pass
+
+
+def analyse(pool, video):
+    with pool.checkout() as backend:
+        return [backend.process(np.full((4, 4, 3), video, dtype=np.uint8)) for _ in range(20)]
+
+
+def test_concurrent_results_match_serial():
+    pool = PosePool(FakeBackend, size=2)
+    serial = [analyse(pool, video) for video in range(8)]
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        concurrent = list(executor.map(lambda video: analyse(pool, video), range(8)))
+
+    assert concurrent == serial
+    assert pool.idle == pool.size
+
+
+def test_checkout_times_out_when_all_busy():
+    pool = PosePool(FakeBackend, size=1)
+    with pool.checkout():
+        with pytest.raises(RuntimeError):
+            with pool.checkout(timeout=0.05):
+                pass
+    assert pool.idle == 1
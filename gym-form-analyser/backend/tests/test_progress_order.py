@@ -0,0 +1,35 @@
+import progress
+
+
+def test_events_come_summary_then_video_then_feedback(app_module, fake_analysis):
+    events = []
+    results, _, count, failed = app_module.process_videos(fake_analysis(3), "squats", "FULL",
+                                                          on_event=events.append)
+
+    assert count == 3 and not failed
+    order = [(event['type'], event['set']) for event in events]
+    for index in range(3):
+        per_set = [kind for kind, set_index in order if set_index == index]
+        assert per_set == [progress.SUMMARY, progress.VIDEO, progress.FEEDBACK]
+    # every set's rep counts arrive before any set's video or feedback
+    kinds = [kind for kind, _ in order]
+    assert kinds[:3] == [progress.SUMMARY] * 3
+    feedback = {event['set']: event['gemini_feedback'] for event in events if event['type'] == progress.FEEDBACK}
+    assert [feedback[index] for index in range(3)] == [result['gemini_feedback'] for result in results]
+
+
+def test_checkpoint_holds_final_feedback(app_module, fake_analysis):
+    saved = {}
+
+    class Checkpoint:
+        def get(self, index, digest):
+            return saved.get((index, digest))
+
+        def save(self, index, digest, entry):
+            saved[(index, digest)] = dict(entry)
+
+    # Gemini still busy when the video of each set is done
+    app_module.process_videos(fake_analysis(2, feedback_delay=0.3), "squats", "FULL", checkpoint=Checkpoint())
+
+    assert set(saved) == {(0, "digest0"), (1, "digest1")}
+    assert all(entry['gemini_feedback'] != app_module.NO_FEEDBACK for entry in saved.values())
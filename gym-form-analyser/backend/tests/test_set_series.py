@@ -0,0 +1,78 @@
+import itertools
+import tracemalloc
+
+import pytest
+
+from gemini_payload import encode_pose_table
+from set_series import SetSeries, StreamingSetSeries
+from tools.replay import tracked_angle
+from tools.synthetic_pose import default_fixtures, iter_frames
+
+
+def fill(series, frames, exercise, frame_skip=2):
+    """Feed every (frame_skip + 1)th frame, as process_video does after pose inference."""
+    for index, lm in enumerate(frames):
+        if index % (frame_skip + 1) == 0:
+            angle = tracked_angle(lm, exercise)
+            series.add(angle if angle is not None else 0, [[round(v, 3) for v in point] for point in lm])
+    return series
+
+
+def both(frames, exercise):
+    frames = list(frames)
+    return fill(SetSeries(exercise), frames, exercise), fill(StreamingSetSeries(exercise), frames, exercise)
+
+
+def prompt(series, exercise):
+    landmarks, states, angles, frame_numbers = series.gemini_input()
+    return encode_pose_table(landmarks, exercise, states, angles, frame_numbers=frame_numbers)
+
+
+@pytest.mark.parametrize("fixture", default_fixtures(), ids=lambda fixture: fixture["name"])
+def test_streaming_matches_lists(fixture):
+    exercise = fixture["exercise"]
+    lists, streaming = both(fixture["frames"], exercise)
+
+    assert streaming.recorded == lists.recorded
+    assert streaming.rep_stats() == lists.rep_stats()
+    assert streaming.score() == pytest.approx(lists.score())
+    assert prompt(streaming, exercise) == prompt(lists, exercise)
+
+
+@pytest.mark.parametrize("exercise", ["squats", "pushups", "pullups"])
+def test_long_set_same_result_bounded_state(exercise):
+    # 10 minutes, about 200 reps: far more frames than the streaming series may keep
+    lists, streaming = both(iter_frames(exercise, seconds=600), exercise)
+
+    assert int(lists.rep_stats()['total_reps']) > 150
+    assert streaming.rep_stats() == lists.rep_stats()
+    assert streaming.score() == pytest.approx(lists.score())
+
+    landmarks, states, angles, frame_numbers = streaming.gemini_input()
+    assert len(landmarks) <= streaming.capacity + 2 # the extremes plus the first and last frame
+    assert frame_numbers == sorted(frame_numbers)
+    assert frame_numbers[0] == 0 and frame_numbers[-1] == lists.recorded - 1
+
+
+def peak_memory(minute, minutes):
+    """tracemalloc peak (bytes) of filling a StreamingSetSeries with `minutes` repeats of a one minute set."""
+    tracemalloc.start()
+    try:
+        series = fill(StreamingSetSeries("squats"), itertools.chain.from_iterable(itertools.repeat(minute, minutes)),
+                      "squats")
+        series.rep_stats()
+        series.gemini_input()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_peak_memory_flat_from_1_to_60_minutes():
+    # generated before tracing starts, so only what the series allocates is measured
+    minute = list(iter_frames("squats", seconds=60))
+    short, medium, long = (peak_memory(minute, minutes) for minutes in (1, 10, 60))
+
+    # the lists grow 60 times over this range; the streaming state fills its
+    # fixed capacity within a few minutes and then stays put
+    assert long <= 2 * short
+    assert long <= 1.1 * medium
@@ -0,0 +1,67 @@
+"""Pose calls and rep-count accuracy: fixed every-3rd-frame sampling vs adaptive sampling.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_adaptive_sampling [--fixtures DIR]
+
+Each fixture is replayed through the same state machine process_video uses.
+"rep err" / "good err" are the absolute differences from the labelled total
+and good rep counts, summed over all fixtures.
+"""
+import argparse
+
+from adaptive_sampling import AdaptiveSampler, FixedSampler, LandmarkSmoother
+from rep_tracking import count_reps_and_track_extremes
+from tools.replay import replay, load_fixture_dir
+from tools.synthetic_pose import make_sequence
+
+
+def fixture_set():
+    """Every exercise at two noise levels and two frame rates, with and without shallow reps."""
+    fixtures = []
+    for noise in (0.002, 0.006):
+        for fps in (30, 60):
+            for exercise, reps, shallow, rep_seconds in (("squats", 5, 0, 2.0), ("squats", 8, 3, 1.5),
+                                                         ("pushups", 10, 2, 1.2), ("pullups", 6, 1, 2.5),
+                                                         ("pushups", 12, 0, 0.9)):
+                fixtures.append(make_sequence(exercise, reps=reps, shallow_reps=shallow, rep_seconds=rep_seconds,
+                                              fps=fps, noise=noise, seed=reps + fps))
+    return fixtures
+
+
+MODES = {
+    "fixed stride 3": lambda: (FixedSampler(3), None),
+    "fixed stride 3 + smoothing": lambda: (FixedSampler(3), LandmarkSmoother()),
+    "adaptive + smoothing": lambda: (AdaptiveSampler(), LandmarkSmoother()),
+}
+
+
+def evaluate(fixtures, make_mode):
+    calls = rep_err = good_err = 0
+    for fixture in fixtures:
+        sampler, smoother = make_mode()
+        replayed = replay(fixture["frames"], fixture["exercise"], sampler=sampler, smoother=smoother,
+                          fps=fixture.get("fps", 30))
+        counted = count_reps_and_track_extremes(replayed["angles"], replayed["states"])
+        calls += replayed["processed_frames"]
+        rep_err += abs(int(counted["total_reps"]) - fixture["labels"]["total_reps"])
+        good_err += abs(int(counted["good_reps"]) - fixture["labels"]["good_reps"])
+    return calls, rep_err, good_err
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory of recorded landmark sequences (JSON)")
+    args = parser.parse_args()
+
+    fixtures = load_fixture_dir(args.fixtures) if args.fixtures else fixture_set()
+    total_frames = sum(len(f["frames"]) for f in fixtures)
+    print(f"{len(fixtures)} fixtures, {total_frames} frames")
+    print(f"{'mode':<30}{'pose calls':>12}{'rep err':>10}{'good err':>10}")
+    for name, make_mode in MODES.items():
+        calls, rep_err, good_err = evaluate(fixtures, make_mode)
+        print(f"{name:<30}{calls:>12}{rep_err:>10}{good_err:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Decode throughput of the video decoders.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_decoders clip_1080p.mp4 clip_4k.mp4 [--width 640] [--stride 3]
+        [--decoders opencv,pyav,ffmpeg] [--threads 0] [--frames 300]
+    python -m tools.bench_decoders --make-clips /tmp/clips   # writes 1080p and 4K H.264 test clips first
+
+Each decoder reads the clip the way process_video does with fixed sampling:
+every --stride'th frame is converted to an analysis size RGB frame. The
+"analysis" mode is a set without an output video, "annotated" also takes the
+full resolution BGR frame of every frame for the overlay writer. Wall time
+and process CPU time are reported per decoded frame.
+"""
+import argparse
+import os
+import subprocess
+import time
+
+from video_decoders import VIDEO_DECODERS, open_video
+
+CLIP_SIZES = {"1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def make_clips(directory, seconds=10, fps=30):
+    """Moving test pattern clips in H.264, like phone recordings."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for label, (width, height) in CLIP_SIZES.items():
+        path = os.path.join(directory, f"clip_{label}.mp4")
+        if not os.path.exists(path):
+            subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i',
+                            f'testsrc2=size={width}x{height}:rate={fps}:duration={seconds}',
+                            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', path], check=True)
+        paths.append(path)
+    return paths
+
+
+def cpu_seconds():
+    # ffmpeg decodes in a child process, so its CPU time counts too (once it has been waited for)
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def bench(path, name, width, stride, annotated, threads, limit):
+    cpu = cpu_seconds()
+    decoder = open_video(path, name, width, keep_full=annotated, threads=threads)
+    frames = 0
+    wall = time.perf_counter()
+    for frame in decoder:
+        if annotated:
+            frame.bgr()
+        if frame.index % stride == 0:
+            frame.rgb()
+        frames += 1
+        if frames >= limit:
+            break
+    wall = time.perf_counter() - wall
+    decoder.close()
+    return frames, decoder.width, decoder.height, wall, cpu_seconds() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="*")
+    parser.add_argument("--make-clips", metavar="DIR", help="write 1080p and 4K test clips to DIR and add them")
+    parser.add_argument("--decoders", default=",".join(VIDEO_DECODERS))
+    parser.add_argument("--width", type=int, default=640, help="analysis width, 0 keeps full size")
+    parser.add_argument("--stride", type=int, default=3, help="every n-th frame goes to pose")
+    parser.add_argument("--threads", type=int, default=0, help="decoder threads, 0 lets the codec pick")
+    parser.add_argument("--frames", type=int, default=300, help="frames read per run")
+    args = parser.parse_args()
+
+    videos = list(args.videos)
+    if args.make_clips:
+        videos += make_clips(args.make_clips)
+    if not videos:
+        parser.error("give clips or --make-clips DIR")
+
+    print(f"{'clip':<22}{'size':>11}{'decoder':>9}{'mode':>11}{'frames':>8}{'frames/s':>10}{'ms/frame':>10}"
+          f"{'CPU ms/frame':>14}")
+    for path in videos:
+        for name in args.decoders.split(","):
+            for annotated in (False, True):
+                frames, w, h, wall, cpu = bench(path, name, args.width or None, args.stride, annotated,
+                                                args.threads, args.frames)
+                mode = "annotated" if annotated else "analysis"
+                print(f"{os.path.basename(path):<22}{f'{w}x{h}':>11}{name:>9}{mode:>11}{frames:>8}"
+                      f"{frames / wall:>10.1f}{wall / frames * 1000:>10.2f}{cpu / frames * 1000:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Exercise FeedbackDispatcher against a local Gemini stand-in.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_feedback_dispatcher [--sets 5] [--latency 1.0] [--timeout 2.0]
+
+Three scenarios are timed: a healthy API (serial vs fan-out), a slow API
+(calls hit the deadline) and a failing API (the circuit breaker opens and later
+calls return immediately).
+"""
+import argparse
+import random
+import time
+
+from feedback_dispatcher import FeedbackDispatcher, CircuitBreaker
+
+
+class StubGemini:
+    """Pretends to be GymFormAnalyzer.send_to_gemini with injectable latency and failures."""
+
+    def __init__(self, latency=1.0, jitter=0.2, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def __call__(self, landmarks_series, exercise_type, analysis_type="FULL", states=None, angles=None,
+                 frame_numbers=None):
+        self.calls += 1
+        time.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+        if self._rng.random() < self.failure_rate:
+            raise ConnectionError("stub: 503 Service Unavailable")
+        return {"title": f"Gym Form Analysis - {exercise_type.capitalize()}", "strengths": [],
+                "areas_for_improvement": [], "actionable_tips": [], "overall_assessment": "ok"}
+
+
+def run_sets(dispatcher, stub, sets, video_seconds):
+    """Simulate process_videos: each set takes video_seconds of CPU, feedback overlaps with the next set."""
+    start = time.monotonic()
+    pending = []
+    for _ in range(sets):
+        time.sleep(video_seconds)
+        if dispatcher:
+            pending.append(dispatcher.submit(stub, [], "squats"))
+        else:
+            pending.append(stub([], "squats"))
+    results = [p.result() if dispatcher else p for p in pending]
+    errors = sum(1 for r in results if "error" in r)
+    return time.monotonic() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sets", type=int, default=5)
+    parser.add_argument("--video-seconds", type=float, default=0.5, help="simulated processing time per set")
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    args = parser.parse_args()
+
+    def dispatcher():
+        return FeedbackDispatcher(max_workers=4, timeout=args.timeout,
+                                  breaker=CircuitBreaker(failure_threshold=3, reset_timeout=5))
+
+    stub = StubGemini(latency=args.latency)
+    elapsed, errors = run_sets(None, stub, args.sets, args.video_seconds)
+    print(f"healthy, serial:   {elapsed:6.2f}s  errors={errors}")
+    elapsed, errors = run_sets(dispatcher(), StubGemini(latency=args.latency), args.sets, args.video_seconds)
+    print(f"healthy, fan-out:  {elapsed:6.2f}s  errors={errors}")
+
+    elapsed, errors = run_sets(dispatcher(), StubGemini(latency=args.timeout * 3), args.sets, args.video_seconds)
+    print(f"slow API:          {elapsed:6.2f}s  errors={errors} (deadline {args.timeout}s)")
+
+    stub = StubGemini(latency=0.2, failure_rate=1.0)
+    d = dispatcher()
+    elapsed, errors = run_sets(d, stub, args.sets * 2, 0.3)
+    print(f"failing API:       {elapsed:6.2f}s  errors={errors}  calls reaching API={stub.calls}  breaker={d.breaker.state}")
+    d.shutdown()
+
+
+if __name__ == "__main__":
+    main()
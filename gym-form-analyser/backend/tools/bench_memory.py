@@ -0,0 +1,99 @@
+"""Peak memory of a set's analysis state vs video length: SetSeries vs StreamingSetSeries.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_memory [--minutes 1 10 60] [--exercise squats]
+
+Each (mode, length) runs in its own process on a synthetic set generated frame
+by frame, so the peak RSS it reports is what the lists (or the running totals)
+cost on top of the interpreter. Frames go through the same steps process_video
+takes after pose inference: every 3rd frame, tracked angle, landmarks rounded
+to 3 decimals, series.add().
+
+Exits 1 when the streaming peak grows by more than --tolerance MB from the
+shortest to the longest input, or when the two modes disagree on the rep
+counts or the score. "same prompt" tells whether Gemini would get the same
+pose table from both modes (expected up to a few dozen reps).
+"""
+import argparse
+import hashlib
+import json
+import resource
+import subprocess
+import sys
+
+from adaptive_sampling import FixedSampler
+from gemini_payload import encode_pose_table
+from set_series import SetSeries, StreamingSetSeries
+from tools.replay import tracked_angle
+from tools.synthetic_pose import iter_frames
+
+MODES = {"lists": SetSeries, "streaming": StreamingSetSeries}
+
+
+def run_child(mode, minutes, exercise, frame_skip=2):
+    series = MODES[mode](exercise)
+    sampler = FixedSampler(frame_skip + 1)
+    next_frame = 0
+    for index, lm in enumerate(iter_frames(exercise, seconds=minutes * 60)):
+        if index != next_frame:
+            continue
+        angle = tracked_angle(lm, exercise)
+        series.add(angle if angle is not None else 0, [[round(v, 3) for v in point] for point in lm])
+        next_frame += sampler.next_stride(angle)
+
+    landmarks, states, angles, frame_numbers = series.gemini_input()
+    table, sent = encode_pose_table(landmarks, exercise, states, angles, frame_numbers=frame_numbers)
+    print(json.dumps({
+        "recorded": series.recorded,
+        "reps": series.rep_stats(),
+        "score": series.score(),
+        "prompt": hashlib.sha256(table.encode()).hexdigest()[:16],
+        "sent": len(sent),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def measure(mode, minutes, exercise):
+    out = subprocess.run([sys.executable, "-m", "tools.bench_memory", "--child", mode, "--minutes", str(minutes),
+                          "--exercise", exercise], capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 60], help="video lengths to try")
+    parser.add_argument("--exercise", default="squats", choices=["squats", "pushups", "pullups"])
+    parser.add_argument("--tolerance", type=float, default=5.0,
+                        help="MB the streaming peak may grow from the shortest to the longest input")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.minutes[0], args.exercise)
+        return
+
+    failures = 0
+    streaming_peaks = []
+    print(f"{'minutes':>8}{'important':>11}{'reps':>7}{'lists MB':>10}{'streaming MB':>14}"
+          f"{'same result':>13}{'same prompt':>13}")
+    for minutes in sorted(args.minutes):
+        lists = measure("lists", minutes, args.exercise)
+        streaming = measure("streaming", minutes, args.exercise)
+        same_result = lists["reps"] == streaming["reps"] and lists["score"] == streaming["score"] \
+            and lists["recorded"] == streaming["recorded"]
+        failures += not same_result
+        streaming_peaks.append(streaming["peak_rss_mb"])
+        print(f"{minutes:>8g}{lists['recorded']:>11}{lists['reps']['total_reps']:>7}{lists['peak_rss_mb']:>10.1f}"
+              f"{streaming['peak_rss_mb']:>14.1f}{'yes' if same_result else 'NO':>13}"
+              f"{'yes' if lists['prompt'] == streaming['prompt'] else 'no':>13}")
+
+    growth = streaming_peaks[-1] - streaming_peaks[0]
+    print(f"streaming peak RSS grew {growth:.1f} MB from {min(args.minutes):g} to {max(args.minutes):g} minutes")
+    if growth > args.tolerance:
+        failures += 1
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-frame cost of the overlay renderer vs the old mediapipe drawing path.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_overlay [--width 1920 --height 1080] [--frames 300]
+
+"before" is what process_video used to do on every inferred frame: two
+cv2.putText calls plus mp_drawing.draw_landmarks with freshly built
+DrawingSpec objects. "after" is InterpolatingOverlayWriter annotating every
+frame, with pose landmarks only available on every 3rd one.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from overlay_renderer import OverlayRenderer, InterpolatingOverlayWriter
+from tools.synthetic_pose import make_sequence
+
+
+class NullWriter:
+    def write(self, image):
+        pass
+
+
+def bench_before(frames, sequence, width, height):
+    import cv2
+    import mediapipe as mp
+    from mediapipe.framework.formats import landmark_pb2
+
+    mp_drawing = mp.solutions.drawing_utils
+    connections = mp.solutions.pose.POSE_CONNECTIONS
+    protos = []
+    for lm in sequence:
+        proto = landmark_pb2.NormalizedLandmarkList()
+        for x, y, z, v in lm:
+            proto.landmark.add(x=x, y=y, z=z, visibility=v)
+        protos.append(proto)
+
+    start = time.perf_counter()
+    for image, proto in zip(frames, protos):
+        colourTuple = (0, 255, 0)
+        cv2.putText(image, "Angle: 123.4 deg", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.2, colourTuple, 2)
+        cv2.putText(image, "MID", (10, 100), cv2.FONT_HERSHEY_SIMPLEX, 1.2, colourTuple, 2)
+        mp_drawing.draw_landmarks(
+            image, proto, connections,
+            landmark_drawing_spec=mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2),
+            connection_drawing_spec=mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2, circle_radius=2))
+    return (time.perf_counter() - start) / len(frames)
+
+
+def bench_after(frames, sequence, width, height, stride=3):
+    writer = InterpolatingOverlayWriter(NullWriter(), OverlayRenderer(width, height))
+    points = [np.array([[x, y, v] for x, y, _, v in lm], dtype=np.float32) for lm in sequence]
+
+    start = time.perf_counter()
+    for i, image in enumerate(frames):
+        if i % stride == 0:
+            writer.add_keyframe(image, points[i], 123.4, 'MID')
+        else:
+            writer.add_frame(image)
+    writer.close()
+    return (time.perf_counter() - start) / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    sequence = make_sequence("squats", reps=5)["frames"]
+    sequence = (sequence * (args.frames // len(sequence) + 1))[:args.frames]
+    blank = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+
+    after = bench_after([blank.copy() for _ in sequence], sequence, args.width, args.height)
+    print(f"after:  {after * 1000:.3f} ms per output frame (every frame annotated)")
+    try:
+        before = bench_before([blank.copy() for _ in sequence], sequence, args.width, args.height)
+    except ImportError:
+        print("before: mediapipe not installed, skipped")
+        return
+    print(f"before: {before * 1000:.3f} ms per processed frame (every 3rd frame annotated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Throughput of the pose backends on the same frames.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_pose_backends --video clip.mp4 [--width 640]
+        [--tasks-model pose_landmarker_full.task] [--onnx-model pose.onnx]
+        [--batch-sizes 1,4,8] [--threads 4]
+
+The legacy backend always runs; tasks/onnx run when a model file is given.
+Frames are decoded and converted to RGB up front so only inference is timed.
+"""
+import argparse
+import time
+
+import cv2
+
+from pose_backends import create_pose_backend
+
+
+def load_frames(path, width, limit):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    frames = []
+    while len(frames) < limit:
+        ok, image = cap.read()
+        if not ok:
+            break
+        if width and image.shape[1] > width:
+            image = cv2.resize(image, (width, round(image.shape[0] * width / image.shape[1])),
+                               interpolation=cv2.INTER_AREA)
+        frames.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames, fps
+
+
+def bench(backend, frames, fps, batch_size):
+    backend.reset()
+    detected = 0
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        results = backend.process_batch(batch, [(i + j) * 1000 / fps for j in range(len(batch))])
+        detected += sum(1 for r in results if r)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(frames) * 1000, len(frames) / elapsed, detected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--width", type=int, default=640, help="analysis width, 0 keeps full size")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--tasks-model")
+    parser.add_argument("--onnx-model")
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    args = parser.parse_args()
+
+    frames, fps = load_frames(args.video, args.width, args.frames)
+    print(f"{len(frames)} frames at {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'backend':<10}{'batch':>6}{'ms/frame':>10}{'frames/s':>10}{'detected':>10}")
+
+    candidates = [("legacy", {}, [1])]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    if args.tasks_model:
+        candidates.append(("tasks", {"model_path": args.tasks_model}, batch_sizes))
+    if args.onnx_model:
+        candidates.append(("onnx", {"model_path": args.onnx_model, "intra_op_threads": args.threads}, batch_sizes))
+
+    for name, options, sizes in candidates:
+        backend = create_pose_backend(name, **options)
+        for batch_size in sizes:
+            ms, rate, detected = bench(backend, frames, fps, batch_size)
+            print(f"{name:<10}{batch_size:>6}{ms:>10.2f}{rate:>10.1f}{detected:>10}")
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Determinism and throughput of GymFormAnalyzer under concurrent load.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_pose_pool --video clip.mp4 [--video other.mp4 ...] [--exercise squats]
+        [--pool-sizes 1,2,4] [--requests 8] [--output]
+
+First every clip is analysed on its own to get reference results. Then, for
+each pool size, --requests analyses (cycling through the clips) run at once
+on as many threads as the pool has backends, and every result must match
+its reference exactly: the summary and, with --output, every frame of the
+annotated video. Wall time gives the throughput per pool size. Exits with
+status 1 on any mismatch.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from video_processor import GymFormAnalyzer
+
+
+def video_digest(path):
+    """Hash of the decoded frames, so container details do not matter."""
+    digest = hashlib.sha256()
+    cap = cv2.VideoCapture(path)
+    frames = 0
+    while True:
+        ok, image = cap.read()
+        if not ok:
+            break
+        digest.update(image.tobytes())
+        frames += 1
+    cap.release()
+    return f"{frames}:{digest.hexdigest()[:16]}"
+
+
+def analyse(analyzer, video, exercise, write_output):
+    output_path = None
+    if write_output:
+        fd, output_path = tempfile.mkstemp(suffix=".mp4")
+        os.close(fd)
+    try:
+        result = analyzer.process_video(video, output_path, exercise, "FULL")
+        return result["summary"], video_digest(output_path) if output_path else None
+    finally:
+        if output_path:
+            os.unlink(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", action="append", required=True)
+    parser.add_argument("--exercise", default="squats")
+    parser.add_argument("--pool-sizes", default="1,2,4")
+    parser.add_argument("--requests", type=int, default=8, help="analyses per pool size")
+    parser.add_argument("--output", action="store_true", help="also write and compare the annotated videos")
+    args = parser.parse_args()
+
+    pool_sizes = [int(v) for v in args.pool_sizes.split(",")]
+    analyzer = GymFormAnalyzer(pose_pool_size=max(pool_sizes))
+    analyzer.gemini_model = None  # never call the API from the benchmark
+
+    reference = {video: analyse(analyzer, video, args.exercise, args.output) for video in args.video}
+    jobs = [args.video[i % len(args.video)] for i in range(args.requests)]
+    frames = sum(cv2.VideoCapture(v).get(cv2.CAP_PROP_FRAME_COUNT) for v in jobs)
+
+    print(f"{os.cpu_count()} CPUs, {len(jobs)} analyses of {len(args.video)} clips per run")
+    print(f"{'pool':>5}{'wall s':>9}{'videos/s':>10}{'frames/s':>10}{'mismatches':>12}")
+    failed = False
+    for size in pool_sizes:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            results = list(executor.map(lambda v: analyse(analyzer, v, args.exercise, args.output), jobs))
+        wall = time.perf_counter() - start
+        mismatches = sum(result != reference[video] for video, result in zip(jobs, results))
+        failed |= mismatches > 0
+        print(f"{size:>5}{wall:>9.2f}{len(jobs) / wall:>10.2f}{frames / wall:>10.1f}{mismatches:>12}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Overhead of the analysis profiling hook (profiling.py), off and on.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.bench_profiler [--video clip.mp4] [--exercise squats] [--repeats 5]
+        [--intervals 5,1]
+
+The workload is one set: GymFormAnalyzer.process_video on --video, or without
+it a 10 minute synthetic set replayed through the rep tracking and scoring
+(pure Python, the worst case for a sampler that needs the GIL). It runs bare,
+inside a session with the hook off (what every unprofiled request pays) and
+with the hook on at each sampling interval in ms. The median of --repeats
+runs is compared to the bare median. The cost of the hook when it is off is
+also timed on its own, since it disappears in the noise of a whole set.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+from profiling import AnalysisProfiler
+from set_series import SetSeries
+from tools.replay import tracked_angle
+from tools.synthetic_pose import iter_frames
+
+
+def synthetic_set(exercise):
+    series = SetSeries(exercise)
+    for index, lm in enumerate(iter_frames(exercise, seconds=600)):
+        if index % 3 == 0:
+            angle = tracked_angle(lm, exercise)
+            series.add(angle if angle is not None else 0, lm)
+    return series.rep_stats(), series.score()
+
+
+def timed(modes, repeats):
+    """Median seconds per mode; modes take turns so drift (caches, heap growth) hits all of them alike."""
+    times = {name: [] for name in modes}
+    for _ in range(repeats):
+        for name, run in modes.items():
+            started = time.perf_counter()
+            run()
+            times[name].append(time.perf_counter() - started)
+    return {name: statistics.median(t) for name, t in times.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="clip to analyse (default: synthetic set)")
+    parser.add_argument("--exercise", default="squats", choices=["squats", "pushups", "pullups"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--intervals", default="5,1", help="sampling intervals to try, in ms")
+    args = parser.parse_args()
+
+    if args.video:
+        from video_processor import GymFormAnalyzer
+        analyzer = GymFormAnalyzer()
+        analyzer.gemini_model = None
+
+        def workload():
+            analyzer.process_video(args.video, None, args.exercise, "FULL")
+    else:
+        def workload():
+            synthetic_set(args.exercise)
+
+    workload() # warm up (imports, model start-up, caches)
+    samples = {}
+    with tempfile.TemporaryDirectory() as directory:
+        def with_hook(name, request_id, interval):
+            profiler = AnalysisProfiler(directory, interval=interval)
+
+            def run():
+                with profiler.session(request_id, args.exercise, 0) as tags:
+                    workload()
+                samples[name] = tags.get('samples')
+            return run
+
+        modes = {"no hook": workload, "hook off": with_hook("hook off", None, 0.005)}
+        for interval_ms in (float(i) for i in args.intervals.split(",")):
+            name = f"hook on, {interval_ms:g} ms"
+            modes[name] = with_hook(name, "bench", interval_ms / 1000)
+        medians = timed(modes, args.repeats)
+
+    bare = medians["no hook"]
+    print(f"{'mode':<24}{'median s':>10}{'overhead':>10}{'samples':>9}")
+    for name, seconds in medians.items():
+        overhead = f"{(seconds / bare - 1) * 100:.1f}%" if name != "no hook" else ""
+        print(f"{name:<24}{seconds:>10.3f}{overhead:>10}{samples.get(name) or '':>9}")
+
+    # the hook off is too cheap to see next to a whole set, so time it on its own
+    profiler = AnalysisProfiler(tempfile.gettempdir())
+    started = time.perf_counter()
+    for _ in range(100000):
+        profiler.wanted(None)
+        with profiler.session(None, args.exercise, 0) as tags:
+            tags.update(frames=0)
+    print(f"hook off costs {(time.perf_counter() - started) * 10:.2f} us per set")
+
+
+if __name__ == "__main__":
+    main()
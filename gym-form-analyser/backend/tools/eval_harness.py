@@ -0,0 +1,201 @@
+"""Accuracy vs speed of the analysis settings over a labelled corpus.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.eval_harness                       # synthetic landmark corpus
+    python -m tools.eval_harness --landmarks DIR       # + recorded landmark sequences (JSON)
+    python -m tools.eval_harness --videos DIR          # + labelled videos (DIR/labels.json)
+
+Landmark corpora replay the state machine and form scoring without running
+pose, so they sweep the sampling knobs (frame skip, adaptive sampling, state
+threshold) and measure cost as pose calls per minute of video. Video corpora
+run GymFormAnalyzer.process_video for real, so they also sweep the pose knobs
+(model complexity, detection confidence, analysis width) and measure cost as
+seconds of CPU per minute of video.
+
+labels.json maps a file name to its ground truth:
+    {"set1.mp4": {"exercise": "squats", "total_reps": 5, "good_reps": 4, "good_form": false}}
+
+Every run prints one table with the Pareto-optimal settings marked with "*"
+and suggests the cheapest setting within --tolerance of the lowest error.
+GymFormAnalyzer uses the same sampling, threshold and pose settings for QUICK
+and FULL analyses, so there is one suggestion for both.
+
+The suggestion is only as good as the corpus. With the built-in synthetic
+corpus (20 sets) form accuracy sits at 40-60%, no better than always guessing
+the most common label, and the rep errors of the top settings differ by a
+fraction of a rep. The report says so when a corpus is too small or its form
+accuracy does not beat that baseline; do not copy such a suggestion into the
+defaults.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+
+from adaptive_sampling import AdaptiveSampler, FixedSampler, LandmarkSmoother
+from form_scoring import evaluate_form
+from rep_tracking import count_reps_and_track_extremes
+from tools.bench_adaptive_sampling import fixture_set
+from tools.replay import replay, load_fixture_dir
+
+GOOD_FORM_SCORE = 0.6  # default --good-score
+MIN_TRUSTED_SETS = 100  # labelled sets below which the suggestions are only a hint
+
+
+def parse_list(text, cast):
+    return [None if v == "none" else cast(v) for v in text.split(",")]
+
+
+def accuracy(results, good_score=GOOD_FORM_SCORE):
+    """results: list of (labels, total_reps, good_reps, score); a set counts as good form when score >= good_score."""
+    n = len(results)
+    rep_mae = sum(abs(r - l["total_reps"]) for l, r, _, _ in results) / n
+    good_mae = sum(abs(g - l["good_reps"]) for l, _, g, _ in results) / n
+    labelled = [(l["good_form"], s >= good_score) for l, _, _, s in results if "good_form" in l]
+    form_acc = sum(truth == guess for truth, guess in labelled) / len(labelled) if labelled else None
+    return rep_mae, good_mae, form_acc
+
+
+def chance_accuracy(labels):
+    """Form accuracy of always guessing the most common good_form label, None without such labels."""
+    forms = [l["good_form"] for l in labels if "good_form" in l]
+    if not forms:
+        return None
+    good = sum(forms) / len(forms)
+    return max(good, 1 - good)
+
+
+def run_landmark_grid(fixtures, frame_skips, thresholds, adaptive_modes, good_score):
+    minutes = sum(len(f["frames"]) / f.get("fps", 30) for f in fixtures) / 60
+    rows = []
+    for adaptive, frame_skip, threshold in itertools.product(adaptive_modes, frame_skips, thresholds):
+        if adaptive and frame_skip != frame_skips[0]:
+            continue  # the adaptive sampler picks its own stride
+        calls = 0
+        results = []
+        for fixture in fixtures:
+            sampler = AdaptiveSampler() if adaptive else FixedSampler(frame_skip + 1)
+            replayed = replay(fixture["frames"], fixture["exercise"], threshold=threshold, sampler=sampler,
+                              smoother=LandmarkSmoother() if adaptive else None, fps=fixture.get("fps", 30))
+            counted = count_reps_and_track_extremes(replayed["angles"], replayed["states"])
+            score = evaluate_form(replayed["important_frames"], replayed["states"], fixture["exercise"])
+            calls += replayed["processed_frames"]
+            results.append((fixture["labels"], int(counted["total_reps"]), int(counted["good_reps"]), score))
+        settings = {"adaptive": adaptive, "frame_skip": "auto" if adaptive else frame_skip, "threshold": threshold}
+        rows.append((settings, calls / minutes, *accuracy(results, good_score)))
+    return rows, "pose calls/min"
+
+
+def run_video_grid(video_dir, frame_skips, thresholds, adaptive_modes, complexities, confidences, widths, good_score):
+    from video_processor import GymFormAnalyzer
+    import cv2
+
+    with open(os.path.join(video_dir, "labels.json")) as f:
+        labels = json.load(f)
+    minutes = 0.0
+    for name in labels:
+        cap = cv2.VideoCapture(os.path.join(video_dir, name))
+        minutes += cap.get(cv2.CAP_PROP_FRAME_COUNT) / (cap.get(cv2.CAP_PROP_FPS) or 30) / 60
+        cap.release()
+
+    rows = []
+    for complexity, confidence, width, adaptive, frame_skip, threshold in itertools.product(
+            complexities, confidences, widths, adaptive_modes, frame_skips, thresholds):
+        if adaptive and frame_skip != frame_skips[0]:
+            continue
+        analyzer = GymFormAnalyzer(adaptive_sampling=adaptive, frame_skip=frame_skip, model_complexity=complexity,
+                                   min_detection_confidence=confidence, analysis_width=width,
+                                   state_threshold=threshold)
+        analyzer.gemini_model = None  # never call the API from the harness
+        results = []
+        cpu = 0.0
+        for name, label in labels.items():
+            start = time.process_time()
+            out = analyzer.process_video(os.path.join(video_dir, name), None, label["exercise"], "FULL")
+            cpu += time.process_time() - start
+            summary = out["summary"]
+            results.append((label, int(summary["total_reps"]), int(summary["good_reps"]), float(summary["score"])))
+        settings = {"complexity": complexity, "confidence": confidence, "width": width or "full",
+                    "adaptive": adaptive, "frame_skip": "auto" if adaptive else frame_skip, "threshold": threshold}
+        rows.append((settings, cpu / minutes, *accuracy(results, good_score)))
+    return rows, "CPU s/min"
+
+
+def pareto(rows):
+    """Indices of rows no other row beats on both cost and error."""
+    front = set()
+    for i, (_, cost, rep_mae, good_mae, _) in enumerate(rows):
+        error = rep_mae + good_mae
+        if not any(c <= cost and r + g <= error and (c < cost or r + g < error)
+                   for j, (_, c, r, g, _) in enumerate(rows) if j != i):
+            front.add(i)
+    return front
+
+
+def report(title, rows, cost_name, tolerance, labels):
+    front = pareto(rows)
+    chance = chance_accuracy(labels)
+    print(f"\n{title}")
+    print(f"  {'settings':<86}{cost_name:>16}{'rep MAE':>9}{'good MAE':>10}{'form acc':>10}")
+    for i, (settings, cost, rep_mae, good_mae, form_acc) in sorted(enumerate(rows), key=lambda r: r[1][1]):
+        text = " ".join(f"{k}={v}" for k, v in settings.items())
+        acc = f"{form_acc:.0%}" if form_acc is not None else "-"
+        print(f"{'*' if i in front else ' '} {text:<86}{cost:>16.1f}{rep_mae:>9.2f}{good_mae:>10.2f}{acc:>10}")
+
+    best_error = min(r[2] + r[3] for r in rows)
+    suggested = min((r for r in rows if r[2] + r[3] <= best_error + tolerance), key=lambda r: (r[1], r[2] + r[3]))
+    print(f"  suggested (cheapest within {tolerance} of the lowest rep + good-rep MAE, for every analysis type): "
+          f"{suggested[0]}")
+
+    caveats = []
+    if len(labels) < MIN_TRUSTED_SETS:
+        caveats.append(f"only {len(labels)} labelled sets, at least {MIN_TRUSTED_SETS} are needed")
+    accuracies = [r[4] for r in rows if r[4] is not None]
+    if chance is not None and accuracies and max(accuracies) <= chance:
+        caveats.append(f"form accuracy (best {max(accuracies):.0%}) is no better than always guessing "
+                       f"the most common label ({chance:.0%})")
+    if caveats:
+        print("  this suggestion is not meaningful yet: " + "; ".join(caveats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--landmarks", help="directory of recorded landmark sequences (JSON)")
+    parser.add_argument("--videos", help="directory of labelled videos with a labels.json")
+    parser.add_argument("--no-synthetic", action="store_true", help="leave out the synthetic corpus")
+    parser.add_argument("--frame-skip", default="0,1,2,3,5")
+    parser.add_argument("--threshold", default="3,5,8")
+    parser.add_argument("--adaptive", default="0,1")
+    parser.add_argument("--complexity", default="0,1,2", help="video corpus only")
+    parser.add_argument("--confidence", default="0.5,0.7", help="video corpus only")
+    parser.add_argument("--width", default="none,640,360", help="video corpus only, 'none' keeps full size")
+    parser.add_argument("--good-score", type=float, default=GOOD_FORM_SCORE,
+                        help="evaluate_form score from which a set is predicted as good form")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="extra rep + good-rep MAE the suggested setting may give up against the best one")
+    args = parser.parse_args()
+
+    frame_skips = parse_list(args.frame_skip, int)
+    thresholds = parse_list(args.threshold, float)
+    adaptive_modes = [bool(int(v)) for v in args.adaptive.split(",")]
+
+    fixtures = [] if args.no_synthetic else fixture_set()
+    if args.landmarks:
+        fixtures += load_fixture_dir(args.landmarks)
+    if fixtures:
+        rows, cost_name = run_landmark_grid(fixtures, frame_skips, thresholds, adaptive_modes, args.good_score)
+        report(f"landmark corpus ({len(fixtures)} sets)", rows, cost_name, args.tolerance,
+               [f["labels"] for f in fixtures])
+    if args.videos:
+        rows, cost_name = run_video_grid(args.videos, frame_skips, thresholds, adaptive_modes,
+                                         parse_list(args.complexity, int), parse_list(args.confidence, float),
+                                         parse_list(args.width, int), args.good_score)
+        with open(os.path.join(args.videos, "labels.json")) as f:
+            labels = list(json.load(f).values())
+        report(f"video corpus ({len(labels)} sets)", rows, cost_name, args.tolerance, labels)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare the Gemini prompt size before and after the compact pose encoding.
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.gemini_payload_report [--fixtures DIR] [--count-tokens]
+
+Without --count-tokens the token column is an estimate (4 characters per token).
+With it, the real count comes from the Gemini count_tokens endpoint, which
+needs a GEMINI_API_KEY environment variable.
+"""
+import argparse
+import json
+import os
+
+from gemini_payload import encode_pose_table, build_feedback_prompt
+from tools.replay import replay, load_fixture_dir
+from tools.synthetic_pose import default_fixtures
+
+LEGACY_MAX_FRAMES = 25
+
+
+def legacy_prompt(frames, exercise_type, frame_skip=2):
+    """The prompt send_to_gemini used to build: every 3rd frame, 33 {x, y} dicts, uniform stride, indent=2."""
+    keypoint_series = [[{'x': round(p[0], 3), 'y': round(p[1], 3)} for p in lm]
+                       for lm in frames[::frame_skip + 1]]
+    sample = keypoint_series[::max(1, len(keypoint_series) // LEGACY_MAX_FRAMES)][:LEGACY_MAX_FRAMES]
+    return f"""
+        You are a virtual fitness coach specialized in analyzing exercise form.
+        The user has performed a {exercise_type}. I will provide you with a series of pose keypoints (x, y) for various frames.
+        Each frame contains data for 33 body keypoints, normalized to the image size (0.0 to 1.0).
+
+        Please provide a **concise and summarized analysis** of the {exercise_type} form, focusing on the most critical points.
+        Your response MUST be in JSON format, strictly following the schema provided below.
+        Do NOT include any other text or markdown outside the JSON object.
+        Embed relevant emojis directly into the string values where appropriate to add visual appeal.
+
+        **JSON Schema:**
+        ```json
+        {{
+          "title": "Gym Form Analysis - {exercise_type.capitalize()}",
+          "strengths": [
+            "string",
+            "string"
+          ],
+          "areas_for_improvement": [
+            "string",
+            "string"
+          ],
+          "actionable_tips": [
+            "string",
+            "string",
+            "string"
+          ],
+          "overall_assessment": "string"
+        }}
+        ```
+        -   **title**: A short, descriptive title for the analysis.
+        -   **strengths**: An array of 1-2 concise bullet points highlighting key good aspects. Each string should be self-contained.
+        -   **areas_for_improvement**: An array of 1-2 concise bullet points for critical areas needing work. Each string should be self-contained.
+        -   **actionable_tips**: An array of 1-3 concise, concrete, actionable advice points. Each string should be self-contained.
+        -   **overall_assessment**: A very brief, encouraging summary sentence.
+
+        Analyze the movement over time. Pay attention to joint angles, range of motion, and consistency based on the x and y coordinates provided.
+
+        Here is a sample of the pose data (list of dictionaries, each dictionary represents a frame's 33 keypoints):
+        {json.dumps(sample, indent=2)}
+        """
+
+
+def compact_prompt(frames, exercise_type):
+    replayed = replay(frames, exercise_type)
+    table, _ = encode_pose_table(replayed["important_frames"], exercise_type,
+                                 replayed["states"], replayed["angles"])
+    return build_feedback_prompt(exercise_type, table)
+
+
+def make_token_counter(use_api):
+    if not use_api:
+        return lambda text: len(text) // 4
+    import google.generativeai as genai
+    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    model = genai.GenerativeModel("models/gemini-2.5-flash")
+    return lambda text: model.count_tokens(text).total_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory of recorded landmark sequences (JSON)")
+    parser.add_argument("--count-tokens", action="store_true", help="use the Gemini API to count tokens")
+    args = parser.parse_args()
+
+    fixtures = load_fixture_dir(args.fixtures) if args.fixtures else default_fixtures()
+    count_tokens = make_token_counter(args.count_tokens)
+
+    print(f"{'fixture':<36}{'bytes before':>14}{'bytes after':>13}{'tokens before':>15}{'tokens after':>14}{'saved':>8}")
+    total_before = total_after = 0
+    for fixture in fixtures:
+        before = legacy_prompt(fixture["frames"], fixture["exercise"])
+        after = compact_prompt(fixture["frames"], fixture["exercise"])
+        tokens_before, tokens_after = count_tokens(before), count_tokens(after)
+        total_before += tokens_before
+        total_after += tokens_after
+        print(f"{fixture['name']:<36}{len(before.encode()):>14}{len(after.encode()):>13}"
+              f"{tokens_before:>15}{tokens_after:>14}{1 - tokens_after / tokens_before:>8.0%}")
+    print(f"{'total':<36}{'':>14}{'':>13}{total_before:>15}{total_after:>14}{1 - total_after / total_before:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
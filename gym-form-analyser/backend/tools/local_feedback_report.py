@@ -0,0 +1,69 @@
+"""Latency and accuracy of the local rule based feedback (local_feedback.py).
+
+Run from gym-form-analyser/backend:
+
+    python -m tools.local_feedback_report [--fixtures DIR] [--min-confidence 0.7] [--show]
+
+Each sequence is replayed into a SetSeries the way process_video fills it
+(every 3rd frame) and local_feedback is timed over many runs. The "issues"
+column says whether the feedback names any problem, which should match the
+fixture's good_form label; "route" is where FEEDBACK_MODE "router" would send
+the set at --min-confidence. --show prints the feedback itself.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from local_feedback import local_feedback
+from set_series import SetSeries
+from tools.replay import load_fixture_dir, tracked_angle
+from tools.synthetic_pose import default_fixtures
+
+RUNS = 200
+
+
+def fill_series(frames, exercise, frame_skip=2):
+    series = SetSeries(exercise)
+    for lm in frames[::frame_skip + 1]:
+        angle = tracked_angle(lm, exercise)
+        series.add(angle if angle is not None else 0, lm)
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory of recorded landmark sequences (JSON)")
+    parser.add_argument("--min-confidence", type=float, default=0.7)
+    parser.add_argument("--show", action="store_true", help="print the feedback for every fixture")
+    args = parser.parse_args()
+
+    fixtures = load_fixture_dir(args.fixtures) if args.fixtures else default_fixtures()
+    print(f"{'fixture':<36}{'reps':>6}{'good':>6}{'ms':>8}{'confidence':>12}{'issues':>8}{'expected':>10}{'route':>8}")
+    matched = 0
+    for fixture in fixtures:
+        exercise = fixture["exercise"]
+        series = fill_series(fixture["frames"], exercise)
+        reps, score = series.rep_stats(), series.score()
+        landmarks, states, angles, _ = series.gemini_input()
+
+        times = []
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            feedback = local_feedback(exercise, reps, score, landmarks, states, angles)
+            times.append(time.perf_counter() - started)
+
+        issues = not feedback["areas_for_improvement"][0].startswith("🌟")
+        expected = not fixture.get("labels", {}).get("good_form", True)
+        matched += issues == expected
+        route = "local" if feedback["confidence"] >= args.min_confidence else "gemini"
+        print(f"{fixture['name']:<36}{reps['total_reps']:>6}{reps['good_reps']:>6}"
+              f"{statistics.median(times) * 1000:>8.2f}{feedback['confidence']:>12.2f}"
+              f"{'yes' if issues else 'no':>8}{'yes' if expected else 'no':>10}{route:>8}")
+        if args.show:
+            print(json.dumps(feedback, indent=2, ensure_ascii=False))
+    print(f"issues flagged as labelled on {matched} of {len(fixtures)} sets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Replay recorded/synthetic landmark sequences through the server's rep logic.
+
+Mirrors the per-frame work GymFormAnalyzer.process_video does after pose
+inference (tracked angle -> TOP/MID/BOT state machine -> important frames)
+without needing cv2, mediapipe or a video file.
+"""
+import json
+import os
+
+from gemini_payload import joint_angle
+from rep_tracking import track_rep_state, STATE_CHANGE_THRESHOLD
+from adaptive_sampling import FixedSampler
+from pose_backends import Landmark
+
+# tracked angle per exercise: (first, vertex, last) left/right landmark indices
+TRACKED_JOINTS = {
+    "squats": ((23, 24), (25, 26), (27, 28)),   # hip, knee, ankle
+    "pushups": ((11, 12), (13, 14), (15, 16)),  # shoulder, elbow, wrist
+    "pullups": ((11, 12), (13, 14), (15, 16)),
+}
+
+
+def tracked_angle(lm, exercise):
+    """Same side selection and 0.7 visibility cut off as analyze_squat / analyze_bench_or_pull."""
+    points = []
+    for left, right in TRACKED_JOINTS.get(exercise, TRACKED_JOINTS["squats"]):
+        if max(lm[left][3], lm[right][3]) < 0.7:
+            return None
+        points.append(lm[left] if lm[left][3] >= lm[right][3] else lm[right])
+    return round(joint_angle(*points), 3)
+
+
+def replay(frames, exercise, frame_skip=2, threshold=STATE_CHANGE_THRESHOLD, sampler=None, smoother=None, fps=30):
+    """Run frames through the state machine like process_video does.
+
+    By default every (frame_skip + 1)th frame is used; pass an AdaptiveSampler
+    (and optionally a LandmarkSmoother) to replay the adaptive mode instead.
+    """
+    sampler = sampler or FixedSampler(frame_skip + 1)
+    list_of_frames, list_of_states, important = [], [], []
+    lastPeakOrDescent = 'MID'
+    processed = 0
+    idx = 0
+    while idx < len(frames):
+        processed += 1
+        lm = frames[idx]
+        if smoother:
+            lm = [list(p) for p in smoother([Landmark(*p) for p in lm], idx / fps)]
+        angle = tracked_angle(lm, exercise)
+        recorded, lastPeakOrDescent = track_rep_state(
+            list_of_frames, list_of_states, angle if angle is not None else 0, lastPeakOrDescent, threshold)
+        if recorded:
+            important.append(lm)
+        idx += sampler.next_stride(angle)
+    return {
+        "angles": list_of_frames,
+        "states": list_of_states,
+        "important_frames": important,
+        "processed_frames": processed,
+    }
+
+
+def load_fixture_dir(path):
+    """Load recorded sequences saved as JSON files ({"exercise", "frames", "labels", ...})."""
+    fixtures = []
+    for name in sorted(os.listdir(path)):
+        if name.endswith(".json"):
+            with open(os.path.join(path, name)) as f:
+                data = json.load(f)
+            data.setdefault("name", name[:-5])
+            fixtures.append(data)
+    return fixtures
@@ -0,0 +1,135 @@
+"""Synthetic landmark sequences for offline tools.
+
+Generates MediaPipe-shaped pose data (33 landmarks of [x, y, z, visibility] per
+frame) for squats, pushups and pullups from a known joint angle trajectory, so
+we know the ground truth rep count and which reps were deep enough.
+"""
+import math
+import random
+
+NUM_LANDMARKS = 33
+SEGMENT = 0.18  # length of upper/lower limb in normalised image units
+
+# MediaPipe indices (left side, right side)
+SHOULDER, ELBOW, WRIST = (11, 12), (13, 14), (15, 16)
+HIP, KNEE, ANKLE = (23, 24), (25, 26), (27, 28)
+NOSE = 0
+
+
+def _limb(fixed, angle_deg, direction, bend):
+    """Place the middle and far joint of a two segment limb.
+
+    fixed: (x, y) of the end that does not move (ankle, wrist ...)
+    angle_deg: angle at the middle joint
+    direction: unit vector from the fixed end towards the far end when straight
+    bend: +1 / -1, which side the middle joint sticks out to
+    """
+    half = math.radians(angle_deg) / 2
+    reach = 2 * SEGMENT * math.sin(half)
+    far = (fixed[0] + direction[0] * reach, fixed[1] + direction[1] * reach)
+    offset = SEGMENT * math.cos(half) * bend
+    middle = ((fixed[0] + far[0]) / 2 - direction[1] * offset, (fixed[1] + far[1]) / 2 + direction[0] * offset)
+    return middle, far
+
+
+def _frame(exercise, angle, rng, noise, hip_sag=0.0):
+    pts = {}
+    if exercise == "squats":
+        ankle = (0.5, 0.9)
+        knee, hip = _limb(ankle, angle, (0.0, -1.0), -1)
+        shoulder = (hip[0] + 0.05, hip[1] - 0.25)
+        pts.update(ankle=ankle, knee=knee, hip=hip, shoulder=shoulder,
+                   elbow=(shoulder[0] + 0.08, shoulder[1] + 0.05), wrist=(shoulder[0] + 0.15, shoulder[1]))
+    elif exercise == "pushups":
+        wrist = (0.3, 0.8)
+        elbow, shoulder = _limb(wrist, angle, (0.0, -1.0), 1)
+        ankle = (0.85, 0.78)
+        hip = ((shoulder[0] + ankle[0]) / 2, (shoulder[1] + ankle[1]) / 2 + hip_sag)
+        knee = ((hip[0] + ankle[0]) / 2, (hip[1] + ankle[1]) / 2)
+        pts.update(wrist=wrist, elbow=elbow, shoulder=shoulder, hip=hip, knee=knee, ankle=ankle)
+    else:  # pullups
+        wrist = (0.5, 0.1)
+        elbow, shoulder = _limb(wrist, angle, (0.0, 1.0), 1)
+        hip = (shoulder[0], shoulder[1] + 0.3)
+        knee = (hip[0], hip[1] + 0.2)
+        pts.update(wrist=wrist, elbow=elbow, shoulder=shoulder, hip=hip, knee=knee, ankle=(knee[0], knee[1] + 0.2))
+    nose = (pts["shoulder"][0] - 0.03, pts["shoulder"][1] - 0.1)
+
+    frame = [[0.5, 0.5, 0.0, 0.2] for _ in range(NUM_LANDMARKS)]
+
+    def put(idx, xy, vis):
+        frame[idx] = [round(xy[0] + rng.gauss(0, noise), 4), round(xy[1] + rng.gauss(0, noise), 4),
+                      0.0, vis]
+
+    put(NOSE, nose, 0.99)
+    for name, (left, right) in (("shoulder", SHOULDER), ("elbow", ELBOW), ("wrist", WRIST),
+                                ("hip", HIP), ("knee", KNEE), ("ankle", ANKLE)):
+        put(left, pts[name], 0.95)
+        put(right, (pts[name][0] + 0.01, pts[name][1]), 0.6)
+    return frame
+
+
+def angle_trajectory(reps, fps=30, rep_seconds=2.0, top=170.0, bottoms=None, hold_seconds=1.0):
+    """Per frame tracked angle: a hold at the top, then one cosine dip per rep."""
+    bottoms = bottoms or [80.0] * reps
+    angles = [top] * int(hold_seconds * fps)
+    rep_frames = int(rep_seconds * fps)
+    for bottom in bottoms:
+        for i in range(rep_frames):
+            phase = (1 - math.cos(2 * math.pi * i / rep_frames)) / 2
+            angles.append(top - (top - bottom) * phase)
+        angles += [top] * int(hold_seconds * fps)
+    return angles
+
+
+def iter_frames(exercise="squats", seconds=60, fps=30, rep_seconds=2.0, hold_seconds=1.0, bottom=80.0,
+                top=170.0, noise=0.002, seed=0):
+    """Landmarks of an arbitrarily long set, one frame at a time (nothing is kept in memory).
+
+    Reps repeat (hold at the top, one cosine dip) until `seconds` of video have been produced.
+    """
+    rng = random.Random(seed)
+    hold_frames = int(hold_seconds * fps)
+    rep_frames = int(rep_seconds * fps)
+    for i in range(int(seconds * fps)):
+        position = i % (hold_frames + rep_frames)
+        if position < hold_frames:
+            angle = top
+        else:
+            phase = (1 - math.cos(2 * math.pi * (position - hold_frames) / rep_frames)) / 2
+            angle = top - (top - bottom) * phase
+        yield _frame(exercise, angle, rng, noise)
+
+
+def make_sequence(exercise="squats", reps=5, shallow_reps=0, fps=30, rep_seconds=2.0, hold_seconds=1.0,
+                  noise=0.002, seed=0, hip_sag=0.0):
+    """Build one labelled synthetic set.
+
+    Returns a dict with the per frame landmarks, the true angle trajectory and
+    ground truth labels (total reps, good reps and whether the whole set counts as good form).
+    """
+    rng = random.Random(seed)
+    bottoms = [80.0] * (reps - shallow_reps) + [120.0] * shallow_reps
+    rng.shuffle(bottoms)
+    angles = angle_trajectory(reps, fps, rep_seconds, bottoms=bottoms, hold_seconds=hold_seconds)
+    frames = [_frame(exercise, a, rng, noise, hip_sag) for a in angles]
+    return {
+        "name": f"synthetic-{exercise}-{reps}r-{shallow_reps}s-{seed}",
+        "exercise": exercise,
+        "fps": fps,
+        "frames": frames,
+        "angles": angles,
+        "labels": {"total_reps": reps, "good_reps": reps - shallow_reps,
+                   "good_form": shallow_reps == 0 and hip_sag == 0.0},
+    }
+
+
+def default_fixtures():
+    """A small, fixed set of sequences covering every exercise."""
+    return [
+        make_sequence("squats", reps=5, seed=1),
+        make_sequence("squats", reps=8, shallow_reps=3, rep_seconds=1.5, seed=2),
+        make_sequence("pushups", reps=10, shallow_reps=2, rep_seconds=1.2, seed=3),
+        make_sequence("pushups", reps=6, seed=4, hip_sag=0.05),
+        make_sequence("pullups", reps=6, shallow_reps=1, rep_seconds=2.5, seed=5),
+    ]
@@ -0,0 +1,313 @@
+import json
+import logging
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def analysis_size(width, height, analysis_width):
+    """Frame size pose runs at: analysis_width wide (aspect kept), or the full size if that is smaller."""
+    if analysis_width and width > analysis_width:
+        return analysis_width, round(height * analysis_width / width)
+    return width, height
+
+
+def video_seconds(path):
+    """Length of a video from its container metadata, 0.0 when it cannot be read."""
+    cap = cv2.VideoCapture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps else 0.0
+    finally:
+        cap.release()
+
+
+class VideoDecoder:
+    """Reads one video for GymFormAnalyzer.process_video.
+
+    Iterating yields DecodedFrame objects in order. frame.rgb() is the frame at
+    analysis resolution in RGB (what the pose backend takes), frame.bgr() the
+    full resolution BGR frame for the annotated output video. Both are only
+    built when asked for, so frames that are neither inferred nor drawn just
+    get decoded. Call them before moving on to the next frame.
+
+    fps, width and height describe the full resolution stream, frame_count
+    its length (from the container, so possibly an estimate). Rotation
+    metadata is ignored by every decoder, as cv2.VideoCapture does here, so
+    landmarks line up whichever decoder is used.
+
+    seek_rgb(positions) is for probing a few frames (preflight.py) instead of
+    iterating; use a decoder for one or the other.
+    """
+
+    name = "base"
+
+    def __init__(self, source, analysis_width=None, keep_full=True, threads=None):
+        self.source = source
+        self.analysis_width = analysis_width
+        self.keep_full = keep_full # False when no output video is written, bgr() may then return None
+        self.threads = threads # decoder threads, None/0 lets the codec pick
+        self.fps = 0.0
+        self.width = 0
+        self.height = 0
+        self.frame_count = 0
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def seek_rgb(self, positions):
+        """Yield (frame index, RGB frame at analysis size) at or shortly before each of the frame positions."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class DecodedFrame:
+    def __init__(self, index, bgr, rgb):
+        self.index = index
+        self._bgr = bgr
+        self._rgb = rgb
+
+    def bgr(self):
+        return self._bgr()
+
+    def rgb(self):
+        return self._rgb()
+
+
+class OpenCVDecoder(VideoDecoder):
+    """cv2.VideoCapture, the original path: one decode thread, resize and cvtColor in Python."""
+
+    name = "opencv"
+
+    def __init__(self, source, analysis_width=None, keep_full=True, threads=None):
+        super().__init__(source, analysis_width, keep_full, threads)
+        self.cap = cv2.VideoCapture(source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) if self.cap.isOpened() else 0
+        self.size = analysis_size(self.width, self.height, analysis_width)
+
+    def seek_rgb(self, positions):
+        # exact seeks: each one decodes from the keyframe before the position, so on a
+        # video with keyframes far apart a handful of seeks costs as much as a full decode
+        for position in positions:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ok, image = self.cap.read()
+            if not ok:
+                continue
+            if self.size != (self.width, self.height):
+                image = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+            yield position, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+    def __iter__(self):
+        index = 0
+        while self.cap.isOpened():
+            # grab() only decodes, retrieve() does the colour conversion, so skipped frames skip it
+            if not self.cap.grab():
+                break
+            cache = {}
+
+            def bgr(cache=cache):
+                if 'bgr' not in cache:
+                    cache['bgr'] = self.cap.retrieve()[1]
+                return cache['bgr']
+
+            def rgb(bgr=bgr):
+                image = bgr()
+                if self.size != (self.width, self.height):
+                    # landmarks are normalised, so pose can run on a smaller copy
+                    image = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+                return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+            yield DecodedFrame(index, bgr, rgb)
+            index += 1
+
+    def close(self):
+        self.cap.release()
+
+
+class PyAVDecoder(VideoDecoder):
+    """libavcodec through PyAV with frame/slice threading.
+
+    rgb() scales and converts in one swscale pass straight from the decoded
+    YUV frame, so there is no full size RGB or BGR copy for inferred frames.
+    """
+
+    name = "pyav"
+
+    def __init__(self, source, analysis_width=None, keep_full=True, threads=None):
+        import av
+
+        super().__init__(source, analysis_width, keep_full, threads)
+        self.container = av.open(source)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = "AUTO"
+        self.stream.codec_context.thread_count = threads or 0
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 0)
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.frame_count = self.stream.frames or (
+            round(float(self.stream.duration * self.stream.time_base) * self.fps) if self.stream.duration else 0)
+        self.size = analysis_size(self.width, self.height, analysis_width)
+
+    def seek_rgb(self, positions):
+        # each seek lands on the keyframe at or before the position and only that frame
+        # is decoded, so probing costs a few frames whatever the keyframe interval
+        aw, ah = self.size
+        for position in positions:
+            seconds = position / (self.fps or 30)
+            self.container.seek(int(seconds / self.stream.time_base), stream=self.stream, backward=True,
+                                any_frame=False)
+            frame = next(self.container.decode(self.stream), None)
+            if frame is None:
+                continue
+            index = round(frame.time * (self.fps or 30)) if frame.time is not None else position
+            yield index, np.ascontiguousarray(frame.to_ndarray(width=aw, height=ah, format='rgb24',
+                                                               interpolation='AREA'))
+
+    def __iter__(self):
+        aw, ah = self.size
+        for index, frame in enumerate(self.container.decode(self.stream)):
+            # rows of scaled frames can be padded, MediaPipe wants contiguous arrays
+            yield DecodedFrame(
+                index,
+                lambda frame=frame: np.ascontiguousarray(frame.to_ndarray(format='bgr24')),
+                lambda frame=frame: np.ascontiguousarray(
+                    frame.to_ndarray(width=aw, height=ah, format='rgb24', interpolation='AREA')))
+
+    def close(self):
+        self.container.close()
+
+
+class FFmpegPipeDecoder(VideoDecoder):
+    """An ffmpeg process writing raw frames to a pipe.
+
+    Without an output video ffmpeg decodes on its own threads and scales to the
+    analysis size and converts to rgb24 itself, so only small RGB frames cross
+    the pipe. With an output video it sends full size bgr24 frames and rgb() is
+    made from those like the OpenCV decoder does.
+    """
+
+    name = "ffmpeg"
+
+    def __init__(self, source, analysis_width=None, keep_full=True, threads=None, ffmpeg='ffmpeg', ffprobe='ffprobe'):
+        super().__init__(source, analysis_width, keep_full, threads)
+        probe = subprocess.run(
+            [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+             'stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration', '-of', 'json', source],
+            capture_output=True, text=True, check=True)
+        stream = json.loads(probe.stdout)['streams'][0]
+        self.width = int(stream['width'])
+        self.height = int(stream['height'])
+        num, _, den = (stream.get('avg_frame_rate') or stream.get('r_frame_rate') or '0/1').partition('/')
+        self.fps = float(num) / float(den or 1) if float(den or 1) else 0.0
+        nb_frames = stream.get('nb_frames')
+        self.frame_count = int(nb_frames) if nb_frames and nb_frames.isdigit() else \
+            round(float(stream.get('duration') or 0) * self.fps)
+        self.size = analysis_size(self.width, self.height, analysis_width)
+        self.ffmpeg = ffmpeg
+        self.process = None # started on the first iteration, so probing with seek_rgb does not decode it all
+
+        if keep_full:
+            self.frame_size, pix_fmt, scale = (self.width, self.height), 'bgr24', []
+        else:
+            self.frame_size, pix_fmt, scale = self.size, 'rgb24', ['-vf', 'scale=%d:%d:flags=area' % self.size]
+        self._command = [ffmpeg, '-v', 'error', '-nostdin', '-noautorotate', '-threads', str(threads or 0),
+                         '-i', source, *scale, '-map', '0:v:0', '-f', 'rawvideo', '-pix_fmt', pix_fmt,
+                         '-vsync', 'passthrough', 'pipe:1']
+
+    def _start(self):
+        self._stderr = tempfile.TemporaryFile()
+        # stderr goes to a file: a pipe nobody reads while decoding fills up on noisy inputs and stalls ffmpeg
+        self.process = subprocess.Popen(self._command, stdout=subprocess.PIPE, stderr=self._stderr, bufsize=0)
+
+    def seek_rgb(self, positions):
+        # one short ffmpeg run per position; -noaccurate_seek starts at the keyframe at or before
+        # it, -skip_frame nokey keeps the decoder from working through the frames after it and
+        # -copyts stops that keyframe being dropped for coming before the seek position
+        aw, ah = self.size
+        previous = None
+        for position in positions:
+            seconds = position / (self.fps or 30)
+            run = subprocess.run(
+                [self.ffmpeg, '-v', 'error', '-nostdin', '-noautorotate', '-noaccurate_seek', '-skip_frame', 'nokey',
+                 '-copyts', '-ss', f'{seconds:.3f}',
+                 '-i', self.source, '-map', '0:v:0', '-frames:v', '1', '-vf', 'scale=%d:%d:flags=area' % self.size,
+                 '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'],
+                capture_output=True)
+            if run.returncode != 0 or len(run.stdout) != aw * ah * 3 or run.stdout == previous:
+                continue # unreadable, or the same keyframe as the last position
+            previous = run.stdout
+            yield position, np.frombuffer(bytearray(run.stdout), dtype=np.uint8).reshape(ah, aw, 3)
+
+    def _read_exactly(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        got = 0
+        while got < size:
+            n = self.process.stdout.readinto(view[got:])
+            if not n:
+                return None
+            got += n
+        return buffer
+
+    def __iter__(self):
+        self._start()
+        fw, fh = self.frame_size
+        index = 0
+        while True:
+            buffer = self._read_exactly(fw * fh * 3)
+            if buffer is None:
+                break
+            image = np.frombuffer(buffer, dtype=np.uint8).reshape(fh, fw, 3)
+            if self.keep_full:
+                def rgb(image=image):
+                    small = image
+                    if self.size != (self.width, self.height):
+                        small = cv2.resize(image, self.size, interpolation=cv2.INTER_AREA)
+                    return cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+                yield DecodedFrame(index, lambda image=image: image, rgb)
+            else:
+                yield DecodedFrame(index, lambda: None, lambda image=image: image)
+            index += 1
+        self.close()
+
+    def close(self):
+        if self.process is None or self.process.stdout.closed:
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self._stderr.seek(0)
+        errors = self._stderr.read().decode(errors='replace').strip()
+        if errors and self.process.returncode not in (0, -9):
+            logger.warning(f"ffmpeg decoder: {errors}")
+        self.process.stdout.close()
+        self._stderr.close()
+
+
+VIDEO_DECODERS = {
+    "opencv": OpenCVDecoder,
+    "pyav": PyAVDecoder,
+    "ffmpeg": FFmpegPipeDecoder,
+}
+
+
+def open_video(source, name="opencv", analysis_width=None, keep_full=True, threads=None):
+    """Open source with the decoder picked for this deployment."""
+    if name not in VIDEO_DECODERS:
+        raise ValueError(f"Unknown video decoder '{name}', expected one of {', '.join(VIDEO_DECODERS)}")
+    return VIDEO_DECODERS[name](source, analysis_width=analysis_width, keep_full=keep_full, threads=threads)
@@ -6,7 +6,20 @@ import os
 from config import Config
 import google.generativeai as genai
 import logging
+import threading
+import time
 from typing import List, Literal
+from gemini_payload import encode_pose_table, build_feedback_prompt
+from form_scoring import calculate_angle, evaluate_form
+from rep_tracking import STATE_CHANGE_THRESHOLD
+from set_series import SetSeries, StreamingSetSeries
+from adaptive_sampling import AdaptiveSampler, FixedSampler, LandmarkSmoother
+from pose_backends import LegacyPoseBackend, create_pose_backend
+from pose_pool import PosePool
+from overlay_renderer import OverlayRenderer, InterpolatingOverlayWriter, landmarks_to_array
+from video_decoders import open_video
+from preflight import preflight_check
+from local_feedback import local_feedback
 
 logger = logging.getLogger(__name__)
 
@@ -14,64 +27,56 @@ logger = logging.getLogger(__name__)
 def get_visible_side(lm, left_idx, right_idx):
     """Returns the index of the more visible landmark."""
     return left_idx if lm[left_idx][3] >= lm[right_idx][3] else right_idx
-def count_reps_and_track_extremes(angles, states):
-    good_reps = 0
-    total_reps = 0
-
-    peak_angles = []
-    descent_angles = []
-
-    last_bot_idx = None
-
-    for i in range(len(states)):
-        state = states[i]
-
-        # Track the index of the most recent BOT
-        if state == "BOT":
-            last_bot_idx = i
-
-        # If we reach a TOP after a BOT, count as rep
-        elif state == "TOP" and last_bot_idx is not None:
-            bot_angle = angles[last_bot_idx]
-            top_angle = angles[i]
-
-            total_reps += 1
-            if bot_angle <= 90 and top_angle >= 160:
-                good_reps += 1
-
-            last_bot_idx = None  # reset for next rep
-
-        # Track local max/min for angle trends
-        if 0 < i < len(angles) - 1:
-            prev_a, curr_a, next_a = angles[i - 1], angles[i], angles[i + 1]
-            if curr_a > prev_a and curr_a > next_a:
-                peak_angles.append(curr_a)
-            elif curr_a < prev_a and curr_a < next_a:
-                descent_angles.append(curr_a)
-
-    avg_peak = sum(peak_angles) / len(peak_angles) if peak_angles else None
-    avg_descent = sum(descent_angles) / len(descent_angles) if descent_angles else None
-
-    return {
-        'good_reps': str(good_reps),
-        'bad_reps': str(total_reps - good_reps),
-        'total_reps': str(total_reps),
-        'avg_peak_angle': round(avg_peak, 2) if avg_peak is not None else -1,
-        'avg_descent_angle': round(avg_descent, 2) if avg_descent is not None else -1
-    }
-
 
 class GymFormAnalyzer:
-    def __init__(self):
+    def __init__(self, adaptive_sampling=None, frame_skip=2, model_complexity=1, min_detection_confidence=0.7,
+                 analysis_width=None, state_threshold=STATE_CHANGE_THRESHOLD, pose_backend=None, pose_pool_size=1,
+                 bounded_memory=None):
+        # Speed vs accuracy knobs, see tools/eval_harness.py for how they affect rep counts and scores
+        # Adaptive sampling runs pose less often while the lifter holds still and more often around
+        # the turnaround of each rep, with One-Euro smoothing on the landmarks in between
+        self.adaptive_sampling = getattr(Config, 'ADAPTIVE_SAMPLING', True) if adaptive_sampling is None else adaptive_sampling
+        self.frame_skip = frame_skip # frames skipped between pose calls (fixed sampling)
+        self.analysis_width = analysis_width # downscale frames to this width before pose, None keeps full size
+        self.state_threshold = state_threshold # degrees the angle must move before a new rep state is recorded
+        # Bounded memory keeps running rep/score totals and a fixed sample of frames for Gemini
+        # instead of every important frame, so long recordings do not grow the worker (set_series.py)
+        self.bounded_memory = getattr(Config, 'BOUNDED_MEMORY', False) if bounded_memory is None else bounded_memory
+        # Frame decoding, see video_decoders.py: opencv (default), pyav or ffmpeg
+        self.video_decoder = getattr(Config, 'VIDEO_DECODER', 'opencv')
+        self.decoder_threads = getattr(Config, 'VIDEO_DECODER_THREADS', None)
+        # full resolution frames a pose batch may hold back for the overlay, in MB; a batch is cut short
+        # rather than go over it (a 4K frame is about 24MB, so batches there shrink to a single frame)
+        self.overlay_buffer_mb = getattr(Config, 'OVERLAY_BUFFER_MB', 64)
+        # Pose on a few frames first so unusable videos are rejected before the full run (preflight.py), 0 turns it off
+        self.preflight_samples = getattr(Config, 'PREFLIGHT_SAMPLES', 8)
+        # running average of wall seconds per video frame, for preflight's savings estimate. Not CPU time:
+        # process_time() counts every thread, so side by side analyses would be charged for each other
+        self.seconds_per_frame = None
+        self._timing_lock = threading.Lock()
         self.mp_pose = mp.solutions.pose
         self.mp_drawing = mp.solutions.drawing_utils
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=False,
-            model_complexity=1,
-            smooth_landmarks=True,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7
-        )
+        # Pose inference goes through a PoseBackend (see pose_backends.py), picked per deployment.
+        # Each video borrows one from a pool, so analyses on different threads never share a graph
+        if pose_backend is None:
+            backend_name = getattr(Config, 'POSE_BACKEND', 'legacy')
+            if backend_name == 'legacy':
+                def make_backend():
+                    return LegacyPoseBackend(model_complexity, min_detection_confidence)
+            else:
+                backend_options = {'model_path': Config.POSE_MODEL_PATH,
+                                   'min_detection_confidence': min_detection_confidence}
+                if backend_name == 'onnx':
+                    # only ONNX runs a batch in one call; tasks goes frame by frame anyway
+                    backend_options['batch_size'] = getattr(Config, 'POSE_BATCH_SIZE', 8)
+                    backend_options['intra_op_threads'] = getattr(Config, 'POSE_THREADS', None)
+                    backend_options['input_size'] = getattr(Config, 'POSE_INPUT_SIZE', None)
+
+                def make_backend():
+                    return create_pose_backend(backend_name, **backend_options)
+            self.pose_pool = PosePool(make_backend, pose_pool_size)
+        else:
+            self.pose_pool = PosePool(lambda: pose_backend, 1, warmup_size=None)
         # Configure Gemini API once during initialization
         GEMINI_API_KEY = Config.getGeminiApiKey()
         print(GEMINI_API_KEY)
@@ -87,126 +92,23 @@ class GymFormAnalyzer:
         except Exception as e:
             logger.error(f"Failed to configure Gemini API: {e}. Gemini feedback will be unavailable.")
             self.gemini_model = None # Set to None if configuration fails
+        self.gemini_timeout = getattr(Config, 'GEMINI_TIMEOUT_SECONDS', 20)
+        # "gemini": always ask Gemini, "local": only the rule based feedback (local_feedback.py),
+        # "router": ask Gemini only when the rules are less sure than feedback_min_confidence
+        self.feedback_mode = getattr(Config, 'FEEDBACK_MODE', 'gemini')
+        self.feedback_min_confidence = getattr(Config, 'LOCAL_FEEDBACK_MIN_CONFIDENCE', 0.7)
+        self.feedback_fallback = getattr(Config, 'LOCAL_FEEDBACK_FALLBACK', True)
 
     def calculate_angle(self, point1, point2, point3):
         """Calculate angle between three points"""
-        a = np.array(point1)
-        b = np.array(point2)
-        c = np.array(point3)
-
-        radians = np.arctan2(c[1] - b[1], c[0] - b[0]) - np.arctan2(a[1] - b[1], a[0] - b[0])
-        angle = np.abs(radians * 180.0 / np.pi)
-
-        if angle > 180.0:
-            angle = 360 - angle
-
-        return angle
+        return calculate_angle(point1, point2, point3)
     Landmarks = List[List[List[float]]]  # Each frame: 33 landmarks [x, y, z]
     States = List[Literal["top", "mid", "bot"]]
     Exercise = Literal["squat", "pushups", "pullups"]
 
     def evaluate_form(self, landmarks: Landmarks, states: States, exercise: Exercise) -> float:
-        
-        if len(states) < 3:
-            return 0.0
-        if len(landmarks) != len(states):
-            return 0.0
-       
-
-        
-
-        # Define landmark indices for each key joint (both left and right)
-        indices = {
-            "nose": 0,
-            "left_shoulder": 11,
-            "right_shoulder": 12,
-            "left_hip": 23,
-            "right_hip": 24,
-            "left_knee": 25,
-            "right_knee": 26,
-            "left_ankle": 27,
-            "right_ankle": 28,
-            "left_elbow": 13,
-            "right_elbow": 14,
-            "left_wrist": 15,
-            "right_wrist": 16
-        }
-
-        scores = []
-
-        for i, lm in enumerate(landmarks):
-            state = states[i]
-
-            # Function to select best side based on visibility
-            def select_best_side(left_idx, right_idx):
-                left_vis = lm[left_idx][3] if len(lm[left_idx]) > 3 else lm[left_idx].visibility
-                right_vis = lm[right_idx][3] if len(lm[right_idx]) > 3 else lm[right_idx].visibility
-                return left_idx if left_vis >= right_vis else right_idx
-
-            # Select most visible side for each joint
-            shoulder_idx = select_best_side(indices["left_shoulder"], indices["right_shoulder"])
-            hip_idx = select_best_side(indices["left_hip"], indices["right_hip"])
-            knee_idx = select_best_side(indices["left_knee"], indices["right_knee"])
-            ankle_idx = select_best_side(indices["left_ankle"], indices["right_ankle"])
-            elbow_idx = select_best_side(indices["left_elbow"], indices["right_elbow"])
-            wrist_idx = select_best_side(indices["left_wrist"], indices["right_wrist"])
-
-            # Required landmark indices based on exercise and state
-            required = [indices["nose"], shoulder_idx, hip_idx, knee_idx]
-
-            if exercise != "squats":
-                required += [elbow_idx, wrist_idx]
-
-            if exercise == "pushups":
-                required += [ankle_idx]
-            if any(lm[idx][3] < 0.7 for idx in required):
-                continue
-
-            # Angles using selected sides
-            spinal_angle = self.calculate_angle(lm[indices["nose"]], lm[shoulder_idx], lm[hip_idx])
-            hip_angle = self.calculate_angle(lm[shoulder_idx], lm[hip_idx], lm[knee_idx])
-
-            spinal_score = 1.0 if 140 <= spinal_angle <= 170 else max(0.0, 1-abs(spinal_angle-155)/155)
-           
-            if exercise == "squats":
-                hip_score = 1.0 if 70 <= hip_angle <= 100 else max(0.0, 1-abs(hip_angle-85)/85)
-            else:
-                hip_score = 1.0 if 160 <= hip_angle <= 180 else max(0.0, 1-abs(hip_angle -170)/170)
-           
-
-            # Joint scoring using selected sides
-            joint_score = 1.0
-            if state in ["TOP", "BOT"]:
-                if exercise == "squats":
-                    joint_angle = self.calculate_angle(lm[hip_idx], lm[knee_idx], lm[ankle_idx])
-                else:
-                    joint_angle = self.calculate_angle(lm[shoulder_idx], lm[elbow_idx], lm[wrist_idx])
-
-                if state == "BOT":
-                    joint_score = 1.0 if joint_angle <= 90 else -1.0
-                elif state == "TOP":  # top
-                    joint_score = 1.0 if joint_angle >= 160 else -1.0
-                else:
-                    joint_score = 1.0
-
-            # Extra for pushups using selected side
-            extra_score = 1.0
-            if exercise == "pushups":
-                leg_line_angle = self.calculate_angle(lm[hip_idx], lm[knee_idx], lm[ankle_idx])
-                extra_score = 1.0 if 140 <= leg_line_angle <= 180 else max(0.0, 1 - (140 - leg_line_angle)/140)
-
-            # Final score
-            if state not in ["TOP","BOT"]:
-                
-                score = (spinal_score +hip_score +extra_score) if exercise == "pushups" else (spinal_score +hip_score)
-                score = score/3 if exercise == "pushups" else score/2
-            else:
-                
-                score = (joint_score)
-                
-            scores.append(score)
-
-        return max(0.100,round(np.mean(scores),3)) if scores else 0.0
+        # Per-frame scoring lives in form_scoring.py so offline tools score frames the same way
+        return evaluate_form(landmarks, states, exercise)
     
 
     def analyze_squat(self, landmarks):
@@ -285,214 +187,199 @@ class GymFormAnalyzer:
             logger.warning(f"Failed to analyze bench/pull landmarks: {e}")
             return None
 
-    def process_video(self, input_source, output_path=None, exercise_type="squat", analysis_type = "FULL"):
-        cap = cv2.VideoCapture(input_source)
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    def process_video(self, input_source, output_path=None, exercise_type="squat", analysis_type = "FULL",
+                      feedback_dispatcher=None, output_stream=None):
+        """Analyse one set.
 
-        if output_path or analysis_type == "QUICK":
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Use mp4v or XVID for better compatibility
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        When a feedback_dispatcher is given the Gemini call is started in the background
+        and returned as 'gemini_feedback_pending' (call .result() on it) instead of
+        blocking here for 'gemini_feedback'. QUICK analyses, FEEDBACK_MODE "local"
+        and confident rules in "router" mode get the local rule based feedback,
+        which also stands in when Gemini fails or times out.
+
+        output_stream replaces the mp4v file at output_path: an object with
+        open(fps, (width, height)), write(frame), release() and a url, such as
+        segmented_output.HLSOutput, that gets the annotated frames as they are drawn.
+        """
+        if self.bounded_memory:
+            series = StreamingSetSeries(exercise_type, self.state_threshold)
         else:
-            out = None
-
-        frame_count = 0
-        throttleValue = 0
-        frameSkipped = 2 # Process every 3rd frame
-        list_of_frames = [] # Stores angles per relevant frame
-        list_of_states = [] # Stores states (TOP/MID/BOT) per relevant frame
-        keypoint_series = [] # Stores all landmark data for Gemini
-        keypointSeriesForImportantFrames = []
-        lastPeakOrDescent = 'MID'
-        while cap.isOpened():
-            success, image = cap.read()
-            if not success:
-                break
-            frame_count += 1
-            if (frame_count - 1) % (frameSkipped + 1) == 0:  # process every 3rd frame
-                image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                image_rgb.flags.writeable = False
-                results = self.pose.process(image_rgb)
-                image_rgb.flags.writeable = True
-                
-                if results.pose_landmarks:
-                    landmarks = results.pose_landmarks.landmark
-                    landmarks = results.pose_landmarks.landmark
-                    # Optimized keypoint data for Gemini to reduce token count
-                    
-                    if exercise_type == "squats":
-                        analysis = self.analyze_squat(landmarks)
-                    elif exercise_type in ["pullups", "pushups"]:
-                        analysis = self.analyze_bench_or_pull(landmarks)
-                    else:
-                        analysis = None
-
-                    angleOfCurrentState = analysis['angleToCheck'] if analysis else 0
-                    if len(list_of_frames) == 0:
-                        list_of_frames = [angleOfCurrentState]
-                        list_of_states = ['MID']
-                        keypointSeriesForImportantFrames.append([
-                            [round(lm.x, 3), round(lm.y, 3), round(lm.z, 3), round(lm.visibility, 3)]
-                            for lm in landmarks
-                        ])
-
-                    elif abs(list_of_frames[len(list_of_frames)-1] - angleOfCurrentState) > 5:
-                        
-                        keypointSeriesForImportantFrames.append([
-                            [round(lm.x, 3), round(lm.y, 3), round(lm.z, 3), round(lm.visibility, 3)]
-                            for lm in landmarks
-                        ])
-                        
-                        lastStateIndex = len(list_of_states)-1
-                        lastState = list_of_states[lastStateIndex]
-                        lastAngleIndex = len(list_of_frames)-1
-                        lastAngle = list_of_frames[lastAngleIndex]
-                        list_of_frames.append(angleOfCurrentState)
-                        if lastState == 'TOP':
-                            if angleOfCurrentState < lastAngle:
-                                list_of_states.append('MID')
-                                #top means apex of ROM or eccentric stage so next is mid
-                                
-                            else:
-                                list_of_states[lastAngleIndex] = 'MID'
-                                #convert it to a transition
-                                list_of_states.append('TOP')
-                                
-                                #mid simply signifies a transition not necessarily the angle
-                        elif lastState == 'BOT':
-                            if angleOfCurrentState > lastAngle:
-                                list_of_states.append('MID')
-                                
-                            else:
-                                list_of_states[lastAngleIndex] = 'MID'
-                               
-                                list_of_states.append('BOT')
-                                #BOT means concentric stage or the bottom
-
-                                
-                        else:
-                            if angleOfCurrentState < lastAngle  and lastPeakOrDescent == 'TOP':
-                                lastPeakOrDescent = 'TOP'
-                                #convert it to a transition
-                                list_of_states.append('MID')
-                                #top means apex of ROM or eccentric stage
-                                #as you can see I copy pasted a ton
-                            elif angleOfCurrentState > lastAngle and lastPeakOrDescent == 'BOT':
-                                lastPeakOrDescent = 'BOT'
-                                list_of_states.append('MID')
+            series = SetSeries(exercise_type, self.state_threshold)
+        # the backend is only held for the frame loop, not for the Gemini call
+        with self.pose_pool.checkout() as pose_backend:
+            if self.preflight_samples:
+                # raises preflight.PreflightError (a ValueError) with the reason
+                preflight_check(input_source, pose_backend, exercise_type, self.preflight_samples,
+                                self.analysis_width, self.seconds_per_frame, decoder=self.video_decoder)
+            started = time.monotonic()
+            video = self._track_video(pose_backend, series, input_source, output_path, exercise_type,
+                                      analysis_type, output_stream)
+        if video['frames']:
+            per_frame = (time.monotonic() - started) / video['frames']
+            with self._timing_lock: # concurrent requests share the analyzer
+                self.seconds_per_frame = (per_frame if self.seconds_per_frame is None
+                                          else 0.8 * self.seconds_per_frame + 0.2 * per_frame)
+        score = series.score()
+        summary = self.generate_summary(series, exercise_type, score, video)
+        result = {
+            'processed_video': output_stream.url if output_stream else output_path,
+            'summary': summary,
+            'video': video,
+        }
+        result.update(self.route_feedback(series, score, exercise_type, analysis_type, feedback_dispatcher))
+        return result
 
+    def route_feedback(self, series, score, exercise_type, analysis_type="FULL", feedback_dispatcher=None):
+        """Local or Gemini feedback for a finished set, per FEEDBACK_MODE (see process_video).
+
+        Returns {'gemini_feedback': ...} or, when the Gemini call went to the
+        feedback_dispatcher, {'gemini_feedback_pending': ...}.
+        """
+        # Gemini only sees the important frames, picked at the rep extremes
+        landmarks_series, states, angles, frame_numbers = series.gemini_input()
+        local = local_feedback(exercise_type, series.rep_stats(), score, landmarks_series, states, angles)
+        if (analysis_type == "QUICK" or self.feedback_mode == "local"
+                or (self.feedback_mode == "router" and local['confidence'] >= self.feedback_min_confidence)):
+            return {'gemini_feedback': local}
+
+        fallback = local if self.feedback_fallback else None
+        gemini_args = (landmarks_series, exercise_type, analysis_type)
+        gemini_kwargs = {'states': states, 'angles': angles, 'frame_numbers': frame_numbers}
+        if feedback_dispatcher and self.gemini_model:
+            return {'gemini_feedback_pending': feedback_dispatcher.submit(self.send_to_gemini, *gemini_args,
+                                                                          fallback=fallback, **gemini_kwargs)}
+        feedback = self.send_to_gemini(*gemini_args, **gemini_kwargs)
+        return {'gemini_feedback': fallback if fallback and 'error' in feedback else feedback}
+
+    def _track_video(self, pose_backend, series, input_source, output_path, exercise_type, analysis_type,
+                     output_stream=None):
+        """Run pose over the video and feed the tracked angles into series; writes the annotated video if asked.
+
+        Returns the frame count, resolution and frame rate of the video.
+        """
+        write_output = bool(output_path or output_stream or analysis_type == "QUICK")
+        # full resolution frames are only kept when an annotated video is written
+        decoder = open_video(input_source, self.video_decoder, self.analysis_width, keep_full=write_output,
+                             threads=self.decoder_threads)
+        out = overlay = None
+        try:
+            fps = int(decoder.fps)
+            width = decoder.width
+            height = decoder.height
+
+            if write_output:
+                if output_stream:
+                    out = output_stream.open(fps, (width, height))
+                else:
+                    fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Use mp4v or XVID for better compatibility
+                    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+                overlay = InterpolatingOverlayWriter(out, OverlayRenderer(width, height))
+
+            frame_count = 0
+            inferred_count = 0 # frames the pose model ran on, as the sampler picked them
+            throttleValue = 0
+            frameSkipped = self.frame_skip # Process every 3rd frame by default
+            if self.adaptive_sampling:
+                sampler = AdaptiveSampler(base_stride=frameSkipped + 1)
+                smoother = LandmarkSmoother()
+            else:
+                sampler = FixedSampler(frameSkipped + 1) # process every 3rd frame
+                smoother = None
+            next_inference_frame = 0
+            # The adaptive sampler needs each result before it can pick the next frame, so it runs one frame at a time
+            batch_size = 1 if self.adaptive_sampling else pose_backend.batch_size
+            # with an overlay every frame of a batch waits for its results, so the batch is run early
+            # once the held frames reach overlay_buffer_mb
+            max_held = max(1, int(self.overlay_buffer_mb * 2**20 // (width * height * 3))) if overlay else None
+            pending = [] # frames read since the last pose batch: (frame index, image, image_rgb or None if not inferred)
+            pendingInferences = 0
+            trackedAngle = None
+            frames = iter(decoder)
+            while True:
+                decoded = next(frames, None)
+                success = decoded is not None
+                if success:
+                    frame_count += 1
+                    if frame_count - 1 == next_inference_frame:
+                        # the decoder hands over an RGB frame already scaled to analysis_width
+                        pending.append((frame_count - 1, decoded.bgr() if overlay else None, decoded.rgb()))
+                        pendingInferences += 1
+                        inferred_count += 1
+                    elif overlay:
+                        # not inferred, drawn later from the neighbouring inferred frames
+                        pending.append((frame_count - 1, decoded.bgr(), None))
+
+                if pendingInferences and (pendingInferences >= batch_size or not success
+                                          or (max_held and len(pending) >= max_held)):
+                    batch = [(idx, rgb) for idx, _, rgb in pending if rgb is not None]
+                    batchResults = iter(pose_backend.process_batch(
+                        [rgb for _, rgb in batch], [idx * 1000 / (fps or 30) for idx, _ in batch]))
+                    for frameIndex, frame, frame_rgb in pending:
+                        if frame_rgb is None:
+                            overlay.add_frame(frame)
+                            continue
+                        landmarks = next(batchResults)
+                        keyframe = () # what the overlay draws on this frame, nothing if there is no usable pose
+                        trackedAngle = None
+
+                        if landmarks:
+                            if smoother:
+                                landmarks = smoother(landmarks, frameIndex / (fps or 30))
+
+                            if exercise_type == "squats":
+                                analysis = self.analyze_squat(landmarks)
+                            elif exercise_type in ["pullups", "pushups"]:
+                                analysis = self.analyze_bench_or_pull(landmarks)
                             else:
-                                if angleOfCurrentState < lastAngle  and lastPeakOrDescent != 'TOP':
-                                    lastPeakOrDescent = 'TOP'
-                                    #the current value implies descending
-                                    list_of_states[lastAngleIndex] = 'MID'
-                                    
-                                    list_of_states.append('BOT')
-                                
-                                elif angleOfCurrentState > lastAngle and lastPeakOrDescent != 'BOT':
-                                    lastPeakOrDescent = 'BOT'
-                                    #the current value implies ascending
-                                    list_of_states[lastAngleIndex] = 'MID'
-                                    list_of_states.append('TOP') 
-                    keypoint_series.append([
-                        {
-                            'x': round(lm.x, 3), # Round to 3 decimal places
-                            'y': round(lm.y, 3), # Round to 3 decimal places
-                            # 'z': round(lm.z, 3), # Removed 'z' for further token reduction
-                            # 'visibility': round(lm.visibility, 2) # Removed 'visibility' for token reduction
-                        }
-                        for lm in landmarks
-                        ])
-                    
-                    currentState = list_of_states[len(list_of_states)-1]
-                    if analysis and out: # Only draw if analysis was successful and output video is enabled
-                        all_states_labels = ['TOP', 'MID', 'BOT']
-                        currentState = all_states_labels.index(currentState)
-                        colourTuple = (255 if currentState == 0 else 0, # Blue for TOP
-                                        255 if currentState == 1 else 0, # Green for MID
-                                        255 if currentState == 2 else 0) # Red for BOT
-                        cv2.putText(image, f"Angle: {round(angleOfCurrentState, 1)} deg", (10, 50),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, colourTuple, 2)
-                        cv2.putText(image, all_states_labels[currentState], (10, 100),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, colourTuple, 2)
-                        self.mp_drawing.draw_landmarks(
-                        image,
-                        results.pose_landmarks,
-                        self.mp_pose.POSE_CONNECTIONS,
-                        landmark_drawing_spec=self.mp_drawing.DrawingSpec(color=(0,255,0), thickness=2, circle_radius=2),
-                        connection_drawing_spec=self.mp_drawing.DrawingSpec(color=(0,0,255), thickness=2, circle_radius=2)
-                        )
-
-                if out:
-                    out.write(image)
-
-        cap.release()
+                                analysis = None
+
+                            angleOfCurrentState = analysis['angleToCheck'] if analysis else 0
+                            trackedAngle = analysis['angleToCheck'] if analysis else None
+                            series.add(angleOfCurrentState, [
+                                [round(lm.x, 3), round(lm.y, 3), round(lm.z, 3), round(lm.visibility, 3)]
+                                for lm in landmarks
+                            ])
+                            if analysis and overlay: # Only draw if analysis was successful and output video is enabled
+                                keyframe = (landmarks_to_array(landmarks), angleOfCurrentState, series.state)
+
+                        if overlay:
+                            overlay.add_keyframe(frame, *keyframe)
+                    pending = []
+                    pendingInferences = 0
+                elif pending and not success and overlay:
+                    # trailing frames after the last inferred one
+                    for _, frame, _ in pending:
+                        overlay.add_frame(frame)
+                    pending = []
+
+                if not success:
+                    break
+                if frame_count - 1 == next_inference_frame:
+                    next_inference_frame += sampler.next_stride(trackedAngle)
+        except BaseException:
+            # the set failed: stop the writer without finishing the video
+            if output_stream:
+                output_stream.abort()
+            elif out is not None:
+                out.release()
+            raise
+        finally:
+            decoder.close()
+        if overlay:
+            overlay.close()
         if out:
             out.release()
-        score = self.evaluate_form(keypointSeriesForImportantFrames, list_of_states, exercise_type)
-        summary = self.generate_summary(list_of_frames, list_of_states, exercise_type,score)
-        gemini_feedback = self.send_to_gemini(keypoint_series, exercise_type,analysis_type)
-
-        return {
-            'processed_video': output_path if output_path else None,
-            'summary': summary,
-            'gemini_feedback': gemini_feedback
-        }
+        return {'frames': frame_count, 'inferred_frames': inferred_count, 'width': width, 'height': height, 'fps': fps}
 
-    def send_to_gemini(self, landmarks_series, exercise_type, analysis_type="FULL"):
+    def send_to_gemini(self, landmarks_series, exercise_type, analysis_type="FULL", states=None, angles=None,
+                       frame_numbers=None):
         if not self.gemini_model or analysis_type == "QUICK":
             # Changed return type to dictionary to match successful JSON output structure
             return {"error": "Gemini API not configured. Cannot provide AI feedback."}
 
-        # Reduced max_sample_frames for more aggressive token reduction
-        max_sample_frames = 25 # Target 25 frames for testing, adjust as needed
-        sample_frames = landmarks_series[::max(1, len(landmarks_series) // max_sample_frames)]
-        if len(sample_frames) > max_sample_frames:
-            sample_frames = sample_frames[:max_sample_frames]
-
-        # MODIFIED PROMPT: Explicitly instructing Gemini for JSON output with schema
-        prompt = f"""
-        You are a virtual fitness coach specialized in analyzing exercise form.
-        The user has performed a {exercise_type}. I will provide you with a series of pose keypoints (x, y) for various frames.
-        Each frame contains data for 33 body keypoints, normalized to the image size (0.0 to 1.0).
-
-        Please provide a **concise and summarized analysis** of the {exercise_type} form, focusing on the most critical points.
-        Your response MUST be in JSON format, strictly following the schema provided below.
-        Do NOT include any other text or markdown outside the JSON object.
-        Embed relevant emojis directly into the string values where appropriate to add visual appeal.
-
-        **JSON Schema:**
-        ```json
-        {{
-          "title": "Gym Form Analysis - {exercise_type.capitalize()}",
-          "strengths": [
-            "string",
-            "string"
-          ],
-          "areas_for_improvement": [
-            "string",
-            "string"
-          ],
-          "actionable_tips": [
-            "string",
-            "string",
-            "string"
-          ],
-          "overall_assessment": "string"
-        }}
-        ```
-        -   **title**: A short, descriptive title for the analysis.
-        -   **strengths**: An array of 1-2 concise bullet points highlighting key good aspects. Each string should be self-contained.
-        -   **areas_for_improvement**: An array of 1-2 concise bullet points for critical areas needing work. Each string should be self-contained.
-        -   **actionable_tips**: An array of 1-3 concise, concrete, actionable advice points. Each string should be self-contained.
-        -   **overall_assessment**: A very brief, encouraging summary sentence.
-
-        Analyze the movement over time. Pay attention to joint angles, range of motion, and consistency based on the x and y coordinates provided.
-
-        Here is a sample of the pose data (list of dictionaries, each dictionary represents a frame's 33 keypoints):
-        {json.dumps(sample_frames, indent=2)}
-        """
+        # Only the joints that matter, at the rep extremes, as a delta coded table
+        pose_table, _ = encode_pose_table(landmarks_series, exercise_type, states, angles, frame_numbers=frame_numbers)
+        prompt = build_feedback_prompt(exercise_type, pose_table)
         try:
             chat = self.gemini_model.start_chat()
             # CRUCIAL: Set response_mime_type to application/json
@@ -500,7 +387,8 @@ class GymFormAnalyzer:
                 prompt,
                 generation_config=genai.types.GenerationConfig(
                     response_mime_type="application/json"
-                )
+                ),
+                request_options={"timeout": self.gemini_timeout}
             )
             # Parse the JSON string from the response
             feedback_data = json.loads(response.text)
@@ -514,12 +402,15 @@ class GymFormAnalyzer:
             # Return an error dictionary
             return {"error": f"Error getting feedback from AI: {str(e)}. Please check API key and network."}
 
-    def generate_summary(self, frameSet, stateSet, exercise_type,score = 0):
-        frameSkipped = 2 # Assuming this is consistent with how frames were skipped during processing
-        if not frameSet:
+    def generate_summary(self, series, exercise_type,score = 0, video=None):
+        # frame counts as _track_video counted them; the sampler's stride varies, so they cannot be derived from it
+        frames = (video or {}).get('frames', 0)
+        pose_frames = (video or {}).get('inferred_frames', 0)
+        if not series.recorded:
             return {
                 'exercise': exercise_type,
-                'total_frames_analyzed': '0',
+                'total_frames_analyzed': str(frames),
+                'pose_frames': str(pose_frames),
                 'overall_feedback': "No pose detected in video. Please ensure the person is visible and well-lit.",
                 'good_reps': '0',
                 'bad_reps': '0',
@@ -529,7 +420,7 @@ class GymFormAnalyzer:
                 'score': "0"
             }
 
-        returnedValue = count_reps_and_track_extremes(frameSet, stateSet)
+        returnedValue = series.rep_stats()
 
         # General feedback template
         feedback = "Analysis complete."
@@ -542,7 +433,8 @@ class GymFormAnalyzer:
 
         return {
             'exercise': exercise_type,
-            'total_frames_analyzed': str(len(frameSet) * (frameSkipped + 1)), # +1 because 0-index skipped frames
+            'total_frames_analyzed': str(frames),
+            'pose_frames': str(pose_frames),
             'average_peak_angle': str(returnedValue['avg_peak_angle']),
             'average_descent_angle': str(returnedValue['avg_descent_angle']),
             'good_reps': returnedValue['good_reps'],
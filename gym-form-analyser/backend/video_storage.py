@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+# Where processed videos (whole MP4s or HLS playlists and segments) are published.
+# Both stores take a local file and a key and hand back the public URL of that key.
+
+
+class S3Storage:
+    """Objects in an S3 bucket, served from the bucket's public URL."""
+
+    def __init__(self, client, bucket, region):
+        self.client = client
+        self.bucket = bucket
+        self.region = region
+
+    def put_file(self, path, key, content_type, cache_control=None):
+        extra = {'ContentType': content_type}
+        if cache_control:
+            extra['CacheControl'] = cache_control
+        with open(path, 'rb') as f:
+            self.client.upload_fileobj(f, self.bucket, key, ExtraArgs=extra)
+
+    def url(self, key):
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+
+class LocalStorage:
+    """Objects as files under root, a stand-in for S3 in development and tests.
+
+    Files are copied next to their final name and renamed into place, so a
+    reader never sees half a segment or playlist. app.py serves them under
+    base_url when VIDEO_STORAGE is "local".
+    """
+
+    def __init__(self, root, base_url="/media"):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def put_file(self, path, key, content_type, cache_control=None):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, staging = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.upload-')
+        os.close(fd)
+        try:
+            shutil.copyfile(path, staging)
+            os.replace(staging, target)
+        except Exception:
+            os.unlink(staging)
+            raise
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
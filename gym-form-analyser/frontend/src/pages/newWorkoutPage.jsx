@@ -1,8 +1,44 @@
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import TitleBanner from "../components/titleBanner";
 import SideBarNav from "../components/sideBarNav";
 import "../assets/styles/newWorkout.css";
 
+// Sent as Idempotency-Key, so a retry after a failed set only processes the sets that are missing
+const newRequestId = () =>
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+// Processed videos are an MP4 or, with OUTPUT_MODE "hls" on the server, an HLS playlist
+const videoType = (url) =>
+  url && url.split("?")[0].endsWith(".m3u8")
+    ? "application/vnd.apple.mpegurl"
+    : "video/mp4";
+
+// Reads the progress of an analysis (Server-Sent Events) and calls onEvent for each event
+const watchProgress = async (progressId, token, onEvent, signal) => {
+  const response = await fetch(`/analysis_jobs/${progressId}/events`, {
+    headers: { Authorization: `Bearer ${token}` },
+    signal,
+  });
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) return;
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split("\n\n");
+    buffer = messages.pop();
+    messages.forEach((message) => {
+      const data = message
+        .split("\n")
+        .find((line) => line.startsWith("data: "));
+      if (data) onEvent(JSON.parse(data.slice(6)));
+    });
+  }
+};
+
 const NewWorkout = () => {
   const [exerciseType, setExerciseType] = useState("pushups");
   const [analysisType, setAnalysisType] = useState("FULL");
@@ -16,6 +52,12 @@ const NewWorkout = () => {
   const [analysisResults, setAnalysisResults] = useState([]);
   const [totalScore, setTotalScore] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
+  const idempotencyKey = useRef(null);
+
+  // a different exercise, analysis type or date is a different request
+  useEffect(() => {
+    idempotencyKey.current = null;
+  }, [exerciseType, analysisType, workoutDate]);
 
   const handleExerciseChange = (e) => {
     setExerciseType(e.target.value);
@@ -57,10 +99,39 @@ const NewWorkout = () => {
     setVideos(updatedVideos);
   };
 
+  // rep counts and score arrive first, then the processed video, then the AI feedback
+  const applyProgress = (event) => {
+    if (event.set === undefined) return;
+    setAnalysisResults((prev) => {
+      const next = [...prev];
+      const current = next[event.set] || {
+        analysis: {},
+        geminiFeedback: "Waiting for AI feedback...",
+        processedUrl: "",
+      };
+      if (event.type === "summary") {
+        next[event.set] = { ...current, analysis: event.analysis };
+      } else if (event.type === "video") {
+        next[event.set] = { ...current, processedUrl: event.processed_url || "" };
+      } else if (event.type === "feedback") {
+        next[event.set] = {
+          ...current,
+          geminiFeedback: event.gemini_feedback || "No feedback",
+        };
+      }
+      return next;
+    });
+  };
+
   const handleAnalyze = async () => {
     setIsLoading(true);
     setAnalysisResults([]);
     setTotalScore(null);
+    const progressId = newRequestId();
+    const watcher = new AbortController();
+    watchProgress(progressId, token, applyProgress, watcher.signal).catch(
+      () => {} // progress is a bonus, the final response has everything
+    );
     try {
       const formData = new FormData();
       formData.append("workout_date", workoutDate);
@@ -74,10 +145,16 @@ const NewWorkout = () => {
         }
       });
 
+      if (!idempotencyKey.current) {
+        idempotencyKey.current = newRequestId();
+      }
+
       const response = await fetch("/upload_and_analyze", {
         method: "POST",
         headers: {
           Authorization: `Bearer ${token}`,
+          "Idempotency-Key": idempotencyKey.current,
+          "X-Progress-Id": progressId,
         },
         body: formData,
       });
@@ -93,7 +170,11 @@ const NewWorkout = () => {
 
         setAnalysisResults(mapped);
         setTotalScore(data.score);
+        idempotencyKey.current = null;
         alert("Analysis complete!");
+      } else if (Array.isArray(data.failed_sets)) {
+        const failed = data.failed_sets.map((s) => s.filename).join(", ");
+        alert("Error: " + data.error + "\nFailed: " + failed);
       } else {
         alert("Error: " + (data.error || "Unexpected server response"));
       }
@@ -101,6 +182,7 @@ const NewWorkout = () => {
       console.error("Analysis failed:", error);
       alert("An error occurred while analyzing.");
     } finally {
+      watcher.abort();
       setIsLoading(false);
     }
   };
@@ -247,7 +329,7 @@ const NewWorkout = () => {
                                 ? analysisResults[index].processedUrl
                                 : URL.createObjectURL(video)
                             }
-                            type="video/mp4"
+                            type={videoType(analysisResults[index]?.processedUrl)}
                           />
                         </video>
 
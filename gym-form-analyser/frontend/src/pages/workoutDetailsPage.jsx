@@ -1,10 +1,22 @@
 import { useLocation } from "react-router-dom";
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import TitleBanner from "../components/titleBanner";
 import SideBarNav from "../components/sideBarNav";
 import "../assets/styles/workoutDetails.css";
 
+// Sent as Idempotency-Key, so a retry after a failed set only processes the sets that are missing
+const newRequestId = () =>
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+// Processed videos are an MP4 or, with OUTPUT_MODE "hls" on the server, an HLS playlist
+const videoType = (url) =>
+  url && url.split("?")[0].endsWith(".m3u8")
+    ? "application/vnd.apple.mpegurl"
+    : "video/mp4";
+
 const WorkoutDetails = () => {
   const { state } = useLocation();
   const navigate = useNavigate();
@@ -19,6 +31,12 @@ const WorkoutDetails = () => {
   const [exerciseType, setExerciseType] = useState(
     workout.results[0]?.analysis?.exercise || ""
   );
+  const idempotencyKey = useRef(null);
+
+  // a different date, exercise or analysis type is a different request
+  useEffect(() => {
+    idempotencyKey.current = null;
+  }, [workout.date, exerciseType, analysisType]);
 
   const handleVideoUpload = (e, index) => {
     const file = e.target.files[0];
@@ -92,11 +110,16 @@ const WorkoutDetails = () => {
     const token = localStorage.getItem("token");
     console.log(formData);
 
+    if (!idempotencyKey.current) {
+      idempotencyKey.current = newRequestId();
+    }
+
     try {
       const response = await fetch("/update_workout", {
         method: "POST",
         headers: {
           Authorization: `Bearer ${token}`,
+          "Idempotency-Key": idempotencyKey.current,
         },
         body: formData,
       });
@@ -107,6 +130,13 @@ const WorkoutDetails = () => {
         alert("Error: " + data.error);
         return;
       }
+      // 207: some new sets failed and nothing was saved yet, saving again retries only those
+      if (Array.isArray(data.failed_sets)) {
+        const failed = data.failed_sets.map((s) => s.filename).join(", ");
+        alert("Error: " + data.error + "\nFailed: " + failed);
+        return;
+      }
+      idempotencyKey.current = null;
       alert("Workout updated successfully!");
       navigate("/workout-logs");
     } catch (err) {
@@ -193,7 +223,10 @@ const WorkoutDetails = () => {
               <div className="video-feedback-row">
                 {set.processed_url ? (
                   <video controls>
-                    <source src={set.processed_url} type="video/mp4" />
+                    <source
+                      src={set.processed_url}
+                      type={videoType(set.processed_url)}
+                    />
                   </video>
                 ) : (
                   <p className="no-video">